@@ -46,6 +46,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "core.context_processors.map_tiles",
             ],
         },
     },
@@ -81,6 +82,21 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Map tile proxy (core.tiles). Point MAP_TILE_UPSTREAM at a local stub tile server for testing.
+MAP_TILE_UPSTREAM = os.environ.get("MAP_TILE_UPSTREAM", "https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+MAP_TILE_CACHE_DIR = BASE_DIR / "tile_cache"
+MAP_TILE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Identifies this site to the tile server, as its usage policy requires; add a contact address
+MAP_TILE_USER_AGENT = os.environ.get("MAP_TILE_USER_AGENT", "bbq-grill-tile-cache/1.0 (delivery maps for BBQ Grill, Naval, Biliran)")
+
+# Rendered invoice PDFs (core.invoice_pdf), one file per invoice
+INVOICE_PDF_CACHE_DIR = BASE_DIR / "invoice_pdfs"
+
+# Barangay boundaries of Naval (core.barangays): a GeoJSON FeatureCollection with one
+# Polygon/MultiPolygon feature per barangay and a "name" property. Unset, the feature is
+# off and checkout keeps the barangay the customer typed.
+BARANGAY_BOUNDARIES_FILE = os.environ.get("BARANGAY_BOUNDARIES_FILE") or None
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 LOGIN_REDIRECT_URL = "dashboard"
@@ -4,7 +4,8 @@ from django.contrib.auth.models import User
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Product, Reservation, ReservationItem, JournalEntry, Article, Feedback, Order, OrderItem, Cart, CartItem, OrderTracking, UserHistory, Invoice
+from django.utils import timezone
+from .models import Product, Reservation, ReservationItem, JournalEntry, Article, Feedback, Order, OrderItem, Cart, CartItem, OrderTracking, OrderStatusEvent, OrderStatusHourlyStat, UserHistory, Invoice, ChangeCounter, Rider, DeliveryZone, StockMovement, StockSnapshot, ReservationSlotRule, SlotOccupancy
 
 
 class ProductAdmin(admin.ModelAdmin):
@@ -50,7 +51,8 @@ class ReservationAdmin(admin.ModelAdmin):
     list_filter = ("status", "reservation_type", "scheduled_for")
     search_fields = ("customer__username", "contact_phone")
     inlines = [ReservationItemInline]
-    readonly_fields = ('created_at', 'updated_at')
+    # Maintained from the items
+    readonly_fields = ('total_amount', 'created_at', 'updated_at')
     fieldsets = (
         ('Basic Information', {
             'fields': ('customer', 'reservation_type', 'scheduled_for', 'status')
@@ -113,10 +115,10 @@ class OrderTrackingAdmin(admin.ModelAdmin):
             'fields': ('order', 'customer_name')
         }),
         ('Status & Timeline', {
-            'fields': ('status', 'estimated_delivery')
+            'fields': ('status', 'rider', 'estimated_delivery')
         }),
         ('GPS Location Tracking', {
-            'fields': ('latitude', 'longitude', 'location_name', 'map_preview'),
+            'fields': ('latitude', 'longitude', 'location_name', 'location_updated_at', 'map_preview'),
             'description': 'Enter GPS coordinates to show live location on customer tracking map. Format: Latitude (e.g., 14.5994), Longitude (e.g., 120.9842)'
         }),
         ('Timestamps', {
@@ -165,7 +167,7 @@ class OrderTrackingAdmin(admin.ModelAdmin):
             map_html = f'''
             <div style="width: 100%; height: 300px; border: 2px solid #ddd; border-radius: 8px; margin-top: 10px;">
                 <iframe width="100%" height="100%" frameborder="0" style="border-radius: 8px;"
-                    src="https://www.openstreetmap.org/export/embed.html?bbox={obj.longitude-0.01},{obj.latitude-0.01},{obj.longitude+0.01},{obj.latitude+0.01}&layer=mapnik&marker={obj.latitude},{obj.longitude}">
+                    src="{reverse('map_preview')}?lat={obj.latitude}&amp;lng={obj.longitude}">
                 </iframe>
             </div>
             <p style="margin-top: 10px; font-size: 12px; color: #666;">
@@ -178,32 +180,149 @@ class OrderTrackingAdmin(admin.ModelAdmin):
             return mark_safe('<p style="color: #999; font-style: italic;">No GPS coordinates set yet. Enter latitude and longitude above to display map.</p>')
     map_preview.short_description = 'Map Preview'
 
+    def _set_status(self, queryset, status):
+        """Bulk-update tracking status and log the transitions."""
+        order_ids = list(queryset.exclude(status=status).values_list('order_id', flat=True))
+        updated = queryset.filter(order_id__in=order_ids).update(status=status)
+        OrderStatusEvent.record_bulk(order_ids, status)
+        return updated
+
     def mark_confirmed(self, request, queryset):
-        updated = queryset.update(status='confirmed')
+        updated = self._set_status(queryset, 'confirmed')
         self.message_user(request, f"✓ {updated} order(s) marked as Confirmed")
     mark_confirmed.short_description = "✓ Mark as Confirmed"
 
     def mark_preparing(self, request, queryset):
-        updated = queryset.update(status='preparing')
+        updated = self._set_status(queryset, 'preparing')
         self.message_user(request, f"✓ {updated} order(s) marked as Preparing")
     mark_preparing.short_description = "✓ Mark as Preparing"
 
     def mark_ready(self, request, queryset):
-        updated = queryset.update(status='ready_for_pickup')
+        updated = self._set_status(queryset, 'ready_for_pickup')
         self.message_user(request, f"✓ {updated} order(s) marked as Ready for Pickup")
     mark_ready.short_description = "✓ Mark as Ready for Pickup"
 
     def mark_out_for_delivery(self, request, queryset):
-        updated = queryset.update(status='out_for_delivery')
+        updated = self._set_status(queryset, 'out_for_delivery')
         self.message_user(request, f"✓ {updated} order(s) marked as Out for Delivery")
     mark_out_for_delivery.short_description = "✓ Mark as Out for Delivery"
 
     def mark_delivered(self, request, queryset):
-        updated = queryset.update(status='delivered')
+        updated = self._set_status(queryset, 'delivered')
         self.message_user(request, f"✓ {updated} order(s) marked as Delivered")
     mark_delivered.short_description = "✓ Mark as Delivered"
 
 
+@admin.register(OrderStatusHourlyStat)
+class OrderStatusHourlyStatAdmin(admin.ModelAdmin):
+    list_display = ('hour', 'status_display', 'sample_count', 'p50_display', 'p90_display', 'p99_display', 'max_display')
+    list_filter = ('status', 'hour')
+    date_hierarchy = 'hour'
+    readonly_fields = ('hour', 'status', 'sample_count', 'total_seconds', 'max_seconds', 'histogram',
+                       'p50_seconds', 'p90_seconds', 'p99_seconds', 'updated_at')
+
+    def status_display(self, obj):
+        return obj.get_status_display()
+    status_display.short_description = 'Status'
+    status_display.admin_order_field = 'status'
+
+    def p50_display(self, obj):
+        return f"{obj.p50_seconds / 60:.1f} min"
+    p50_display.short_description = 'p50'
+    p50_display.admin_order_field = 'p50_seconds'
+
+    def p90_display(self, obj):
+        return f"{obj.p90_seconds / 60:.1f} min"
+    p90_display.short_description = 'p90'
+    p90_display.admin_order_field = 'p90_seconds'
+
+    def p99_display(self, obj):
+        return f"{obj.p99_seconds / 60:.1f} min"
+    p99_display.short_description = 'p99'
+    p99_display.admin_order_field = 'p99_seconds'
+
+    def max_display(self, obj):
+        return f"{obj.max_seconds / 60:.1f} min"
+    max_display.short_description = 'Max'
+    max_display.admin_order_field = 'max_seconds'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+
+@admin.register(Rider)
+class RiderAdmin(admin.ModelAdmin):
+    list_display = ('name', 'phone', 'is_active', 'is_available', 'last_seen_at')
+    list_filter = ('is_active', 'is_available')
+    list_editable = ('is_available',)
+    search_fields = ('name', 'phone', 'user__username')
+    readonly_fields = ('api_token', 'last_latitude', 'last_longitude', 'last_seen_at', 'created_at', 'updated_at')
+    actions = ['regenerate_tokens']
+
+    def regenerate_tokens(self, request, queryset):
+        for rider in queryset:
+            rider.regenerate_token()
+        self.message_user(request, f'{queryset.count()} rider token(s) regenerated. Update the rider apps.')
+    regenerate_tokens.short_description = 'Regenerate API token'
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'product', 'kind', 'quantity', 'order', 'created_by', 'note')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('product__name', 'note')
+    list_select_related = ('product', 'created_by')
+    raw_id_fields = ('order',)
+
+    # The ledger is append-only; corrections are new adjustment movements
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('taken_at', 'product', 'quantity')
+    list_filter = ('taken_at',)
+    search_fields = ('product__name',)
+    list_select_related = ('product',)
+
+
+@admin.register(DeliveryZone)
+class DeliveryZoneAdmin(admin.ModelAdmin):
+    list_display = ('name', 'fee', 'max_distance_km', 'sort_order', 'is_active', 'updated_at')
+    list_editable = ('fee', 'sort_order', 'is_active')
+    list_filter = ('is_active',)
+    search_fields = ('name',)
+
+
+@admin.register(ReservationSlotRule)
+class ReservationSlotRuleAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'weekday', 'opens_at', 'closes_at', 'max_reservations', 'max_items', 'is_active')
+    list_editable = ('max_reservations', 'max_items', 'is_active')
+    list_filter = ('weekday', 'is_active')
+
+
+@admin.register(SlotOccupancy)
+class SlotOccupancyAdmin(admin.ModelAdmin):
+    list_display = ('slot_start', 'reservations', 'items')
+    date_hierarchy = 'slot_start'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('order_number', 'customer_link', 'total_amount_display', 'status_badge', 'created_at', 'order_actions')
@@ -215,7 +334,7 @@ class OrderAdmin(admin.ModelAdmin):
     actions = ['mark_as_processing', 'mark_as_completed', 'mark_as_cancelled']
     fieldsets = (
         ('Order Information', {
-            'fields': ('order_number', 'customer', 'status', 'total_amount', 'notes')
+            'fields': ('order_number', 'customer', 'status', 'total_amount', 'delivery_fee', 'notes')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -262,16 +381,21 @@ class OrderAdmin(admin.ModelAdmin):
 
     def mark_as_processing(self, request, queryset):
         updated = queryset.filter(status='pending').update(status='processing')
+        ChangeCounter.bump(ChangeCounter.KITCHEN_BOARD)
         self.message_user(request, f"{updated} order(s) marked as processing.")
     mark_as_processing.short_description = "Mark selected orders as Processing"
 
     def mark_as_completed(self, request, queryset):
-        updated = queryset.exclude(status='cancelled').update(status='completed')
+        queryset = queryset.exclude(status='cancelled')
+        queryset.filter(completed_at__isnull=True).update(completed_at=timezone.now())
+        updated = queryset.update(status='completed')
+        ChangeCounter.bump(ChangeCounter.KITCHEN_BOARD)
         self.message_user(request, f"{updated} order(s) marked as completed.")
     mark_as_completed.short_description = "Mark selected orders as Completed"
     
     def mark_as_cancelled(self, request, queryset):
         updated = queryset.exclude(status='completed').update(status='cancelled')
+        ChangeCounter.bump(ChangeCounter.KITCHEN_BOARD)
         self.message_user(request, f"{updated} order(s) marked as cancelled.")
     mark_as_cancelled.short_description = "Mark selected orders as Cancelled"
 
@@ -360,7 +484,7 @@ class InvoiceAdmin(admin.ModelAdmin):
             'fields': ('invoice_number', 'order', 'customer', 'status')
         }),
         ('Amounts', {
-            'fields': ('subtotal', 'tax_amount', 'discount_amount', 'total_amount')
+            'fields': ('subtotal', 'delivery_fee', 'tax_amount', 'discount_amount', 'total_amount')
         }),
         ('Customer Details', {
             'fields': ('customer_name', 'customer_email', 'customer_phone', 'customer_address')
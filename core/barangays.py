@@ -0,0 +1,165 @@
+from __future__ import annotations
+import json
+import logging
+import math
+from functools import lru_cache
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Grid cell size in degrees (~550 m at Naval's latitude)
+GRID_CELL_DEGREES = 0.005
+
+
+def _ring_contains(ring, x, y):
+    """Even-odd ray casting test for one closed ring of (x, y) points."""
+    inside = False
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def _bbox(rings):
+    xs = [x for ring in rings for x, _y in ring]
+    ys = [y for ring in rings for _x, y in ring]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class Barangay:
+    """One barangay boundary; holes are handled by counting crossings over all rings."""
+
+    def __init__(self, name, rings):
+        self.name = name
+        self.rings = rings
+        self.bbox = _bbox(rings)
+
+    def contains(self, lng, lat):
+        min_x, min_y, max_x, max_y = self.bbox
+        if not (min_x <= lng <= max_x and min_y <= lat <= max_y):
+            return False
+        inside = False
+        for ring in self.rings:
+            if _ring_contains(ring, lng, lat):
+                inside = not inside
+        return inside
+
+    def crosses_cell(self, min_x, min_y, max_x, max_y):
+        """Conservatively, whether any boundary edge may pass through the cell."""
+        for ring in self.rings:
+            x1, y1 = ring[-1]
+            for x2, y2 in ring:
+                if (min(x1, x2) <= max_x and max(x1, x2) >= min_x
+                        and min(y1, y2) <= max_y and max(y1, y2) >= min_y):
+                    return True
+                x1, y1 = x2, y2
+        return False
+
+
+class BarangayResolver:
+    """Maps coordinates to a barangay using a precomputed uniform grid.
+
+    Every grid cell stores either the single barangay that covers it
+    completely, answering lookups without any geometry, or the short list
+    of barangays whose boundary touches it, which are then tested with
+    point-in-polygon. Lookups are O(1) on average.
+    """
+
+    def __init__(self, barangays, cell_size=GRID_CELL_DEGREES):
+        self.barangays = barangays
+        self.cell_size = cell_size
+        self._cells = {}
+        if not barangays:
+            self.bbox = None
+            return
+        self.bbox = (
+            min(b.bbox[0] for b in barangays), min(b.bbox[1] for b in barangays),
+            max(b.bbox[2] for b in barangays), max(b.bbox[3] for b in barangays),
+        )
+        self._build_grid()
+
+    @classmethod
+    def from_geojson(cls, path, **kwargs):
+        """Load a FeatureCollection of Polygon/MultiPolygon features with a "name" (lon/lat order)."""
+        with open(path, encoding='utf-8') as fh:
+            collection = json.load(fh)
+        barangays = []
+        for feature in collection.get('features', []):
+            geometry = feature.get('geometry') or {}
+            name = (feature.get('properties') or {}).get('name')
+            if not name:
+                continue
+            if geometry.get('type') == 'Polygon':
+                polygons = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons = geometry['coordinates']
+            else:
+                continue
+            rings = [[(float(x), float(y)) for x, y, *_rest in ring] for polygon in polygons for ring in polygon]
+            barangays.append(Barangay(name, rings))
+        return cls(barangays, **kwargs)
+
+    @property
+    def available(self):
+        """False when no boundaries are loaded; callers should then skip checks."""
+        return bool(self.barangays)
+
+    def _cell_key(self, lng, lat):
+        return (math.floor((lng - self.bbox[0]) / self.cell_size),
+                math.floor((lat - self.bbox[1]) / self.cell_size))
+
+    def _build_grid(self):
+        min_x, min_y, _max_x, _max_y = self.bbox
+        candidates = {}
+        for index, barangay in enumerate(self.barangays):
+            first_col, first_row = self._cell_key(barangay.bbox[0], barangay.bbox[1])
+            last_col, last_row = self._cell_key(barangay.bbox[2], barangay.bbox[3])
+            for col in range(first_col, last_col + 1):
+                for row in range(first_row, last_row + 1):
+                    candidates.setdefault((col, row), []).append(index)
+
+        for (col, row), indexes in candidates.items():
+            cell = (min_x + col * self.cell_size, min_y + row * self.cell_size,
+                    min_x + (col + 1) * self.cell_size, min_y + (row + 1) * self.cell_size)
+            touching = [i for i in indexes if self.barangays[i].crosses_cell(*cell)]
+            if touching:
+                self._cells[(col, row)] = touching
+                continue
+            # No boundary passes through: the cell is wholly inside one barangay or none
+            center_x, center_y = (cell[0] + cell[2]) / 2, (cell[1] + cell[3]) / 2
+            owner = next((i for i in indexes if self.barangays[i].contains(center_x, center_y)), None)
+            if owner is not None:
+                self._cells[(col, row)] = owner
+
+    def resolve(self, latitude, longitude):
+        """Return the barangay name containing the point, or None."""
+        if self.bbox is None:
+            return None
+        entry = self._cells.get(self._cell_key(longitude, latitude))
+        if entry is None:
+            return None
+        if isinstance(entry, int):
+            return self.barangays[entry].name
+        for index in entry:
+            if self.barangays[index].contains(longitude, latitude):
+                return self.barangays[index].name
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_barangay_resolver():
+    """Resolver for ``settings.BARANGAY_BOUNDARIES_FILE``, built once per process.
+
+    Without that setting the feature is off: the resolver is empty and
+    ``available`` is False, so callers skip their barangay checks.
+    """
+    path = settings.BARANGAY_BOUNDARIES_FILE
+    if not path:
+        return BarangayResolver([])
+    resolver = BarangayResolver.from_geojson(path)
+    if not resolver.available:
+        logger.warning('No barangay boundaries in %s; barangay checks at checkout are off', path)
+    return resolver
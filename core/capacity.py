@@ -0,0 +1,287 @@
+from __future__ import annotations
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Reservation, ReservationItem, ReservationSlotRule, SlotOccupancy
+
+
+SLOT_MINUTES = ReservationSlotRule.SLOT_MINUTES
+# Days ahead the availability API covers by default (and at most)
+AVAILABILITY_DAYS = 14
+MAX_AVAILABILITY_DAYS = 31
+# Reservations in these states no longer take up their slot
+FREED_STATUSES = ('cancelled',)
+
+
+class SlotUnavailable(Exception):
+    """A booking doesn't fit its time slot; the message is meant for the customer."""
+
+
+def slot_start(moment):
+    """Start of the local time slot containing ``moment``."""
+    local = timezone.localtime(moment)
+    return local.replace(minute=local.minute - local.minute % SLOT_MINUTES, second=0, microsecond=0)
+
+
+def occupied_slot(scheduled_for, status):
+    """The slot a reservation counts against, or None when it takes up none."""
+    if scheduled_for is None or status in FREED_STATUSES:
+        return None
+    return slot_start(scheduled_for)
+
+
+def adjust_occupancy(changes):
+    """Apply ``{slot_start: (reservations, items)}`` deltas to the counters.
+
+    Counters never drop below zero, whatever a missed or repeated event says.
+    """
+    changes = {slot: delta for slot, delta in changes.items() if slot is not None and any(delta)}
+    if not changes:
+        return
+    with transaction.atomic():
+        for slot, (reservations, items) in changes.items():
+            counts = {'reservations': Greatest(F('reservations') + reservations, 0),
+                      'items': Greatest(F('items') + items, 0)}
+            updated = SlotOccupancy.objects.filter(slot_start=slot).update(**counts)
+            if not updated:
+                _occupancy, created = SlotOccupancy.objects.get_or_create(
+                    slot_start=slot, defaults={'reservations': max(reservations, 0), 'items': max(items, 0)})
+                if not created:
+                    SlotOccupancy.objects.filter(slot_start=slot).update(**counts)
+
+
+def _reserved_items(reservation_id):
+    return (ReservationItem.objects
+            .filter(reservation_id=reservation_id)
+            .aggregate(total=Sum('quantity'))['total']) or 0
+
+
+def reservation_saved(reservation, created):
+    """Move a reservation's counts when it is booked, rescheduled or cancelled."""
+    new_slot = occupied_slot(reservation.scheduled_for, reservation.status)
+    old_slot = None
+    if not created:
+        loaded = getattr(reservation, '_loaded_booking', None)
+        if loaded is None:
+            return
+        old_slot = occupied_slot(*loaded)
+    reservation._loaded_booking = (reservation.scheduled_for, reservation.status)
+    if old_slot == new_slot:
+        return
+    items = 0 if created else _reserved_items(reservation.id)
+    changes = defaultdict(lambda: [0, 0])
+    changes[old_slot][0] -= 1
+    changes[old_slot][1] -= items
+    changes[new_slot][0] += 1
+    changes[new_slot][1] += items
+    adjust_occupancy(changes)
+
+
+def reservation_deleting(reservation):
+    """Read the stored booking before a delete; the instance may be a stale copy."""
+    reservation._deleted_booking = (Reservation.objects
+                                    .filter(pk=reservation.pk)
+                                    .values_list('scheduled_for', 'status')
+                                    .first())
+
+
+def reservation_deleted(reservation):
+    """Release the reservation itself; its items release their own counts as they go."""
+    booking = getattr(reservation, '_deleted_booking', None)
+    if booking is not None:
+        adjust_occupancy({occupied_slot(*booking): (-1, 0)})
+
+
+def _reservation_slot(reservation_id):
+    booking = (Reservation.objects
+               .filter(id=reservation_id)
+               .values_list('scheduled_for', 'status')
+               .first())
+    return occupied_slot(*booking) if booking else None
+
+
+def item_saved(item, created):
+    """Count an item's quantity change against its reservation's slot."""
+    loaded = None if created else getattr(item, '_loaded_line', None)
+    loaded_reservation_id, loaded_quantity = loaded[:2] if loaded else (None, 0)
+    if (loaded_reservation_id, loaded_quantity) == (item.reservation_id, item.quantity):
+        return
+    changes = defaultdict(lambda: [0, 0])
+    if loaded_reservation_id is not None:
+        changes[_reservation_slot(loaded_reservation_id)][1] -= loaded_quantity
+    changes[_reservation_slot(item.reservation_id)][1] += item.quantity
+    adjust_occupancy(changes)
+
+
+def item_deleting(item):
+    """Read the stored line before a delete; the instance may be a stale copy."""
+    item._deleted_line = (ReservationItem.objects
+                          .filter(pk=item.pk)
+                          .values_list('reservation_id', 'quantity', 'price')
+                          .first())
+
+
+def item_deleted(item):
+    line = getattr(item, '_deleted_line', None)
+    if line is not None:
+        reservation_id, quantity, _price = line
+        adjust_occupancy({_reservation_slot(reservation_id): (0, -quantity)})
+
+
+def rebuild_occupancy(since=None):
+    """Recount the slot counters from reservations at or after ``since``.
+
+    Repairs drift from bulk updates that bypass the save hooks. Reads the
+    reservations with their item totals in one query. Returns the number of
+    slots written.
+    """
+    since = slot_start(since or timezone.now())
+    counts = defaultdict(lambda: [0, 0])
+    rows = (Reservation.objects
+            .filter(scheduled_for__gte=since)
+            .exclude(status__in=FREED_STATUSES)
+            .annotate(item_total=Sum('items__quantity'))
+            .values_list('scheduled_for', 'item_total')
+            .order_by())
+    for scheduled_for, item_total in rows:
+        slot = counts[slot_start(scheduled_for)]
+        slot[0] += 1
+        slot[1] += item_total or 0
+    with transaction.atomic():
+        SlotOccupancy.objects.filter(slot_start__gte=since).delete()
+        SlotOccupancy.objects.bulk_create([
+            SlotOccupancy(slot_start=slot, reservations=reservations, items=items)
+            for slot, (reservations, items) in counts.items()
+        ])
+    return len(counts)
+
+
+def _rules_by_weekday(rules):
+    every_day = [rule for rule in rules if rule.weekday is None]
+    by_weekday = {weekday: [rule for rule in rules if rule.weekday == weekday] for weekday in range(7)}
+    return {weekday: by_weekday[weekday] or every_day for weekday in range(7)}
+
+
+def _day_slots(day, rules):
+    """``(slot_start, rule)`` for every bookable slot of one local day."""
+    slots = {}
+    for rule in rules:
+        opens = timezone.make_aware(datetime.combine(day, rule.opens_at))
+        moment = slot_start(opens)
+        if moment < opens:
+            moment += timedelta(minutes=SLOT_MINUTES)
+        closes = timezone.make_aware(datetime.combine(day, rule.closes_at))
+        while moment + timedelta(minutes=SLOT_MINUTES) <= closes:
+            slots.setdefault(moment, rule)
+            moment += timedelta(minutes=SLOT_MINUTES)
+    return sorted(slots.items(), key=lambda entry: entry[0])
+
+
+def active_rules():
+    return list(ReservationSlotRule.objects.filter(is_active=True))
+
+
+def slot_has_room(rule, occupancy, reservations=1, items=0):
+    """Whether a slot takes ``reservations`` more bookings bringing ``items`` items.
+
+    A booking counts as at least one item, since items are usually added
+    after the reservation is made.
+    """
+    booked_reservations, booked_items = occupancy
+    if booked_reservations + reservations > rule.max_reservations:
+        return False
+    return rule.max_items is None or booked_items + max(items, reservations) <= rule.max_items
+
+
+def slot_availability(start=None, days=AVAILABILITY_DAYS, rules=None):
+    """Bookable slots for ``days`` days from ``start`` with their remaining room.
+
+    Reads the slot rules and the precomputed occupancy counters for the
+    window in two queries. ``restricted`` is False when no rules are set up,
+    in which case any time can be booked and no slots are listed.
+    """
+    now = timezone.now()
+    start = start or timezone.localdate()
+    rules = active_rules() if rules is None else rules
+    result = {'slot_minutes': SLOT_MINUTES, 'restricted': bool(rules), 'days': []}
+    if not rules:
+        return result
+
+    window_start = timezone.make_aware(datetime.combine(start, time.min))
+    window_end = timezone.make_aware(datetime.combine(start + timedelta(days=days), time.min))
+    occupancy = {
+        timezone.localtime(slot): (reservations, items)
+        for slot, reservations, items in (SlotOccupancy.objects
+                                          .filter(slot_start__gte=window_start, slot_start__lt=window_end)
+                                          .values_list('slot_start', 'reservations', 'items'))
+    }
+    weekday_rules = _rules_by_weekday(rules)
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        slots = []
+        for slot, rule in _day_slots(day, weekday_rules[day.weekday()]):
+            if slot + timedelta(minutes=SLOT_MINUTES) <= now:
+                continue
+            reservations, items = occupancy.get(slot, (0, 0))
+            slots.append({
+                'start': slot.isoformat(),
+                'reservations': reservations,
+                'max_reservations': rule.max_reservations,
+                'items': items,
+                'max_items': rule.max_items,
+                'available': slot_has_room(rule, (reservations, items)),
+            })
+        result['days'].append({'date': day.isoformat(), 'slots': slots})
+    return result
+
+
+def check_booking(moment, reservation=None):
+    """Why ``moment`` can't be booked for ``reservation`` (None for a new one), or None.
+
+    A reservation keeping its current slot always passes; one moving in
+    brings its reserved items along.
+    """
+    rules = active_rules()
+    if not rules:
+        return None
+    slot = slot_start(moment)
+    rule = dict(_day_slots(slot.date(), _rules_by_weekday(rules)[slot.weekday()])).get(slot)
+    if rule is None:
+        return 'We don\'t take reservations at that time.'
+
+    items = 0
+    if reservation is not None and reservation.pk:
+        loaded = getattr(reservation, '_loaded_booking', None)
+        if loaded is not None and occupied_slot(*loaded) == slot:
+            return None
+        items = _reserved_items(reservation.pk)
+    occupancy = (SlotOccupancy.objects
+                 .filter(slot_start=slot)
+                 .values_list('reservations', 'items')
+                 .first()) or (0, 0)
+    if slot_has_room(rule, occupancy, 1, items):
+        return None
+    return 'That time slot is fully booked. Please choose another time.'
+
+
+def book_reservation(reservation):
+    """Save ``reservation`` if its slot still has room, else raise SlotUnavailable.
+
+    Form validation checks capacity without a lock, so two customers can both
+    pass it for the last place. Here the check is repeated with the slot's
+    counter row locked, and the save's signal handler counts the booking
+    before the lock is released.
+    """
+    with transaction.atomic():
+        if reservation.scheduled_for is not None and active_rules():
+            slot = slot_start(reservation.scheduled_for)
+            SlotOccupancy.objects.get_or_create(slot_start=slot)
+            list(SlotOccupancy.objects.select_for_update().filter(slot_start=slot).values_list('pk'))
+            problem = check_booking(reservation.scheduled_for, reservation)
+            if problem:
+                raise SlotUnavailable(problem)
+        reservation.save()
+    return reservation
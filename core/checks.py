@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+from .barangays import get_barangay_resolver
+
+
+@register()
+def barangay_boundaries_check(app_configs, **kwargs):
+    """Warn when BARANGAY_BOUNDARIES_FILE is set but yields no boundaries, which quietly disables the feature."""
+    path = settings.BARANGAY_BOUNDARIES_FILE
+    if not path:
+        return []
+    try:
+        available = get_barangay_resolver().available
+    except (OSError, ValueError) as exc:
+        return [Warning(
+            f'Cannot read the barangay boundaries: {exc}',
+            hint=f'Fix {path} or unset BARANGAY_BOUNDARIES_FILE.',
+            id='core.W002',
+        )]
+    if available:
+        return []
+    return [Warning(
+        f'{path} has no barangay boundaries: checkout does not check or set the delivery barangay '
+        'from the map pin, and resolve_barangays cannot run.',
+        hint='Add one Polygon/MultiPolygon feature with a "name" property per barangay, '
+             'or unset BARANGAY_BOUNDARIES_FILE.',
+        id='core.W001',
+    )]
@@ -0,0 +1,12 @@
+from django.urls import reverse
+from .tiles import SERVED_MIN_ZOOM, SERVED_MAX_ZOOM
+
+
+def map_tiles(request):
+    """Leaflet tile URL template pointing at the local tile proxy, and the zoom levels it serves."""
+    tile_url = reverse('map_tile', kwargs={'z': 0, 'x': 0, 'y': 0})
+    return {
+        'MAP_TILE_URL': tile_url[:-len('0/0/0.png')] + '{z}/{x}/{y}.png',
+        'MAP_MIN_ZOOM': SERVED_MIN_ZOOM,
+        'MAP_MAX_ZOOM': SERVED_MAX_ZOOM,
+    }
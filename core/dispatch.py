@@ -0,0 +1,364 @@
+from __future__ import annotations
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .eta import ROAD_DETOUR_FACTOR, RIDER_SPEED_KMH, HANDOVER_MINUTES
+from .geo import EARTH_RADIUS_KM, STORE_LATITUDE, STORE_LONGITUDE, distance_matrix_km, haversine_km
+from .models import Order, OrderTracking, Rider
+
+
+# Orders that still have to leave the store
+DISPATCHABLE_ORDER_STATUSES = ('pending', 'processing')
+DISPATCHED_TRACKING_STATUSES = ('out_for_delivery', 'delivered', 'cancelled')
+
+# Orders one rider can carry per trip
+DEFAULT_CAPACITY = 5
+MAX_CAPACITY = 20
+# Don't batch an order whose nearest batch-mate is further than this
+MAX_BATCH_SPREAD_KM = 2.0
+
+# A rider stays busy while one of their deliveries is not in one of these
+FINISHED_TRACKING_STATUSES = ('delivered', 'cancelled')
+# Matching rounds per call when other processes keep claiming the chosen riders first
+CLAIM_ATTEMPTS = 3
+# Rider index grid cell size in degrees (~1.1 km)
+RIDER_CELL_DEGREES = 0.01
+# Riders whose last GPS fix is older than this are not offered orders
+RIDER_STALE_AFTER = timedelta(minutes=10)
+# How often an index re-reads changed riders from the database (seconds)
+RIDER_SYNC_SECONDS = 1.0
+# Re-read window overlap, covering rows committed after the previous sync began
+RIDER_SYNC_OVERLAP = timedelta(seconds=30)
+
+KM_PER_DEGREE = math.radians(1) * EARTH_RADIUS_KM
+
+
+def cluster_stops(matrix, capacity, max_spread_km=MAX_BATCH_SPREAD_KM):
+    """Group stops 1..n of ``matrix`` (0 is the store) into batches.
+
+    Each batch is seeded with the unassigned stop furthest from the store and
+    filled with whichever unassigned stop is closest to any stop already in
+    the batch, until the batch is full or the next stop is too far away.
+    """
+    unassigned = list(range(1, len(matrix)))
+    batches = []
+    while unassigned:
+        seed = max(unassigned, key=lambda stop: matrix[0, stop])
+        unassigned.remove(seed)
+        batch = [seed]
+        while unassigned and len(batch) < capacity:
+            gaps = matrix[np.ix_(batch, unassigned)].min(axis=0)
+            nearest = int(gaps.argmin())
+            if gaps[nearest] > max_spread_km:
+                break
+            batch.append(unassigned.pop(nearest))
+        batches.append(batch)
+    return batches
+
+
+def route_length(matrix, route):
+    """Length of a round trip visiting ``route`` in order (starts and ends at route[0])."""
+    return float(sum(matrix[a, b] for a, b in zip(route, route[1:] + route[:1])))
+
+
+def nearest_neighbor_route(matrix, stops):
+    """Round trip from the store (node 0), always driving to the closest unvisited stop."""
+    route = [0]
+    remaining = list(stops)
+    while remaining:
+        here = route[-1]
+        nearest = min(remaining, key=lambda stop: matrix[here, stop])
+        remaining.remove(nearest)
+        route.append(nearest)
+    return route
+
+
+def two_opt(matrix, route):
+    """Improve a round trip by reversing segments while that shortens it."""
+    route = list(route)
+    size = len(route)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, size - 1):
+            for j in range(i + 1, size):
+                a, b = route[i - 1], route[i]
+                c, d = route[j], route[(j + 1) % size]
+                if matrix[a, c] + matrix[b, d] < matrix[a, b] + matrix[c, d] - 1e-9:
+                    route[i:j + 1] = reversed(route[i:j + 1])
+                    improved = True
+    return route
+
+
+def dispatchable_orders():
+    return (Order.objects
+            .filter(status__in=DISPATCHABLE_ORDER_STATUSES)
+            .exclude(tracking__status__in=DISPATCHED_TRACKING_STATUSES)
+            .select_related('customer')
+            .order_by('created_at'))
+
+
+def plan_dispatch(orders=None, capacity=DEFAULT_CAPACITY):
+    """Batch waiting delivery orders and order the stops of each batch.
+
+    Returns ``{'routes': [...], 'unlocated': [...], 'elapsed_ms': float}``;
+    each route lists its stops in driving order with leg distances, and
+    orders without a map pin are returned separately.
+    """
+    started = time.perf_counter()
+    orders = list(dispatchable_orders() if orders is None else orders)
+    located = [o for o in orders if o.delivery_latitude is not None and o.delivery_longitude is not None]
+    unlocated = [o for o in orders if o.delivery_latitude is None or o.delivery_longitude is None]
+
+    routes = []
+    if located:
+        matrix = distance_matrix_km(
+            [STORE_LATITUDE] + [o.delivery_latitude for o in located],
+            [STORE_LONGITUDE] + [o.delivery_longitude for o in located],
+        )
+        for batch in cluster_stops(matrix, capacity):
+            route = two_opt(matrix, nearest_neighbor_route(matrix, batch))
+            stops = []
+            for previous, stop in zip(route, route[1:]):
+                order = located[stop - 1]
+                stops.append({
+                    'order': order,
+                    'latitude': order.delivery_latitude,
+                    'longitude': order.delivery_longitude,
+                    'leg_km': float(matrix[previous, stop]) * ROAD_DETOUR_FACTOR,
+                })
+            distance_km = route_length(matrix, route) * ROAD_DETOUR_FACTOR
+            routes.append({
+                'stops': stops,
+                'distance_km': distance_km,
+                'return_km': float(matrix[route[-1], 0]) * ROAD_DETOUR_FACTOR,
+                # Riding time for the whole loop plus a handover per stop
+                'minutes': distance_km / RIDER_SPEED_KMH * 60 + len(stops) * HANDOVER_MINUTES,
+            })
+
+    return {
+        'routes': routes,
+        'unlocated': unlocated,
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+    }
+
+
+class RiderIndex:
+    """In-memory grid of the positions of available riders.
+
+    Riders sit in buckets of ``cell_size`` degrees. A nearest-rider query
+    scans rings of buckets outward from the query point and stops as soon as
+    no unscanned ring can hold anyone closer than the best match, so it only
+    looks at the few riders around the order rather than at every rider.
+
+    Each process keeps its own index. ``sync`` re-reads only riders whose
+    ``updated_at`` moved since the last sync (location writes and admin edits
+    both bump it), at most once per ``sync_interval``.
+    """
+
+    def __init__(self, cell_size=RIDER_CELL_DEGREES, stale_after=RIDER_STALE_AFTER,
+                 sync_interval=RIDER_SYNC_SECONDS):
+        self.cell_size = cell_size
+        self.stale_after = stale_after
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._cells = defaultdict(set)
+        self._riders = {}
+        self._extent = None
+        self._synced_at = None
+        self._checked = None
+
+    def __len__(self):
+        return len(self._riders)
+
+    def _cell_key(self, latitude, longitude):
+        return math.floor(longitude / self.cell_size), math.floor(latitude / self.cell_size)
+
+    def place(self, rider_id, latitude, longitude, seen_at):
+        """Add or move a rider."""
+        key = self._cell_key(latitude, longitude)
+        with self._lock:
+            previous = self._riders.get(rider_id)
+            if previous is not None and previous[3] != key:
+                self._discard(rider_id, previous[3])
+            self._riders[rider_id] = (latitude, longitude, seen_at, key)
+            self._cells[key].add(rider_id)
+            col, row = key
+            if self._extent is None:
+                self._extent = [col, row, col, row]
+            else:
+                extent = self._extent
+                extent[0], extent[1] = min(extent[0], col), min(extent[1], row)
+                extent[2], extent[3] = max(extent[2], col), max(extent[3], row)
+
+    def remove(self, rider_id):
+        with self._lock:
+            previous = self._riders.pop(rider_id, None)
+            if previous is not None:
+                self._discard(rider_id, previous[3])
+
+    def _discard(self, rider_id, key):
+        bucket = self._cells.get(key)
+        if bucket is not None:
+            bucket.discard(rider_id)
+            if not bucket:
+                del self._cells[key]
+
+    def sync(self, force=False):
+        """Apply rider changes from the database; cheap when nothing changed."""
+        if not force and self._checked is not None and time.monotonic() - self._checked < self.sync_interval:
+            return
+        self._checked = time.monotonic()
+        started = timezone.now()
+        riders = Rider.objects.all()
+        if self._synced_at is not None:
+            riders = riders.filter(updated_at__gte=self._synced_at - RIDER_SYNC_OVERLAP)
+        for rider_id, is_active, is_available, latitude, longitude, seen_at in riders.values_list(
+                'id', 'is_active', 'is_available', 'last_latitude', 'last_longitude', 'last_seen_at'):
+            if is_active and is_available and latitude is not None and longitude is not None:
+                self.place(rider_id, latitude, longitude, seen_at)
+            else:
+                self.remove(rider_id)
+        self._synced_at = started
+
+    def _ring(self, col, row, radius):
+        if radius == 0:
+            yield col, row
+            return
+        for dc in range(-radius, radius + 1):
+            yield col + dc, row - radius
+            yield col + dc, row + radius
+        for dr in range(-radius + 1, radius):
+            yield col - radius, row + dr
+            yield col + radius, row + dr
+
+    def nearest(self, latitude, longitude, exclude=(), now=None):
+        """Return ``(rider_id, distance_km)`` of the closest usable rider, or None."""
+        fresh_after = (now or timezone.now()) - self.stale_after
+        col, row = self._cell_key(latitude, longitude)
+        # Smallest width of a cell on the ground; longitude degrees shrink with latitude
+        ring_km = self.cell_size * KM_PER_DEGREE * math.cos(math.radians(min(abs(latitude), 89.0)))
+        best = None
+        with self._lock:
+            if self._extent is None:
+                return None
+            min_col, min_row, max_col, max_row = self._extent
+            last_ring = max(col - min_col, max_col - col, row - min_row, max_row - row, 0)
+            for radius in range(last_ring + 1):
+                # Anyone in this ring or beyond is at least (radius - 1) cells away
+                if best is not None and best[1] <= (radius - 1) * ring_km:
+                    break
+                candidates = []
+                for key in self._ring(col, row, radius):
+                    for rider_id in self._cells.get(key, ()):
+                        rider = self._riders[rider_id]
+                        if rider_id in exclude or rider[2] is None or rider[2] < fresh_after:
+                            continue
+                        candidates.append((rider_id, rider[0], rider[1]))
+                if not candidates:
+                    continue
+                distances = haversine_km(latitude, longitude,
+                                         [c[1] for c in candidates], [c[2] for c in candidates])
+                closest = int(distances.argmin())
+                if best is None or distances[closest] < best[1]:
+                    best = (candidates[closest][0], float(distances[closest]))
+        return best
+
+
+rider_index = RiderIndex()
+
+
+def busy_rider_ids(rider_ids=None):
+    """Riders carrying or assigned a delivery that hasn't finished (among ``rider_ids``, if given)."""
+    trackings = OrderTracking.objects.filter(rider__isnull=False)
+    if rider_ids is not None:
+        trackings = trackings.filter(rider_id__in=rider_ids)
+    return set(trackings
+               .exclude(status__in=FINISHED_TRACKING_STATUSES)
+               .values_list('rider_id', flat=True)
+               .distinct())
+
+
+def unassigned_orders():
+    return (dispatchable_orders()
+            .filter(delivery_latitude__isnull=False, delivery_longitude__isnull=False)
+            .filter(Q(tracking__isnull=True) | Q(tracking__rider__isnull=True)))
+
+
+def _match_riders(orders, index, busy, now):
+    assignments = {}
+    for order in orders:
+        if order.delivery_latitude is None or order.delivery_longitude is None:
+            continue
+        match = index.nearest(order.delivery_latitude, order.delivery_longitude, exclude=busy, now=now)
+        if match is None:
+            break
+        assignments[order.id] = match[0]
+        busy = busy | {match[0]}
+    return assignments
+
+
+def _claim_riders(assignments, now):
+    """Write ``{order_id: rider_id}`` for riders that are still free.
+
+    The riders are locked first and their workload re-read under the lock,
+    so two checkouts racing for the same rider can't both get them. Returns
+    ``(claimed, taken)``: the assignments written and the riders found busy.
+    """
+    with transaction.atomic():
+        list(Rider.objects.select_for_update().filter(id__in=set(assignments.values())).values_list('id'))
+        taken = busy_rider_ids(set(assignments.values()))
+        assignments = {order_id: rider_id for order_id, rider_id in assignments.items() if rider_id not in taken}
+
+        trackings = list(OrderTracking.objects
+                         .select_for_update()
+                         .filter(order_id__in=assignments, rider__isnull=True))
+        for tracking in trackings:
+            tracking.rider_id = assignments[tracking.order_id]
+            tracking.updated_at = now
+        OrderTracking.objects.bulk_update(trackings, ['rider', 'updated_at'])
+
+        # Orders placed without a tracking row yet; create() records the first status event
+        tracked = set(OrderTracking.objects.filter(order_id__in=assignments).values_list('order_id', flat=True))
+        for order_id in assignments.keys() - tracked:
+            OrderTracking.objects.create(order_id=order_id, rider_id=assignments[order_id])
+
+    assigned = {tracking.order_id for tracking in trackings} | (assignments.keys() - tracked)
+    return {order_id: rider_id for order_id, rider_id in assignments.items() if order_id in assigned}, taken
+
+
+def assign_riders(orders=None, index=None):
+    """Give each unassigned delivery order to the nearest free rider.
+
+    Orders are served oldest first and every rider takes at most one new
+    order per call. Orders without a map pin, or with no free rider in
+    reach, are left for the next run. When another process claims a chosen
+    rider first, the orders involved are matched again without that rider
+    (up to ``CLAIM_ATTEMPTS`` rounds). Returns ``{order_id: rider_id}``.
+    """
+    index = rider_index if index is None else index
+    index.sync()
+    orders = list(unassigned_orders() if orders is None else orders)
+    if not orders:
+        return {}
+
+    now = timezone.now()
+    busy = busy_rider_ids()
+    result = {}
+    for _attempt in range(CLAIM_ATTEMPTS):
+        assignments = _match_riders(orders, index, busy, now)
+        if not assignments:
+            break
+        claimed, taken = _claim_riders(assignments, now)
+        result.update(claimed)
+        if not taken:
+            break
+        busy |= taken | set(claimed.values())
+        orders = [order for order in orders if assignments.get(order.id) in taken]
+    return result
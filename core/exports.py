@@ -0,0 +1,243 @@
+from __future__ import annotations
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .filters import filter_orders, filter_payments, filter_invoices
+from .models import Order, Payment, Invoice
+
+
+# Rows fetched from the database per round trip while streaming
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+
+class ExportSpec:
+    """Columns and filters for one exportable staff list."""
+
+    def __init__(self, model, filter_func, columns):
+        self.model = model
+        self.filter_func = filter_func
+        self.headers = [header for header, _field in columns]
+        self.fields = [field for _header, field in columns]
+
+    def rows(self, params):
+        """Yield plain value tuples, filtered like the staff list view."""
+        queryset = self.filter_func(self.model.objects.all(), params)
+        return queryset.values_list(*self.fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+EXPORTS = {
+    'orders': ExportSpec(Order, filter_orders, [
+        ('Order #', 'id'),
+        ('Created', 'created_at'),
+        ('Customer', 'customer__username'),
+        ('First Name', 'customer__first_name'),
+        ('Last Name', 'customer__last_name'),
+        ('Status', 'status'),
+        ('Total', 'total_amount'),
+        ('Barangay', 'delivery_barangay'),
+        ('Delivery Address', 'delivery_address'),
+        ('Notes', 'notes'),
+    ]),
+    'payments': ExportSpec(Payment, filter_payments, [
+        ('Payment #', 'id'),
+        ('Order #', 'order_id'),
+        ('Customer', 'customer__username'),
+        ('Amount', 'amount'),
+        ('Method', 'payment_method'),
+        ('Status', 'status'),
+        ('Transaction ID', 'transaction_id'),
+        ('Reference Number', 'reference_number'),
+        ('Payment Date', 'payment_date'),
+        ('Created', 'created_at'),
+    ]),
+    'invoices': ExportSpec(Invoice, filter_invoices, [
+        ('Invoice Number', 'invoice_number'),
+        ('Order #', 'order_id'),
+        ('Customer Name', 'customer_name'),
+        ('Customer Email', 'customer_email'),
+        ('Status', 'status'),
+        ('Issued', 'issued_date'),
+        ('Due', 'due_date'),
+        ('Subtotal', 'subtotal'),
+        ('Delivery Fee', 'delivery_fee'),
+        ('Tax', 'tax_amount'),
+        ('Discount', 'discount_amount'),
+        ('Total', 'total_amount'),
+    ]),
+}
+
+
+def _format_value(value):
+    """Convert a database value to the text written in exports."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """File-like object that hands back whatever is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_safe(value):
+    # Keep spreadsheet apps from evaluating user-entered text as a formula
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def stream_csv(headers, rows):
+    """Yield CSV lines for the header and each row."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([_csv_safe(_format_value(value)) for value in row])
+
+
+class _ChunkBuffer:
+    """Unseekable sink that collects zip output until it is drained."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+
+_XLSX_SHEET_TAIL = '</sheetData></worksheet>'
+
+# Characters that are not allowed in XML 1.0 documents
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Bytes of compressed output to collect before handing a chunk to the response
+_XLSX_FLUSH_BYTES = 64 * 1024
+
+
+def _xlsx_cell(value):
+    value = _format_value(value)
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_ILLEGAL_XML_CHARS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return ('<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>').encode()
+
+
+def stream_xlsx(headers, rows, sheet_name='Export'):
+    """Yield an XLSX workbook with a single sheet, row by row.
+
+    The zip is written to an unseekable buffer (entries use data descriptors),
+    so memory stays bounded no matter how many rows are exported.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        workbook.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        workbook.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(name=escape(sheet_name[:31])))
+        workbook.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(_XLSX_SHEET_HEAD.encode())
+            sheet.write(_xlsx_row(headers))
+            for row in rows:
+                sheet.write(_xlsx_row(row))
+                if buffer.size >= _XLSX_FLUSH_BYTES:
+                    yield buffer.drain()
+            sheet.write(_XLSX_SHEET_TAIL.encode())
+    yield buffer.drain()
+
+
+def export_chunks(kind, export_format, params):
+    """Yield the encoded export for ``kind`` ('orders', 'payments', 'invoices')."""
+    spec = EXPORTS[kind]
+    rows = spec.rows(params)
+    if export_format == 'xlsx':
+        return stream_xlsx(spec.headers, rows, sheet_name=kind.title())
+    return (line.encode('utf-8') for line in stream_csv(spec.headers, rows))
+
+
+def export_response(kind, export_format, params):
+    """Build a streaming download response for a staff list export."""
+    content_types = {
+        'csv': 'text/csv; charset=utf-8',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    }
+    filename = f"{kind}-{timezone.localdate():%Y%m%d}.{export_format}"
+    response = StreamingHttpResponse(
+        export_chunks(kind, export_format, params),
+        content_type=content_types[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import math
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal
+import numpy as np
+from .geo import NAVAL_BBOX, STORE_LATITUDE, STORE_LONGITUDE, haversine_km
+from .models import DeliveryZone, ChangeCounter
+
+
+# Lookup grid cell size in degrees (~55 m); zone edges are accurate to about half a cell
+FEE_GRID_DEGREES = 0.0005
+# Area the lookup grid covers; anything outside is not deliverable
+FEE_BBOX = NAVAL_BBOX
+# How often a process checks whether zones were edited (seconds)
+ZONE_CHECK_SECONDS = 5.0
+
+FeeZone = namedtuple('FeeZone', 'id name fee')
+
+
+def _polygons(boundary):
+    if boundary.get('type') == 'Polygon':
+        return [boundary['coordinates']]
+    return boundary.get('coordinates', [])
+
+
+def polygon_mask(boundary, longitudes, latitudes):
+    """Vectorized even-odd test of many points against a GeoJSON geometry."""
+    inside = np.zeros(longitudes.shape, dtype=bool)
+    for polygon in _polygons(boundary):
+        for ring in polygon:
+            ring = np.asarray(ring, dtype=float)[:, :2]
+            x1, y1 = ring[-1]
+            for x2, y2 in ring:
+                if y1 != y2:
+                    crosses = ((y1 > latitudes) != (y2 > latitudes)) & (
+                        longitudes < x1 + (latitudes - y1) * (x2 - x1) / (y2 - y1))
+                    inside ^= crosses
+                x1, y1 = x2, y2
+    return inside
+
+
+class FeeTable:
+    """Delivery zone of every cell in a fixed grid over the delivery area.
+
+    Built in one vectorized pass whenever zones change, after which a fee
+    lookup is two multiplications and an array index, whatever the number or
+    shape of the zones.
+    """
+
+    def __init__(self, zones, cell_size=FEE_GRID_DEGREES, bbox=FEE_BBOX):
+        self.zones = [FeeZone(zone.id, zone.name, zone.fee) for zone in zones]
+        self.cell_size = cell_size
+        self.bbox = bbox
+        min_lng, min_lat, max_lng, max_lat = bbox
+        rows = math.ceil((max_lat - min_lat) / cell_size)
+        cols = math.ceil((max_lng - min_lng) / cell_size)
+        self.grid = np.full((rows, cols), -1, dtype=np.int16)
+        if not zones:
+            return
+
+        latitudes = (min_lat + (np.arange(rows) + 0.5) * cell_size)[:, None]
+        longitudes = (min_lng + (np.arange(cols) + 0.5) * cell_size)[None, :]
+        latitudes, longitudes = np.broadcast_arrays(latitudes, longitudes)
+        distances = haversine_km(STORE_LATITUDE, STORE_LONGITUDE, latitudes, longitudes)
+        # Later zones only fill cells no earlier zone claimed
+        for index, zone in enumerate(zones):
+            covered = self.grid == -1
+            if zone.max_distance_km is not None:
+                covered &= distances <= zone.max_distance_km
+            if zone.boundary:
+                covered &= polygon_mask(zone.boundary, longitudes, latitudes)
+            self.grid[covered] = index
+
+    @property
+    def available(self):
+        """False when no zones are configured; checkout then charges no fee."""
+        return bool(self.zones)
+
+    def lookup(self, latitude, longitude):
+        """Return the ``FeeZone`` for a point, or None outside every zone."""
+        min_lng, min_lat, _max_lng, _max_lat = self.bbox
+        row = math.floor((latitude - min_lat) / self.cell_size)
+        col = math.floor((longitude - min_lng) / self.cell_size)
+        if not (0 <= row < self.grid.shape[0] and 0 <= col < self.grid.shape[1]):
+            return None
+        index = self.grid[row, col]
+        return self.zones[index] if index >= 0 else None
+
+
+_lock = threading.Lock()
+_table = None
+_version = None
+_checked = 0.0
+
+
+def get_fee_table():
+    """Fee table for the active zones, rebuilt after zones change."""
+    global _table, _version, _checked
+    with _lock:
+        if _table is not None and time.monotonic() - _checked < ZONE_CHECK_SECONDS:
+            return _table
+        _checked = time.monotonic()
+        version = ChangeCounter.current(ChangeCounter.DELIVERY_ZONES)
+        if _table is None or version != _version:
+            _table = FeeTable(list(DeliveryZone.objects.filter(is_active=True)))
+            _version = version
+        return _table
+
+
+def quote_delivery_fee(latitude, longitude):
+    """``{'deliverable', 'zone', 'fee'}`` for a pinned location."""
+    table = get_fee_table()
+    if not table.available:
+        return {'deliverable': True, 'zone': None, 'fee': Decimal('0.00')}
+    zone = table.lookup(latitude, longitude)
+    if zone is None:
+        return {'deliverable': False, 'zone': None, 'fee': None}
+    return {'deliverable': True, 'zone': zone.name, 'fee': zone.fee}
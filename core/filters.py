@@ -0,0 +1,87 @@
+from __future__ import annotations
+from django.db.models import Q
+from django.db.models.functions import Upper
+from .search import (
+    invoice_number_q, matching_customers, parse_number, prefix_q, looks_like_invoice_number, looks_like_reference,
+)
+
+
+# Staff search boxes route each kind of input to an indexed lookup:
+# order numbers -> primary key, "INV-..." -> invoice number prefix,
+# reference-like codes -> case-insensitive indexes on the payment columns, or
+# the invoice number without its "INV-" (plus the name index, since usernames
+# can contain digits), words -> name token index.
+
+
+def filter_orders(orders, params):
+    """Apply the staff order list filters (``status``, ``search``)."""
+    status_filter = params.get('status')
+    if status_filter:
+        orders = orders.filter(status=status_filter)
+
+    search = (params.get('search') or '').strip()
+    if search:
+        order_number = parse_number(search)
+        if order_number is not None:
+            orders = orders.filter(Q(id=order_number) | invoice_number_q('invoice__invoice_number', search))
+        elif looks_like_invoice_number(search):
+            orders = orders.filter(invoice_number_q('invoice__invoice_number', search))
+        elif looks_like_reference(search):
+            orders = orders.filter(invoice_number_q('invoice__invoice_number', search) |
+                                   Q(customer_id__in=matching_customers(search)))
+        else:
+            orders = orders.filter(customer_id__in=matching_customers(search))
+    return orders
+
+
+def filter_payments(payments, params):
+    """Apply the staff payment list filters (``status``, ``method``, ``search``)."""
+    status_filter = params.get('status')
+    if status_filter:
+        payments = payments.filter(status=status_filter)
+
+    method_filter = params.get('method')
+    if method_filter:
+        payments = payments.filter(payment_method=method_filter)
+
+    search = (params.get('search') or '').strip()
+    if search:
+        order_number = parse_number(search)
+        if order_number is not None:
+            # Numeric input may be an order number or a numeric reference (e.g. GCash)
+            payments = payments.filter(
+                Q(order_id=order_number) |
+                Q(reference_number=search) |
+                Q(transaction_id=search)
+            )
+        elif looks_like_reference(search):
+            # Usernames can look like codes too ("juan23"), so customers still match
+            payments = (payments
+                        .alias(reference_key=Upper('reference_number'), transaction_key=Upper('transaction_id'))
+                        .filter(prefix_q('reference_key', search.upper()) |
+                                prefix_q('transaction_key', search.upper()) |
+                                Q(customer_id__in=matching_customers(search))))
+        else:
+            payments = payments.filter(customer_id__in=matching_customers(search))
+    return payments
+
+
+def filter_invoices(invoices, params):
+    """Apply the staff invoice list filters (``status``, ``search``)."""
+    status_filter = params.get('status')
+    if status_filter:
+        invoices = invoices.filter(status=status_filter)
+
+    search = (params.get('search') or '').strip()
+    if search:
+        order_number = parse_number(search)
+        if order_number is not None:
+            invoices = invoices.filter(Q(order_id=order_number) | invoice_number_q('invoice_number', search))
+        elif looks_like_invoice_number(search):
+            invoices = invoices.filter(invoice_number_q('invoice_number', search))
+        elif looks_like_reference(search):
+            invoices = invoices.filter(invoice_number_q('invoice_number', search) |
+                                       Q(customer_id__in=matching_customers(search)))
+        else:
+            invoices = invoices.filter(customer_id__in=matching_customers(search))
+    return invoices
@@ -0,0 +1,129 @@
+from __future__ import annotations
+import math
+from datetime import datetime, time, timedelta
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import OrderItem
+
+
+# Days of order history the models are fitted on (whole weeks keep weekdays balanced)
+HISTORY_DAYS = 8 * 7
+# Days ahead the forecast covers, starting today
+FORECAST_DAYS = 7
+# Weight of the newest day in the exponentially smoothed demand level
+SMOOTHING_ALPHA = 0.3
+# Extra share prepared on top of the forecast so a busy day doesn't sell out
+SAFETY_MARGIN = 0.15
+# Orders that never went ahead don't count as demand
+EXCLUDED_ORDER_STATUSES = ('cancelled',)
+CACHE_KEY = 'demand_forecast:{}'
+
+
+def daily_quantities(start, end, tzinfo=None):
+    """Units sold per product per day for ``start <= day < end``.
+
+    One grouped query; returns ``(product_ids, days, counts)`` where ``counts``
+    is a (products, days) float array with zeros for days without sales.
+    """
+    tzinfo = tzinfo or timezone.get_current_timezone()
+    start_at = timezone.make_aware(datetime.combine(start, time.min), tzinfo)
+    end_at = timezone.make_aware(datetime.combine(end, time.min), tzinfo)
+    rows = list(OrderItem.objects
+                .filter(order__created_at__gte=start_at, order__created_at__lt=end_at)
+                .exclude(order__status__in=EXCLUDED_ORDER_STATUSES)
+                .annotate(day=TruncDate('order__created_at', tzinfo=tzinfo))
+                .values_list('product_id', 'day')
+                .annotate(total=Sum('quantity'))
+                .order_by())
+    days = [start + timedelta(days=offset) for offset in range((end - start).days)]
+    product_ids = sorted({product_id for product_id, _day, _total in rows})
+    counts = np.zeros((len(product_ids), len(days)))
+    if rows:
+        product_index = {product_id: index for index, product_id in enumerate(product_ids)}
+        product_ids_col, days_col, totals = zip(*rows)
+        counts[[product_index[product_id] for product_id in product_ids_col],
+               [(day - start).days for day in days_col]] = totals
+    return product_ids, days, counts
+
+
+def weekday_profile(counts, weekdays):
+    """Average units per weekday, shape (products, 7), Monday first."""
+    sums = np.zeros((counts.shape[0], 7))
+    np.add.at(sums.T, weekdays, counts.T)
+    occurrences = np.bincount(weekdays, minlength=7)
+    return np.divide(sums, occurrences, out=np.zeros_like(sums), where=occurrences > 0)
+
+
+def smoothed_level(counts, seasonal, weekdays, alpha=SMOOTHING_ALPHA):
+    """Exponentially smoothed, weekday-adjusted demand level per product.
+
+    Each day's sales are divided by that weekday's seasonal factor before
+    being blended into the level, all products at once; days whose factor
+    is zero carry no information and leave the level unchanged.
+    """
+    level = counts.mean(axis=1)
+    for day, weekday in enumerate(weekdays):
+        factor = seasonal[:, weekday]
+        adjusted = np.divide(counts[:, day], factor, out=level.copy(), where=factor > 0)
+        level = alpha * adjusted + (1 - alpha) * level
+    return level
+
+
+def fit_forecast(counts, weekdays, target_weekdays, alpha=SMOOTHING_ALPHA):
+    """Forecast units per product for each of ``target_weekdays``.
+
+    Combines a seasonal day-of-week profile (each weekday's average relative
+    to the product's overall average) with an exponentially smoothed level,
+    so recent trend shifts show up while the weekly pattern is kept.
+    Returns ``(forecast, weekday_average)`` arrays of shape (products, targets).
+    """
+    profile = weekday_profile(counts, weekdays)
+    overall = profile.mean(axis=1, keepdims=True)
+    seasonal = np.divide(profile, overall, out=np.ones_like(profile), where=overall > 0)
+    level = smoothed_level(counts, seasonal, weekdays, alpha)
+    forecast = level[:, None] * seasonal[:, target_weekdays]
+    return forecast, profile[:, target_weekdays]
+
+
+def demand_forecast(today=None):
+    """Forecast demand for the next ``FORECAST_DAYS`` from the order history.
+
+    Fitted on complete days only, so the result is cached until midnight,
+    when the next day's sales become part of the history. Returns
+    ``{'days': [...], 'products': {product_id: {...}}}``; products without
+    sales in the history window are left out.
+    """
+    today = today or timezone.localdate()
+    key = CACHE_KEY.format(today.isoformat())
+    forecast = cache.get(key)
+    if forecast is not None:
+        return forecast
+
+    product_ids, days, counts = daily_quantities(today - timedelta(days=HISTORY_DAYS), today)
+    if counts.any():
+        # A shop with a short history shouldn't have its missing weeks count as zero sales
+        first_sale = int(np.argmax(counts.any(axis=0)))
+        days, counts = days[first_sale:], counts[:, first_sale:]
+    targets = [today + timedelta(days=offset) for offset in range(FORECAST_DAYS)]
+    predicted, averages = fit_forecast(
+        counts,
+        np.array([day.weekday() for day in days], dtype=int),
+        np.array([day.weekday() for day in targets], dtype=int),
+    )
+    forecast = {
+        'days': targets,
+        'products': {
+            product_id: {
+                'forecast': [round(float(value), 1) for value in predicted[index]],
+                'weekday_average': [round(float(value), 1) for value in averages[index]],
+                'prepare': [math.ceil(value * (1 + SAFETY_MARGIN)) for value in predicted[index]],
+            }
+            for index, product_id in enumerate(product_ids)
+        },
+    }
+    tomorrow = timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+    cache.set(key, forecast, max(int((tomorrow - timezone.now()).total_seconds()), 60))
+    return forecast
@@ -1,8 +1,14 @@
 from __future__ import annotations
+from decimal import Decimal
 from django import forms
+from django.core.exceptions import ValidationError
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Reservation, ReservationItem, JournalEntry, Article, Feedback, Order, OrderItem, Product, OrderTracking, Payment, Invoice
+from django.db import transaction
+from .barangays import get_barangay_resolver
+from .capacity import book_reservation, check_booking
+from .fees import get_fee_table, quote_delivery_fee
+from .models import Reservation, ReservationItem, JournalEntry, Article, Feedback, Order, OrderItem, Product, OrderTracking, Payment, Invoice, StockMovement
 
 
 class RegisterForm(UserCreationForm):
@@ -57,6 +63,20 @@ class ReservationForm(forms.ModelForm):
             'notes': 'Special Instructions',
         }
 
+    def clean_scheduled_for(self):
+        scheduled_for = self.cleaned_data['scheduled_for']
+        problem = check_booking(scheduled_for, self.instance)
+        if problem:
+            raise forms.ValidationError(problem)
+        return scheduled_for
+
+    def save(self, commit=True):
+        """Save through ``book_reservation``, which may raise SlotUnavailable."""
+        reservation = super().save(commit=False)
+        if commit:
+            book_reservation(reservation)
+        return reservation
+
 
 class ReservationItemForm(forms.ModelForm):
     """Form for adding items to a reservation."""
@@ -299,6 +319,33 @@ class CheckoutForm(forms.Form):
         required=False
     )
 
+    def clean(self):
+        """Take the barangay and delivery fee from the pinned map location."""
+        cleaned_data = super().clean()
+        latitude = cleaned_data.get('delivery_latitude')
+        longitude = cleaned_data.get('delivery_longitude')
+        pinned = latitude is not None and longitude is not None
+        cleaned_data['delivery_fee'] = Decimal('0.00')
+
+        resolver = get_barangay_resolver()
+        if pinned and resolver.available:
+            barangay = resolver.resolve(latitude, longitude)
+            if barangay is None:
+                self.add_error(None, 'The pinned location is outside our delivery area in Naval. Please move the pin to your address.')
+                return cleaned_data
+            cleaned_data['delivery_barangay'] = barangay
+
+        if get_fee_table().available:
+            if not pinned:
+                self.add_error(None, 'Please pin your delivery location on the map so we can work out the delivery fee.')
+                return cleaned_data
+            quote = quote_delivery_fee(latitude, longitude)
+            if not quote['deliverable']:
+                self.add_error(None, 'We do not deliver to the pinned location yet. Please move the pin to your address.')
+            else:
+                cleaned_data['delivery_fee'] = quote['fee']
+        return cleaned_data
+
 
 class ProductSearchForm(forms.Form):
     """Form for searching and filtering products."""
@@ -356,24 +403,137 @@ class ProductSearchForm(forms.Form):
     )
 
 
+# Movement kinds staff may record by hand; sales come from orders
+STOCK_UPDATE_KINDS = [choice for choice in StockMovement.KIND_CHOICES if choice[0] != 'sale']
+
+
 class ProductStockForm(forms.ModelForm):
-    """Form for managing product stock and availability."""
+    """Form for managing product stock and availability.
+
+    Quantity changes are not written over ``stock_quantity``; the difference
+    from the stored value goes into the stock ledger as one movement.
+    """
+    movement_kind = forms.ChoiceField(
+        choices=STOCK_UPDATE_KINDS,
+        initial='adjustment',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Reason for Change'
+    )
+    movement_note = forms.CharField(
+        max_length=255,
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'e.g., Delivery from supplier, spoiled batch, customer return'
+        }),
+        label='Note'
+    )
     
     class Meta:
         model = Product
-        fields = ['stock_quantity', 'is_active']
+        fields = ['stock_quantity', 'low_stock_threshold', 'is_active']
         widgets = {
             'stock_quantity': forms.NumberInput(attrs={
                 'class': 'form-control',
                 'min': '0',
                 'placeholder': 'Enter stock quantity'
             }),
+            'low_stock_threshold': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0'
+            }),
             'is_active': forms.CheckboxInput(attrs={
                 'class': 'form-check-input'
             })
         }
         labels = {
             'stock_quantity': 'Stock Quantity',
+            'low_stock_threshold': 'Low Stock Threshold',
             'is_active': 'Available for Sale'
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        if 'stock_quantity' in cleaned_data and 'movement_kind' in cleaned_data:
+            problem = StockMovement.direction_error(
+                cleaned_data['movement_kind'], cleaned_data['stock_quantity'] - self.initial['stock_quantity'])
+            if problem:
+                self.add_error('stock_quantity', problem)
+        return cleaned_data
+
+    def save(self, user=None):
+        product = super().save(commit=False)
+        delta = self.cleaned_data['stock_quantity'] - self.initial['stock_quantity']
+        with transaction.atomic():
+            product.save(update_fields=['low_stock_threshold', 'is_active', 'updated_at'])
+            StockMovement.record([StockMovement(
+                product=product,
+                kind=self.cleaned_data['movement_kind'],
+                quantity=delta,
+                note=self.cleaned_data['movement_note'],
+                created_by=user,
+            )])
+        product.refresh_from_db(fields=['stock_quantity'])
+        return product
+
+
+class BulkStockForm(forms.ModelForm):
+    """One product row of the bulk stock editor and of stock imports.
+
+    The quantity carries its originally shown value in a hidden input, so a
+    row only counts as changed when the user edited it and sales made while
+    the page was open are not undone.
+    """
+    stock_quantity = forms.IntegerField(
+        min_value=0,
+        show_hidden_initial=True,
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'min': '0'})
+    )
+
+    class Meta:
+        model = Product
+        fields = ['stock_quantity', 'low_stock_threshold', 'is_active']
+        widgets = {
+            'low_stock_threshold': forms.NumberInput(attrs={
+                'class': 'form-control form-control-sm',
+                'min': '0'
+            }),
+            'is_active': forms.CheckboxInput(attrs={
+                'class': 'form-check-input'
+            })
+        }
+
+    def stock_delta(self):
+        """Quantity change made in this row, relative to the value the user saw."""
+        field = self.fields['stock_quantity']
+        shown = field.hidden_widget().value_from_datadict(
+            self.data, self.files, self.add_initial_prefix('stock_quantity'))
+        try:
+            shown = field.to_python(shown)
+        except ValidationError:
+            shown = None
+        if shown is None:
+            shown = self.initial['stock_quantity']
+        return self.cleaned_data['stock_quantity'] - shown
+
+
+BulkStockFormSet = forms.modelformset_factory(Product, form=BulkStockForm, extra=0)
+
+
+class StockBatchForm(forms.Form):
+    """Reason recorded on every movement of a bulk stock update."""
+    movement_kind = forms.ChoiceField(
+        choices=STOCK_UPDATE_KINDS,
+        initial='adjustment',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Reason for Change'
+    )
+    movement_note = forms.CharField(
+        max_length=255,
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'e.g., Morning stock count'
+        }),
+        label='Note'
+    )
@@ -0,0 +1,26 @@
+from __future__ import annotations
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Where riders start from; same point the maps default to for Naval, Biliran
+STORE_LATITUDE = 11.5667
+STORE_LONGITUDE = 124.5667
+
+# Naval, Biliran as (min_lng, min_lat, max_lng, max_lat), including the store area
+NAVAL_BBOX = (124.33, 11.45, 124.62, 11.68)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km; accepts scalars or NumPy arrays (broadcast)."""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(value, dtype=float)) for value in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distance_matrix_km(latitudes, longitudes):
+    """Pairwise great-circle distances between all points, as an (n, n) array."""
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    return haversine_km(latitudes[:, None], longitudes[:, None], latitudes[None, :], longitudes[None, :])
@@ -0,0 +1,95 @@
+from __future__ import annotations
+import math
+from datetime import datetime, time, timedelta
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+from .geo import NAVAL_BBOX
+from .models import Order, ChangeCounter
+
+
+# Cell sizes offered by the heatmap, in degrees (~220 m, ~550 m, ~1.1 km)
+RESOLUTIONS = (0.002, 0.005, 0.01)
+DEFAULT_RESOLUTION = 0.005
+DEFAULT_DAYS = 365
+# Area the grid covers; orders pinned outside it are not drawn
+HEATMAP_BBOX = NAVAL_BBOX
+# Upper bound on a cached grid's age, so rows missed by the id watermark
+# (an older transaction committing late) are eventually counted
+CACHE_SECONDS = 3600
+CACHE_KEY = 'delivery_heatmap:{}:{}:{}:{}'
+
+
+def grid_shape(resolution, bbox=HEATMAP_BBOX):
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return math.ceil((max_lat - min_lat) / resolution), math.ceil((max_lng - min_lng) / resolution)
+
+
+def bin_points(latitudes, longitudes, resolution, bbox=HEATMAP_BBOX):
+    """Count points per grid cell; returns an int32 array of shape (rows, cols)."""
+    min_lng, min_lat, _max_lng, _max_lat = bbox
+    rows, cols = grid_shape(resolution, bbox)
+    counts, _lat_edges, _lng_edges = np.histogram2d(
+        latitudes, longitudes, bins=(rows, cols),
+        range=((min_lat, min_lat + rows * resolution), (min_lng, min_lng + cols * resolution)),
+    )
+    return counts.astype(np.int32)
+
+
+def _range_orders(start, end):
+    start_at = timezone.make_aware(datetime.combine(start, time.min))
+    end_at = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    return Order.objects.filter(
+        created_at__gte=start_at, created_at__lt=end_at,
+        delivery_latitude__isnull=False, delivery_longitude__isnull=False,
+    )
+
+
+def _fetch_points(queryset):
+    rows = np.array(list(queryset.values_list('id', 'delivery_latitude', 'delivery_longitude')), dtype=float)
+    if not len(rows):
+        return 0, np.empty(0), np.empty(0)
+    return int(rows[:, 0].max()), rows[:, 1], rows[:, 2]
+
+
+def delivery_heatmap(start, end, resolution=DEFAULT_RESOLUTION):
+    """Order counts per grid cell for orders placed between two dates (inclusive).
+
+    The dense grid is cached per (date range, resolution) together with the
+    highest order id it includes and when it was built. Later calls only bin
+    orders above that id and add them to the cached grid, until the grid is
+    ``CACHE_SECONDS`` old and gets rebuilt; edits that move or delete orders
+    bump ``ChangeCounter.DELIVERY_HEATMAP``, which starts new grids at once.
+    Returns a sparse JSON-ready dict of non-empty cells.
+    """
+    generation = ChangeCounter.current(ChangeCounter.DELIVERY_HEATMAP)
+    key = CACHE_KEY.format(generation, start.isoformat(), end.isoformat(), resolution)
+    orders = _range_orders(start, end)
+
+    now = timezone.now().timestamp()
+    cached = cache.get(key)
+    if cached is None or now - cached[0] > CACHE_SECONDS:
+        last_id, latitudes, longitudes = _fetch_points(orders)
+        counts = bin_points(latitudes, longitudes, resolution)
+        cache.set(key, (now, last_id, counts), CACHE_SECONDS)
+    else:
+        built_at, last_id, counts = cached
+        new_last_id, latitudes, longitudes = _fetch_points(orders.filter(id__gt=last_id))
+        if len(latitudes):
+            counts = counts + bin_points(latitudes, longitudes, resolution)
+            last_id = new_last_id
+            # Keeps the original build time, so the grid is still rebuilt CACHE_SECONDS after it
+            cache.set(key, (built_at, last_id, counts), max(int(built_at + CACHE_SECONDS - now), 1))
+
+    min_lng, min_lat, _max_lng, _max_lat = HEATMAP_BBOX
+    rows, cols = np.nonzero(counts)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'resolution': resolution,
+        'origin': [min_lat, min_lng],
+        'shape': list(counts.shape),
+        'total': int(counts.sum()),
+        'max': int(counts.max()) if counts.size else 0,
+        'cells': np.column_stack((rows, cols, counts[rows, cols])).tolist(),
+    }
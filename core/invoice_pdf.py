@@ -0,0 +1,335 @@
+from __future__ import annotations
+import hashlib
+import io
+import json
+import os
+import tempfile
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+
+
+SHOP_NAME = 'BBQ Grill'
+# Part of every cache key, so a layout change re-renders cached files
+RENDERER_VERSION = 2
+# The standard PDF fonts have no peso sign
+CURRENCY = 'PHP'
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+# Line items per page; the first page also carries the header blocks
+FIRST_PAGE_ROWS = 26
+PAGE_ROWS = 40
+ROW_HEIGHT = 16
+# Characters per line that fit the text columns at the sizes used below
+NAME_CHARS = 48
+BLOCK_CHARS = 40
+NOTE_CHARS = 90
+
+FONTS = {'F1': 'Helvetica', 'F2': 'Helvetica-Bold', 'F3': 'Courier'}
+
+
+def _escape(text):
+    text = str(text).replace('₱', CURRENCY + ' ')
+    encoded = text.encode('cp1252', errors='replace').decode('latin-1')
+    return encoded.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+class PdfCanvas:
+    """Just enough of PDF to lay out text and rules on A4 pages.
+
+    Uses the standard Helvetica and Courier fonts, so nothing is embedded
+    and the output stays a few kilobytes. No timestamps are written, so
+    the same content always produces the same bytes.
+    """
+
+    def __init__(self):
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+
+    def text(self, x, y, text, font='F1', size=10):
+        self.ops.append(f'BT /{font} {size} Tf {x:.2f} {y:.2f} Td ({_escape(text)}) Tj ET')
+
+    def text_right(self, x, y, text, size=10):
+        """Courier text ending at ``x``; a fixed-width font keeps amounts lined up."""
+        self.text(x - len(str(text)) * size * 0.6, y, text, font='F3', size=size)
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self.ops.append(f'{width} w {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S')
+
+    def rect(self, x, y, width, height, gray=0.92):
+        self.ops.append(f'{gray} g {x:.2f} {y:.2f} {width:.2f} {height:.2f} re f 0 g')
+
+    def render(self):
+        objects = [None, None]  # catalog and page tree, filled in below
+        font_refs = {}
+        for name, base_font in FONTS.items():
+            objects.append(f'<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} '
+                           f'/Encoding /WinAnsiEncoding >>')
+            font_refs[name] = len(objects)
+        fonts = ' '.join(f'/{name} {ref} 0 R' for name, ref in font_refs.items())
+        page_refs = []
+        for ops in self.pages:
+            stream = '\n'.join(ops).encode('latin-1')
+            objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+            objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                           f'/Resources << /Font << {fonts} >> >> /Contents {len(objects)} 0 R >>')
+            page_refs.append(len(objects))
+        objects[0] = '<< /Type /Catalog /Pages 2 0 R >>'
+        objects[1] = (f'<< /Type /Pages /Kids [{" ".join(f"{ref} 0 R" for ref in page_refs)}] '
+                      f'/Count {len(page_refs)} >>')
+
+        out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += b'%d 0 obj\n' % number
+            out += body if isinstance(body, bytes) else body.encode('latin-1')
+            out += b'\nendobj\n'
+        xref = len(out)
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        for offset in offsets:
+            out += b'%010d 00000 n \n' % offset
+        out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+        return bytes(out)
+
+
+def _money(amount):
+    return f'{CURRENCY} {Decimal(amount):,.2f}'
+
+
+def _amount(value):
+    # Unsaved instances may hold 0 or floats where the database returns Decimal('0.00')
+    return f'{Decimal(value):.2f}'
+
+
+def _date(value, fmt='%B %d, %Y'):
+    return value.strftime(fmt) if value else ''
+
+
+def invoice_snapshot(invoice, items=None):
+    """Everything printed on an invoice, as a plain JSON-ready dict.
+
+    The snapshot is both the cache key's input and the renderer's only
+    argument, so rendering needs no database access and can run in another
+    process. ``items`` may be passed as ``(name, quantity, price)`` rows to
+    save the items query when snapshotting many invoices.
+    """
+    if items is None:
+        items = (invoice.order.items
+                 .order_by('id')
+                 .values_list('product__name', 'quantity', 'price'))
+    issued = timezone.localtime(invoice.issued_date) if invoice.issued_date else None
+    return {
+        'id': invoice.pk,
+        'invoice_number': invoice.invoice_number,
+        'order_id': invoice.order_id,
+        'status': invoice.get_status_display(),
+        'issued_date': _date(issued),
+        'due_date': _date(invoice.due_date),
+        'customer_name': invoice.customer_name,
+        'customer_email': invoice.customer_email,
+        'customer_phone': invoice.customer_phone,
+        'customer_address': invoice.customer_address,
+        'payment_terms': invoice.payment_terms,
+        'notes': invoice.notes,
+        'subtotal': _amount(invoice.subtotal),
+        'delivery_fee': _amount(invoice.delivery_fee),
+        'tax_amount': _amount(invoice.tax_amount),
+        'discount_amount': _amount(invoice.discount_amount),
+        'total_amount': _amount(invoice.total_amount),
+        'items': [[name, quantity, _amount(price)] for name, quantity, price in items],
+    }
+
+
+def invoice_pdf_key(snapshot):
+    """Hex digest identifying a rendering of ``snapshot``."""
+    payload = json.dumps([RENDERER_VERSION, snapshot], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _wrapped(text, width):
+    return [line for paragraph in str(text).splitlines() for line in textwrap.wrap(paragraph, width) or ['']]
+
+
+def _table_header(canvas, y):
+    right = PAGE_WIDTH - MARGIN
+    canvas.rect(MARGIN, y - 5, right - MARGIN, ROW_HEIGHT + 2)
+    canvas.text(MARGIN + 5, y, 'Product', font='F2')
+    canvas.text(330, y, 'Qty', font='F2')
+    canvas.text(405, y, 'Price', font='F2')
+    canvas.text(right - 30, y, 'Total', font='F2')
+    return y - ROW_HEIGHT - 4
+
+
+def render_invoice_pdf(snapshot):
+    """PDF bytes for an invoice snapshot (see ``invoice_snapshot``)."""
+    canvas = PdfCanvas()
+    right = PAGE_WIDTH - MARGIN
+    y = PAGE_HEIGHT - MARGIN - 10
+
+    canvas.text(MARGIN, y, SHOP_NAME, font='F2', size=22)
+    canvas.text(right - 95, y, 'INVOICE', font='F2', size=18)
+    y -= 14
+    canvas.line(MARGIN, y, right, y, width=1)
+
+    details = [
+        ('Invoice #', snapshot['invoice_number']),
+        ('Order #', f"#{snapshot['order_id']}"),
+        ('Issued', snapshot['issued_date']),
+        ('Due', snapshot['due_date']),
+        ('Status', snapshot['status']),
+        ('Terms', snapshot['payment_terms']),
+    ]
+    bill_to = [snapshot['customer_name'], snapshot['customer_email'], snapshot['customer_phone']]
+    bill_to += _wrapped(snapshot['customer_address'], BLOCK_CHARS) if snapshot['customer_address'] else []
+
+    y -= 24
+    canvas.text(MARGIN, y, 'Bill To', font='F2', size=11)
+    canvas.text(330, y, 'Invoice Details', font='F2', size=11)
+    block_y = y - 16
+    for line in filter(None, bill_to):
+        canvas.text(MARGIN, block_y, line)
+        block_y -= 14
+    detail_y = y - 16
+    for label, value in details:
+        if value:
+            canvas.text(330, detail_y, f'{label}:', font='F2')
+            canvas.text(400, detail_y, value)
+            detail_y -= 14
+    y = min(block_y, detail_y) - 16
+
+    y = _table_header(canvas, y)
+    rows_left = FIRST_PAGE_ROWS
+    for name, quantity, price in snapshot['items']:
+        if rows_left == 0:
+            canvas.new_page()
+            y = _table_header(canvas, PAGE_HEIGHT - MARGIN - 10)
+            rows_left = PAGE_ROWS
+        name = str(name)
+        canvas.text(MARGIN + 5, y, name if len(name) <= NAME_CHARS else name[:NAME_CHARS - 3] + '...')
+        canvas.text_right(350, y, quantity)
+        canvas.text_right(460, y, f'{Decimal(price):,.2f}')
+        canvas.text_right(right - 5, y, f'{quantity * Decimal(price):,.2f}')
+        y -= ROW_HEIGHT
+        rows_left -= 1
+
+    if y < MARGIN + 160:
+        canvas.new_page()
+        y = PAGE_HEIGHT - MARGIN - 10
+    canvas.line(MARGIN, y + 8, right, y + 8)
+    y -= 8
+    totals = [('Subtotal', snapshot['subtotal'], False)]
+    if Decimal(snapshot['delivery_fee']):
+        totals.append(('Delivery Fee', snapshot['delivery_fee'], False))
+    if Decimal(snapshot['tax_amount']):
+        totals.append(('Tax', snapshot['tax_amount'], False))
+    if Decimal(snapshot['discount_amount']):
+        totals.append(('Discount', '-' + snapshot['discount_amount'], False))
+    totals.append(('Total', snapshot['total_amount'], True))
+    for label, amount, bold in totals:
+        if bold:
+            canvas.line(330, y + 12, right, y + 12)
+        canvas.text(330, y, label, font='F2' if bold else 'F1', size=12 if bold else 10)
+        canvas.text_right(right - 5, y, _money(amount), size=12 if bold else 10)
+        y -= 18
+
+    if snapshot['notes']:
+        y -= 12
+        canvas.text(MARGIN, y, 'Notes', font='F2', size=11)
+        for line in _wrapped(snapshot['notes'], NOTE_CHARS):
+            y -= 14
+            if y < MARGIN:
+                canvas.new_page()
+                y = PAGE_HEIGHT - MARGIN - 10
+            canvas.text(MARGIN, y, line, size=9)
+
+    canvas.text(MARGIN, MARGIN - 20, f'Thank you for choosing {SHOP_NAME}!', size=9)
+    return canvas.render()
+
+
+class InvoicePdfCache:
+    """Rendered invoice PDFs on disk, keyed by a hash of their content.
+
+    Each invoice keeps one file, ``<id>/<key>.pdf``; a rendering with a new
+    key replaces the invoice's older files, so edits never serve a stale
+    PDF and the directory holds at most one file per invoice. Writes are
+    atomic, so several worker processes can share the directory.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, snapshot, key=None):
+        return self.root / str(snapshot['id']) / f'{key or invoice_pdf_key(snapshot)}.pdf'
+
+    def lookup(self, snapshot):
+        """``(path, key)``, where ``path`` is None when the PDF isn't rendered yet."""
+        key = invoice_pdf_key(snapshot)
+        path = self.path(snapshot, key)
+        return (path if path.is_file() else None), key
+
+    def store(self, snapshot, data, key=None):
+        path = self.path(snapshot, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(temp_name, path)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+        for stale in path.parent.glob('*.pdf'):
+            if stale != path:
+                try:
+                    stale.unlink()
+                except FileNotFoundError:
+                    pass
+        return path
+
+    def get(self, snapshot):
+        """``(path, key)`` of the invoice's PDF, rendering it on a miss."""
+        path, key = self.lookup(snapshot)
+        if path is None:
+            path = self.store(snapshot, render_invoice_pdf(snapshot), key)
+        return path, key
+
+    def open(self, snapshot):
+        """``(file, key)`` of the invoice's PDF opened for reading, rendering it on a miss."""
+        path, key = self.get(snapshot)
+        try:
+            return open(path, 'rb'), key
+        except FileNotFoundError:
+            # Replaced by a rendering of a newer version in between; serve ours
+            return io.BytesIO(render_invoice_pdf(snapshot)), key
+
+    def render_many(self, snapshots, workers=None):
+        """Render every snapshot not cached yet; returns the number rendered.
+
+        With ``workers`` above one, rendering (pure Python, CPU bound) runs
+        in a process pool and the parent writes the results as they arrive.
+        """
+        missing = [snapshot for snapshot in snapshots if self.lookup(snapshot)[0] is None]
+        if workers and workers > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for snapshot, data in zip(missing, pool.map(render_invoice_pdf, missing, chunksize=8)):
+                    self.store(snapshot, data)
+        else:
+            for snapshot in missing:
+                self.store(snapshot, render_invoice_pdf(snapshot))
+        return len(missing)
+
+
+@lru_cache(maxsize=1)
+def get_invoice_pdf_cache():
+    """Process-wide cache rooted at the INVOICE_PDF_CACHE_DIR setting."""
+    return InvoicePdfCache(settings.INVOICE_PDF_CACHE_DIR)
@@ -0,0 +1,79 @@
+from __future__ import annotations
+import re
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Invoice, Order
+
+
+INVOICE_NUMBER_PREFIX = 'INV-{day:%Y%m%d}-'
+INVOICE_NUMBER_SEQUENCE = re.compile(r'-(\d+)$')
+# Orders in this state can be invoiced
+INVOICABLE_STATUS = 'completed'
+
+
+def allocate_invoice_numbers(count, day=None):
+    """``count`` consecutive invoice numbers for ``day`` (today by default).
+
+    Continues the running sequence (the number of invoices so far), skipping
+    past any number already issued under the same date prefix, so a block
+    never collides with earlier invoices. The unique constraint on
+    ``invoice_number`` still guards against a concurrent allocation.
+    """
+    day = day or timezone.localdate()
+    prefix = INVOICE_NUMBER_PREFIX.format(day=day)
+    last = Invoice.objects.count()
+    for number in Invoice.objects.filter(invoice_number__startswith=prefix).values_list('invoice_number', flat=True):
+        match = INVOICE_NUMBER_SEQUENCE.search(number)
+        if match:
+            last = max(last, int(match.group(1)))
+    return [f'{prefix}{last + offset:04d}' for offset in range(1, count + 1)]
+
+
+def items_subtotal():
+    """Sum of an order's line totals, as an expression to annotate orders with."""
+    line_total = ExpressionWrapper(F('items__quantity') * F('items__price'),
+                                   output_field=DecimalField(max_digits=12, decimal_places=2))
+    return Coalesce(Sum(line_total), Value(Decimal('0')), output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def uninvoiced_orders(since=None, until=None):
+    """Completed orders without an invoice, completed on local days ``since``..``until``.
+
+    Annotated with ``items_subtotal`` and joined to their customers, so one
+    query has everything needed to invoice them.
+    """
+    orders = Order.objects.filter(status=INVOICABLE_STATUS, invoice__isnull=True)
+    if since:
+        orders = orders.filter(completed_at__gte=timezone.make_aware(datetime.combine(since, time.min)))
+    if until:
+        orders = orders.filter(completed_at__lt=timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min)))
+    return (orders
+            .select_related('customer')
+            .annotate(items_subtotal=items_subtotal())
+            .order_by('completed_at', 'id'))
+
+
+def invoice_for_order(order, invoice_number, subtotal, **fields):
+    """Unsaved issued invoice for ``order`` with the customer details copied over.
+
+    ``subtotal`` covers the items; the order's delivery fee is billed as its
+    own line, so the invoice total matches what the customer paid.
+    """
+    customer = order.customer
+    invoice = Invoice(
+        order=order,
+        customer=customer,
+        invoice_number=invoice_number,
+        subtotal=subtotal,
+        delivery_fee=order.delivery_fee,
+        customer_name=f"{customer.first_name} {customer.last_name}".strip() or customer.username,
+        customer_email=customer.email,
+        customer_address=order.delivery_address,
+        status='issued',
+        **fields,
+    )
+    invoice.total_amount = invoice.subtotal + invoice.delivery_fee + invoice.tax_amount - invoice.discount_amount
+    return invoice
@@ -0,0 +1,172 @@
+from __future__ import annotations
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from .models import Order, OrderItem, ReservationItem, ChangeCounter
+
+
+ACTIVE_ORDER_STATUSES = ('pending', 'processing')
+# Reservations the kitchen still has to prepare
+PREP_RESERVATION_STATUSES = ('pending', 'confirmed', 'preparing')
+# Hours ahead the prep plan covers by default and at most
+PREP_PLAN_HOURS = 12
+MAX_PREP_PLAN_HOURS = 72
+
+# How often kitchen tablets ask whether the board changed (seconds)
+CLIENT_POLL_SECONDS = 5
+
+
+def board_version():
+    """Return the current kitchen board version."""
+    return ChangeCounter.current(ChangeCounter.KITCHEN_BOARD)
+
+
+def build_kitchen_board():
+    """Active orders plus per-product quantity totals for the kitchen."""
+    product_totals = (OrderItem.objects
+                      .filter(order__status__in=ACTIVE_ORDER_STATUSES)
+                      .values('product_id', 'product__name')
+                      .annotate(quantity=Sum('quantity'), order_count=Count('order', distinct=True))
+                      .order_by('-quantity', 'product__name'))
+
+    orders = (Order.objects
+              .filter(status__in=ACTIVE_ORDER_STATUSES)
+              .select_related('customer')
+              .prefetch_related('items__product')
+              .order_by('created_at'))
+
+    return {
+        'products': [
+            {
+                'product_id': row['product_id'],
+                'name': row['product__name'],
+                'quantity': row['quantity'],
+                'order_count': row['order_count'],
+            }
+            for row in product_totals
+        ],
+        'orders': [
+            {
+                'id': order.id,
+                'status': order.status,
+                'status_display': order.get_status_display(),
+                'customer': order.customer.get_full_name() or order.customer.username,
+                'created_at': order.created_at.isoformat(),
+                'notes': order.notes,
+                'items': [
+                    {'name': item.product.name, 'quantity': item.quantity}
+                    for item in order.items.all()
+                ],
+            }
+            for order in orders
+        ],
+    }
+
+
+def get_kitchen_board():
+    """Return the board payload, built at most once per version."""
+    version = board_version()
+    cache_key = f'kitchen_board:v{version}'
+    board = cache.get(cache_key)
+    if board is None:
+        board = build_kitchen_board()
+        board['version'] = version
+        board['generated_at'] = timezone.now().isoformat()
+        cache.set(cache_key, board, 300)
+    return board
+
+
+def prep_plan_version():
+    """Changes whenever orders or reservations do: the sum of both change counters."""
+    return sum(ChangeCounter.objects
+               .filter(name__in=(ChangeCounter.KITCHEN_BOARD, ChangeCounter.RESERVATIONS))
+               .values_list('value', flat=True))
+
+
+def _hour_start(moment):
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def build_prep_plan(start, hours):
+    """Quantities due per product per hour from ``start`` for ``hours`` hours.
+
+    Reservation items are grouped by the hour they are scheduled for; items
+    of active orders are due now and land in the first hour. Each is one
+    grouped query, plus one for the special instructions to show.
+    """
+    tzinfo = timezone.get_current_timezone()
+    end = start + timedelta(hours=hours)
+    reserved = (ReservationItem.objects
+                .filter(reservation__status__in=PREP_RESERVATION_STATUSES,
+                        reservation__scheduled_for__gte=start, reservation__scheduled_for__lt=end)
+                .annotate(hour=TruncHour('reservation__scheduled_for', tzinfo=tzinfo))
+                .values('hour', 'product_id', 'product__name')
+                .annotate(quantity=Sum('quantity'), reservation_count=Count('reservation', distinct=True))
+                .order_by())
+    ordered = (OrderItem.objects
+               .filter(order__status__in=ACTIVE_ORDER_STATUSES)
+               .values('product_id', 'product__name')
+               .annotate(quantity=Sum('quantity'), order_count=Count('order', distinct=True))
+               .order_by())
+    instructions = (ReservationItem.objects
+                    .filter(reservation__status__in=PREP_RESERVATION_STATUSES,
+                            reservation__scheduled_for__gte=start, reservation__scheduled_for__lt=end)
+                    .exclude(special_instructions='')
+                    .values_list('reservation__scheduled_for', 'reservation_id', 'product__name',
+                                 'quantity', 'special_instructions')
+                    .order_by('reservation__scheduled_for'))
+
+    buckets = {}
+
+    def bucket(hour):
+        return buckets.setdefault(hour, {'start': hour.isoformat(), 'products': {}, 'instructions': []})
+
+    def line(hour, product_id, name):
+        return bucket(hour)['products'].setdefault(product_id, {
+            'product_id': product_id, 'name': name, 'quantity': 0, 'reservations': 0, 'orders': 0,
+        })
+
+    for row in ordered:
+        entry = line(start, row['product_id'], row['product__name'])
+        entry['quantity'] += row['quantity']
+        entry['orders'] += row['order_count']
+    for row in reserved:
+        entry = line(timezone.localtime(row['hour']), row['product_id'], row['product__name'])
+        entry['quantity'] += row['quantity']
+        entry['reservations'] += row['reservation_count']
+    for scheduled_for, reservation_id, name, quantity, text in instructions:
+        bucket(_hour_start(scheduled_for))['instructions'].append({
+            'reservation_id': reservation_id, 'name': name, 'quantity': quantity, 'text': text,
+        })
+
+    totals = {}
+    for hour_bucket in buckets.values():
+        for entry in hour_bucket['products'].values():
+            total = totals.setdefault(entry['product_id'], {
+                'product_id': entry['product_id'], 'name': entry['name'], 'quantity': 0})
+            total['quantity'] += entry['quantity']
+    return {
+        'start': start.isoformat(),
+        'hours': hours,
+        'buckets': [
+            {**hour_bucket, 'products': sorted(hour_bucket['products'].values(), key=lambda entry: entry['name'])}
+            for _hour, hour_bucket in sorted(buckets.items())
+        ],
+        'totals': sorted(totals.values(), key=lambda entry: (-entry['quantity'], entry['name'])),
+    }
+
+
+def get_prep_plan(hours=PREP_PLAN_HOURS):
+    """Return the prep plan, built at most once per version and hour."""
+    version = prep_plan_version()
+    start = _hour_start(timezone.now())
+    cache_key = f'prep_plan:v{version}:{start.isoformat()}:{hours}'
+    plan = cache.get(cache_key)
+    if plan is None:
+        plan = build_prep_plan(start, hours)
+        plan['version'] = version
+        plan['generated_at'] = timezone.now().isoformat()
+        cache.set(cache_key, plan, 3600)
+    return plan
@@ -0,0 +1,143 @@
+from __future__ import annotations
+import asyncio
+import json
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.utils.dateparse import parse_datetime
+from .models import OrderTracking
+from .tracks import iter_track
+
+
+# Seconds between change checks shared by all watchers of one process
+POLL_INTERVAL = 1.0
+# How often tracking pages poll when the site is not served over ASGI (seconds)
+CLIENT_POLL_SECONDS = 5
+# Comment line sent on idle streams so proxies don't drop the connection
+KEEPALIVE_SECONDS = 15
+# Tracking stops changing once an order reaches one of these
+FINAL_STATUSES = ('delivered', 'cancelled')
+
+
+def tracking_state(order_id, since=None):
+    """Current status/location of a delivery plus trail points after ``since``.
+
+    ``version`` changes whenever the tracking row does; ``until`` is the time
+    of the last trail point sent and becomes the next request's ``since``.
+    Returns None when the order has no tracking yet.
+    """
+    tracking = (OrderTracking.objects
+                .filter(order_id=order_id)
+                .only('status', 'latitude', 'longitude', 'location_name', 'location_updated_at',
+                      'estimated_delivery', 'updated_at')
+                .first())
+    if tracking is None:
+        return None
+
+    points = []
+    until = since
+    for latitude, longitude, recorded_at in iter_track(order_id, since=since):
+        points.append([round(latitude, 5), round(longitude, 5)])
+        until = recorded_at
+    return {
+        'version': tracking.updated_at.isoformat(),
+        'status': tracking.status,
+        'status_display': tracking.get_status_display(),
+        'latitude': tracking.latitude,
+        'longitude': tracking.longitude,
+        'location_name': tracking.location_name,
+        'location_updated_at': tracking.location_updated_at.isoformat() if tracking.location_updated_at else None,
+        'estimated_delivery': tracking.estimated_delivery.isoformat() if tracking.estimated_delivery else None,
+        'points': points,
+        'until': until.isoformat() if until else None,
+    }
+
+
+def _tracking_versions(order_ids):
+    return dict(OrderTracking.objects
+                .filter(order_id__in=order_ids)
+                .values_list('order_id', 'updated_at'))
+
+
+class TrackingHub:
+    """Watches tracking rows on behalf of every open live-tracking stream.
+
+    A single task per event loop reads the ``updated_at`` of all watched
+    orders once per ``interval`` and wakes only the streams whose order
+    changed, so idle watchers cost a queue each rather than a query each.
+    """
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self._watchers = defaultdict(set)
+        self._versions = {}
+        self._loop = None
+        self._task = None
+
+    def subscribe(self, order_id):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._watchers.clear()
+            self._versions.clear()
+            self._loop = loop
+            self._task = None
+        queue = asyncio.Queue(maxsize=1)
+        self._watchers[order_id].add(queue)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, order_id, queue):
+        watchers = self._watchers.get(order_id)
+        if watchers is None:
+            return
+        watchers.discard(queue)
+        if not watchers:
+            del self._watchers[order_id]
+            self._versions.pop(order_id, None)
+
+    async def _run(self):
+        while self._watchers:
+            await asyncio.sleep(self.interval)
+            versions = await sync_to_async(_tracking_versions)(list(self._watchers))
+            for order_id, version in versions.items():
+                if self._versions.get(order_id) == version:
+                    continue
+                # Streams drop wake-ups that turn out not to change anything for them
+                self._versions[order_id] = version
+                for queue in self._watchers.get(order_id, ()):
+                    if queue.empty():
+                        queue.put_nowait(version)
+
+
+tracking_hub = TrackingHub()
+
+
+def sse_event(state):
+    """Format a tracking state as one Server-Sent Event."""
+    event_id = state['until'] or ''
+    return f"id: {event_id}\nevent: tracking\ndata: {json.dumps(state)}\n\n"
+
+
+async def tracking_events(order_id, since=None):
+    """Yield SSE messages for one order until its delivery is finished."""
+    queue = tracking_hub.subscribe(order_id)
+    try:
+        state = await sync_to_async(tracking_state)(order_id, since)
+        if state is None:
+            return
+        yield sse_event(state)
+        version, since = state['version'], parse_datetime(state['until'] or '') or since
+        while state['status'] not in FINAL_STATUSES:
+            try:
+                await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            state = await sync_to_async(tracking_state)(order_id, since)
+            if state is None:
+                return
+            if state['version'] != version or state['points']:
+                yield sse_event(state)
+                version, since = state['version'], parse_datetime(state['until'] or '') or since
+    finally:
+        tracking_hub.unsubscribe(order_id, queue)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from core.reports import aggregate_daily_sales
+
+
+class Command(BaseCommand):
+    help = 'Fold newly completed orders into the daily sales fact tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Drop the fact tables and recompute everything')
+
+    def handle(self, *args, **options):
+        aggregated = aggregate_daily_sales(rebuild=options['rebuild'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Aggregated {aggregated} completed orders into daily sales')
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from core.metrics import aggregate_status_durations
+
+
+class Command(BaseCommand):
+    help = 'Aggregate new order status events into hourly time-in-status percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Events processed per transaction')
+
+    def handle(self, *args, **options):
+        processed = aggregate_status_durations(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Aggregated {processed} status events')
+        )
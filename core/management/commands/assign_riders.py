@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from core.dispatch import assign_riders
+
+
+class Command(BaseCommand):
+    help = 'Assign waiting delivery orders to the nearest free rider'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=0,
+                            help='Keep running and assign every N seconds (default: run once)')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            assigned = assign_riders()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(self.style.SUCCESS(f'Assigned {len(assigned)} orders to riders in {elapsed_ms:.1f} ms'))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
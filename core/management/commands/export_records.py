@@ -0,0 +1,35 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from core.exports import EXPORTS, EXPORT_FORMATS, export_chunks
+
+
+class Command(BaseCommand):
+    help = 'Export orders, payments or invoices to CSV/XLSX using the staff list filters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS), help='What to export')
+        parser.add_argument('--format', dest='export_format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--status', help='Only rows with this status')
+        parser.add_argument('--method', help='Only payments with this payment method')
+        parser.add_argument('--search', help='Same search as the staff list page')
+        parser.add_argument('--output', '-o', help='File to write (defaults to stdout for CSV)')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        export_format = options['export_format']
+        output = options['output']
+        if export_format == 'xlsx' and not output:
+            raise CommandError('XLSX exports need --output')
+
+        params = {key: options[key] for key in ('status', 'method', 'search') if options[key]}
+        chunks = export_chunks(kind, export_format, params)
+
+        if output:
+            with open(output, 'wb') as handle:
+                for chunk in chunks:
+                    handle.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f'Exported {kind} to {output}'))
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.flush()
@@ -0,0 +1,67 @@
+import os
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date
+from core.invoice_pdf import get_invoice_pdf_cache, invoice_snapshot
+from core.invoicing import allocate_invoice_numbers, invoice_for_order, uninvoiced_orders
+from core.models import Invoice, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Issue invoices for completed orders that have none, optionally rendering their PDFs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only orders completed on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Only orders completed on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--payment-terms', default='', help='Payment terms printed on every invoice')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Invoices inserted per batch')
+        parser.add_argument('--pdf', action='store_true', help='Render the new invoices to the PDF cache')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes rendering PDFs in parallel (default: one per CPU)')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be invoiced without saving')
+
+    def handle(self, *args, **options):
+        dates = {}
+        for name in ('since', 'until'):
+            dates[name] = parse_date(options[name]) if options[name] else None
+            if options[name] and dates[name] is None:
+                raise CommandError(f'--{name} must be a date (YYYY-MM-DD)')
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+
+        orders = list(uninvoiced_orders(dates['since'], dates['until']))
+        if not orders:
+            self.stdout.write(self.style.SUCCESS('No completed orders are waiting for an invoice'))
+            return
+        total = sum(order.items_subtotal + order.delivery_fee for order in orders)
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'[dry run] Would invoice {len(orders)} orders totalling PHP {total:,.2f}'))
+            return
+
+        try:
+            with transaction.atomic():
+                numbers = allocate_invoice_numbers(len(orders))
+                invoices = Invoice.objects.bulk_create([
+                    invoice_for_order(order, number, order.items_subtotal, payment_terms=options['payment_terms'])
+                    for order, number in zip(orders, numbers)
+                ], batch_size=options['chunk_size'])
+        except IntegrityError as exc:
+            raise CommandError(f'Invoices were created concurrently, nothing was saved; run again ({exc})') from exc
+        self.stdout.write(self.style.SUCCESS(
+            f'Issued {len(invoices)} invoices ({numbers[0]} to {numbers[-1]}) totalling PHP {total:,.2f}'))
+
+        if options['pdf']:
+            if any(invoice.pk is None for invoice in invoices):
+                # Backends that can't return ids from a bulk insert
+                invoices = list(Invoice.objects.filter(invoice_number__in=numbers))
+            items = defaultdict(list)
+            for order_id, *line in (OrderItem.objects
+                                    .filter(order__in=[invoice.order_id for invoice in invoices])
+                                    .order_by('id')
+                                    .values_list('order_id', 'product__name', 'quantity', 'price')):
+                items[order_id].append(line)
+            snapshots = [invoice_snapshot(invoice, items[invoice.order_id]) for invoice in invoices]
+            rendered = get_invoice_pdf_cache().render_many(snapshots, workers=options['workers'])
+            self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} invoice PDFs'))
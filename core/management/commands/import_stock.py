@@ -0,0 +1,67 @@
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.forms import STOCK_UPDATE_KINDS
+from core.models import InsufficientStock, Product
+from core.stock import read_stock_records, prepare_stock_updates, apply_stock_updates, misdirected_updates
+
+
+class Command(BaseCommand):
+    help = ('Set product stock from a CSV/JSON file with id or name, stock_quantity, '
+            'low_stock_threshold and is_active columns; all rows are applied or none')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON file to import')
+        parser.add_argument('--format', dest='import_format', choices=('csv', 'json'),
+                            help='File format (defaults to the file extension)')
+        parser.add_argument('--kind', choices=[kind for kind, _label in STOCK_UPDATE_KINDS], default='adjustment',
+                            help='Ledger movement kind for the quantity changes')
+        parser.add_argument('--note', default='', help='Note stored on every ledger movement')
+        parser.add_argument('--user', help='Staff username the changes are recorded under')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without saving')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        import_format = options['import_format'] or path.suffix.lstrip('.').lower()
+        if import_format not in ('csv', 'json'):
+            raise CommandError('Cannot tell the file format; pass --format csv or --format json')
+
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']!r}")
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as handle:
+                records = read_stock_records(handle, import_format)
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}') from exc
+        except ValueError as exc:
+            raise CommandError(f'{path}: {exc}') from exc
+
+        updates, errors = prepare_stock_updates(records)
+        if errors:
+            for error in errors:
+                self.stderr.write(error)
+            raise CommandError(f'{len(errors)} invalid rows in {path}; nothing was imported')
+        misdirected = misdirected_updates(updates, options['kind'])
+        if misdirected:
+            for product, _delta in updates:
+                if product.pk in misdirected:
+                    self.stderr.write(f'{product.name}: {misdirected[product.pk]}')
+            raise CommandError(f"{len(misdirected)} changes don't fit --kind {options['kind']}; nothing was imported")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'[dry run] {len(records)} rows valid, {len(updates)} products would change'))
+            return
+        try:
+            apply_stock_updates(updates, kind=options['kind'], note=options['note'] or f'Imported from {path.name}',
+                                user=user)
+        except InsufficientStock as exc:
+            names = dict(Product.objects.filter(id__in=exc.shortages).values_list('id', 'name'))
+            for product_id, available in exc.shortages.items():
+                self.stderr.write(f'{names.get(product_id, product_id)}: only {available} in stock now')
+            raise CommandError('Some products no longer have enough stock; nothing was imported') from exc
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(records)} rows: {len(updates)} products updated'))
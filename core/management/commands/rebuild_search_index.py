@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.search import rebuild_customer_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the normalized customer name index used by staff search'
+
+    def handle(self, *args, **options):
+        indexed = rebuild_customer_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed names of {indexed} users')
+        )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.capacity import rebuild_occupancy
+
+
+class Command(BaseCommand):
+    help = 'Recount reservation slot occupancy from upcoming reservations (repairs drift after bulk edits)'
+
+    def handle(self, *args, **options):
+        slots = rebuild_occupancy()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt occupancy for {slots} upcoming slots'))
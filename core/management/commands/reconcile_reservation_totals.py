@@ -0,0 +1,50 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from core.models import Reservation, ReservationItem
+
+
+class Command(BaseCommand):
+    help = 'Recompute Reservation.total_amount from the items and fix reservations that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Reservations checked per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Report mismatches without fixing them')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        line_total = ExpressionWrapper(F('quantity') * F('price'),
+                                       output_field=DecimalField(max_digits=12, decimal_places=2))
+        item_totals = (ReservationItem.objects
+                       .filter(reservation=OuterRef('pk'))
+                       .order_by()
+                       .values('reservation')
+                       .annotate(total=Sum(line_total))
+                       .values('total'))
+        computed = Coalesce(Subquery(item_totals), Value(Decimal('0')),
+                            output_field=DecimalField(max_digits=10, decimal_places=2))
+
+        checked = fixed = 0
+        last_id = 0
+        while True:
+            rows = list(Reservation.objects
+                        .filter(id__gt=last_id)
+                        .order_by('id')
+                        .annotate(computed_total=computed)
+                        .values_list('id', 'total_amount', 'computed_total')[:chunk_size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            checked += len(rows)
+            drifted = [reservation_id for reservation_id, stored, total in rows if stored != total]
+            fixed += len(drifted)
+            if drifted and not options['dry_run']:
+                # Recomputed in the UPDATE itself, so item writes since the read aren't lost
+                Reservation.objects.filter(id__in=drifted).update(total_amount=computed)
+
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Checked {checked} reservations: {fixed} totals '
+            f'{"differ from" if options["dry_run"] else "recomputed from"} their items'
+        ))
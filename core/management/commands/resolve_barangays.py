@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.barangays import BarangayResolver
+from core.models import Order
+from core.reports import normalize_barangay
+
+
+class Command(BaseCommand):
+    help = 'Set Order.delivery_barangay from the delivery coordinates using the barangay boundaries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--geojson', help='Boundary file to use (default: BARANGAY_BOUNDARIES_FILE)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Orders read and updated per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Report changes without saving them')
+
+    def handle(self, *args, **options):
+        path = options['geojson'] or settings.BARANGAY_BOUNDARIES_FILE
+        if not path:
+            raise CommandError('Barangay boundaries are switched off; set BARANGAY_BOUNDARIES_FILE '
+                               'or pass --geojson')
+        try:
+            resolver = BarangayResolver.from_geojson(path)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read {path}: {exc}') from exc
+        if not resolver.available:
+            raise CommandError(f'No barangay boundaries are loaded from {path}; add one '
+                               f'Polygon/MultiPolygon feature with a "name" property per barangay first')
+
+        chunk_size = options['chunk_size']
+        orders = (Order.objects
+                  .filter(delivery_latitude__isnull=False, delivery_longitude__isnull=False)
+                  .only('id', 'delivery_barangay', 'delivery_latitude', 'delivery_longitude')
+                  .order_by('id'))
+        checked = changed = unresolved = 0
+        pending = []
+        for order in orders.iterator(chunk_size=chunk_size):
+            checked += 1
+            barangay = resolver.resolve(order.delivery_latitude, order.delivery_longitude)
+            if barangay is None:
+                unresolved += 1
+                continue
+            if order.delivery_barangay == barangay:
+                continue
+            if normalize_barangay(order.delivery_barangay) != normalize_barangay(barangay):
+                changed += 1
+            if options['dry_run']:
+                continue
+            order.delivery_barangay = barangay
+            pending.append(order)
+            if len(pending) >= chunk_size:
+                Order.objects.bulk_update(pending, ['delivery_barangay'])
+                pending = []
+        if pending:
+            Order.objects.bulk_update(pending, ['delivery_barangay'])
+
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Checked {checked} orders: {changed} moved to a different barangay, '
+            f'{unresolved} outside all boundaries'
+        ))
@@ -0,0 +1,58 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.geo import NAVAL_BBOX
+from core.tiles import SERVED_MAX_ZOOM, SERVED_MIN_ZOOM, TileNotFound, UpstreamError, bbox_tiles, get_tile_cache
+
+
+class Command(BaseCommand):
+    help = 'Download map tiles and marker icons for an area into the local tile cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bbox', default=','.join(str(v) for v in NAVAL_BBOX),
+                            help='min_lng,min_lat,max_lng,max_lat (default: Naval, Biliran)')
+        parser.add_argument('--min-zoom', type=int, default=12)
+        parser.add_argument('--max-zoom', type=int, default=16)
+        parser.add_argument('--refresh', action='store_true',
+                            help='Re-download tiles that are already cached')
+        parser.add_argument('--delay', type=float, default=1.0,
+                            help='Seconds to wait between downloads; the OSM tile usage policy '
+                                 'discourages fast bulk downloads (default: 1)')
+
+    def handle(self, *args, **options):
+        try:
+            bbox = tuple(float(value) for value in options['bbox'].split(','))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4 or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+            raise CommandError('--bbox must be min_lng,min_lat,max_lng,max_lat')
+        if not SERVED_MIN_ZOOM <= options['min_zoom'] <= options['max_zoom'] <= SERVED_MAX_ZOOM:
+            raise CommandError(f'Zoom levels must satisfy {SERVED_MIN_ZOOM} <= --min-zoom <= --max-zoom '
+                               f'<= {SERVED_MAX_ZOOM}, the levels the maps serve')
+        if options['delay'] < 0:
+            raise CommandError('--delay cannot be negative')
+
+        cache = get_tile_cache()
+        for name in cache.markers:
+            try:
+                cache.get_marker(name, refresh=options['refresh'])
+            except (TileNotFound, UpstreamError) as exc:
+                self.stderr.write(f'Skipped marker icon {name}: {exc}')
+
+        fetched = cached = failed = 0
+        for z, x, y in bbox_tiles(bbox, options['min_zoom'], options['max_zoom']):
+            if not options['refresh'] and cache.contains(z, x, y):
+                cached += 1
+                continue
+            try:
+                cache.get_tile(z, x, y, refresh=options['refresh'])
+            except (TileNotFound, UpstreamError) as exc:
+                failed += 1
+                self.stderr.write(f'Skipped tile {z}/{x}/{y}: {exc}')
+                continue
+            fetched += 1
+            if options['delay']:
+                time.sleep(options['delay'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Downloaded {fetched} tiles, {cached} already cached, {failed} failed '
+            f'({cache.size() / 1024 / 1024:.1f} MB in {cache.root})'))
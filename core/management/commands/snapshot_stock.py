@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core.stock import take_stock_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Record every product\'s stock ledger balance as a snapshot (run daily)'
+
+    def handle(self, *args, **options):
+        snapshots = take_stock_snapshot()
+        taken_at = snapshots[0].taken_at if snapshots else None
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshotted stock for {len(snapshots)} products'
+            + (f' as of {taken_at:%Y-%m-%d %H:%M}' if taken_at else '')))
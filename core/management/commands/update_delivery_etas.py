@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from core.eta import update_delivery_etas
+
+
+class Command(BaseCommand):
+    help = 'Recompute estimated delivery times for all orders out for delivery'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=0,
+                            help='Keep running and recompute every N seconds (default: run once)')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            updated = update_delivery_etas()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(self.style.SUCCESS(f'Updated {updated} delivery ETAs in {elapsed_ms:.1f} ms'))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
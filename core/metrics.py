@@ -0,0 +1,143 @@
+from __future__ import annotations
+from collections import defaultdict
+from django.db import transaction
+from django.utils import timezone
+from .models import OrderStatusEvent, OrderStatusHourlyStat, AggregationWatermark
+
+
+STATUS_DURATION_WATERMARK = 'order_status_durations'
+
+# Upper bounds (seconds) of the time-in-status histogram buckets. A final
+# overflow bucket collects everything above the last bound.
+DURATION_BUCKETS = (
+    15, 30, 60, 120, 180, 300, 450, 600, 900, 1200, 1800, 2700,
+    3600, 5400, 7200, 10800, 14400, 21600, 43200, 86400,
+)
+
+
+def bucket_index(seconds):
+    """Return the histogram bucket for a duration in seconds."""
+    for index, upper in enumerate(DURATION_BUCKETS):
+        if seconds <= upper:
+            return index
+    return len(DURATION_BUCKETS)
+
+
+def histogram_percentile(histogram, quantile, max_seconds):
+    """Estimate a percentile from bucket counts by interpolating inside the bucket."""
+    total = sum(histogram)
+    if not total:
+        return 0
+    target = quantile * total
+    cumulative = 0
+    for index, count in enumerate(histogram):
+        if count and cumulative + count >= target:
+            lower = DURATION_BUCKETS[index - 1] if index > 0 else 0
+            upper = DURATION_BUCKETS[index] if index < len(DURATION_BUCKETS) else max_seconds
+            estimate = lower + (upper - lower) * (target - cumulative) / count
+            return min(estimate, max_seconds)
+        cumulative += count
+    return max_seconds
+
+
+def _truncate_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _collect_durations(batch):
+    """Pair each new event with the previous event of the same order.
+
+    Returns {(hour, status): [seconds, ...]} where ``status`` is the status that
+    just ended and ``hour`` is the hour it was entered.
+    """
+    new_ids = {event_id for event_id, _order_id, _status, _ts in batch}
+    order_ids = {order_id for _event_id, order_id, _status, _ts in batch}
+    max_id = max(new_ids)
+
+    # Uses the (order, ts) index; only the few events of the touched orders are read.
+    history = (OrderStatusEvent.objects
+               .filter(order_id__in=order_ids, id__lte=max_id)
+               .order_by('order_id', 'ts', 'id')
+               .values_list('id', 'order_id', 'status', 'ts'))
+
+    durations = defaultdict(list)
+    previous = None
+    for event_id, order_id, status, ts in history:
+        if previous and previous[1] == order_id and event_id in new_ids:
+            _prev_id, _prev_order, prev_status, prev_ts = previous
+            seconds = max((ts - prev_ts).total_seconds(), 0)
+            durations[(_truncate_hour(prev_ts), prev_status)].append(seconds)
+        previous = (event_id, order_id, status, ts)
+    return durations
+
+
+def _merge_durations(durations):
+    """Fold new duration samples into the stored hourly histograms."""
+    hours = {hour for hour, _status in durations}
+    existing = {
+        (stat.hour, stat.status): stat
+        for stat in OrderStatusHourlyStat.objects.filter(hour__in=hours)
+    }
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for key, samples in durations.items():
+        stat = existing.get(key)
+        if stat is None:
+            stat = OrderStatusHourlyStat(hour=key[0], status=key[1])
+            to_create.append(stat)
+        else:
+            to_update.append(stat)
+
+        histogram = list(stat.histogram) or [0] * (len(DURATION_BUCKETS) + 1)
+        for seconds in samples:
+            histogram[bucket_index(seconds)] += 1
+        stat.histogram = histogram
+        stat.sample_count += len(samples)
+        stat.total_seconds += sum(samples)
+        stat.max_seconds = max(stat.max_seconds, max(samples))
+        stat.p50_seconds = histogram_percentile(histogram, 0.50, stat.max_seconds)
+        stat.p90_seconds = histogram_percentile(histogram, 0.90, stat.max_seconds)
+        stat.p99_seconds = histogram_percentile(histogram, 0.99, stat.max_seconds)
+        stat.updated_at = now
+
+    OrderStatusHourlyStat.objects.bulk_create(to_create)
+    OrderStatusHourlyStat.objects.bulk_update(to_update, [
+        'histogram', 'sample_count', 'total_seconds', 'max_seconds',
+        'p50_seconds', 'p90_seconds', 'p99_seconds', 'updated_at',
+    ])
+
+
+def aggregate_status_durations(batch_size=5000):
+    """Aggregate status events added since the last run into hourly stats.
+
+    Only events past the stored watermark are read, so each run costs time
+    proportional to the new events rather than the whole order history.
+    Returns the number of events processed.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            watermark, _ = (AggregationWatermark.objects
+                            .select_for_update()
+                            .get_or_create(name=STATUS_DURATION_WATERMARK))
+            batch = list(OrderStatusEvent.objects
+                         .filter(id__gt=watermark.last_id)
+                         .order_by('id')
+                         .values_list('id', 'order_id', 'status', 'ts')[:batch_size])
+            if not batch:
+                break
+
+            durations = _collect_durations(batch)
+            if durations:
+                _merge_durations(durations)
+
+            watermark.last_id = batch[-1][0]
+            watermark.last_timestamp = max(ts for _id, _order, _status, ts in batch)
+            watermark.save()
+            processed += len(batch)
+
+        if len(batch) < batch_size:
+            break
+    return processed
+
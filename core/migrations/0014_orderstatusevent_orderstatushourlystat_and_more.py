@@ -0,0 +1,86 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+STATUS_CODES = {
+    'order_placed': 1,
+    'confirmed': 2,
+    'preparing': 3,
+    'ready_for_pickup': 4,
+    'out_for_delivery': 5,
+    'delivered': 6,
+    'cancelled': 7,
+}
+
+
+def seed_current_statuses(apps, schema_editor):
+    """Start the event log with each order's current tracking status."""
+    OrderTracking = apps.get_model('core', 'OrderTracking')
+    OrderStatusEvent = apps.get_model('core', 'OrderStatusEvent')
+    OrderStatusEvent.objects.bulk_create([
+        OrderStatusEvent(order_id=order_id, status=STATUS_CODES[status], ts=updated_at)
+        for order_id, status, updated_at in OrderTracking.objects.values_list('order_id', 'status', 'updated_at')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_product_stock_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_id', models.BigIntegerField(default=0, help_text='Highest source row id already aggregated')),
+                ('last_timestamp', models.DateTimeField(blank=True, help_text='Latest source timestamp already aggregated', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderStatusHourlyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Start of the hour the status was entered')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Order Placed'), (2, 'Order Confirmed'), (3, 'Preparing'), (4, 'Ready for Pickup'), (5, 'Out for Delivery'), (6, 'Delivered'), (7, 'Cancelled')])),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+                ('max_seconds', models.FloatField(default=0)),
+                ('histogram', models.JSONField(default=list, help_text='Sample counts per duration bucket')),
+                ('p50_seconds', models.FloatField(default=0)),
+                ('p90_seconds', models.FloatField(default=0)),
+                ('p99_seconds', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-hour', 'status'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Order Placed'), (2, 'Order Confirmed'), (3, 'Preparing'), (4, 'Ready for Pickup'), (5, 'Out for Delivery'), (6, 'Delivered'), (7, 'Cancelled')])),
+                ('ts', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='core.order')),
+            ],
+            options={
+                'ordering': ['order', 'ts'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='orderstatushourlystat',
+            constraint=models.UniqueConstraint(fields=('hour', 'status'), name='core_status_stat_hour_status'),
+        ),
+        migrations.AddIndex(
+            model_name='orderstatusevent',
+            index=models.Index(fields=['order', 'ts'], name='core_status_event_order_ts'),
+        ),
+        migrations.RunPython(seed_current_statuses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_completed_at(apps, schema_editor):
+    """Use the last update time as the completion time of already completed orders."""
+    Order = apps.get_model('core', 'Order')
+    Order.objects.filter(status='completed', completed_at__isnull=True).update(completed_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_changecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBarangaySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('barangay', models.CharField(max_length=100)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'ordering': ['-date', 'barangay'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyPaymentMethodSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_method', models.CharField(choices=[('cash', 'Cash on Delivery'), ('gcash', 'GCash'), ('paymaya', 'PayMaya'), ('bank_transfer', 'Bank Transfer'), ('credit_card', 'Credit Card'), ('debit_card', 'Debit Card')], max_length=20)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'ordering': ['-date', 'payment_method'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date', 'product'],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='When the order was marked completed', null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='dailybarangaysales',
+            constraint=models.UniqueConstraint(fields=('date', 'barangay'), name='core_daily_barangay_sales_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailypaymentmethodsales',
+            constraint=models.UniqueConstraint(fields=('date', 'payment_method'), name='core_daily_method_sales_key'),
+        ),
+        migrations.AddField(
+            model_name='dailyproductsales',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='core.product'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyproductsales',
+            constraint=models.UniqueConstraint(fields=('date', 'product'), name='core_daily_product_sales_key'),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:24
+
+import re
+import unicodedata
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copy of core.search.normalize_tokens as of this migration
+_TOKEN_SPLIT = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_tokens(*values):
+    tokens = []
+    for value in values:
+        text = unicodedata.normalize('NFKD', value or '')
+        text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+        tokens.extend(token for token in _TOKEN_SPLIT.split(text) if token)
+    return tokens
+
+
+def index_existing_customers(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    CustomerSearchToken = apps.get_model('core', 'CustomerSearchToken')
+    tokens = []
+    for user_id, username, first_name, last_name in User.objects.values_list('id', 'username', 'first_name', 'last_name').iterator():
+        tokens.extend(
+            CustomerSearchToken(user_id=user_id, token=token[:150])
+            for token in set(normalize_tokens(username, first_name, last_name))
+        )
+    CustomerSearchToken.objects.bulk_create(tokens, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_order_completed_at_daily_sales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='reference_number',
+            field=models.CharField(blank=True, db_index=True, help_text='Payment reference number', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='transaction_id',
+            field=models.CharField(blank=True, db_index=True, help_text='External payment transaction ID', max_length=100),
+        ),
+        migrations.CreateModel(
+            name='CustomerSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, help_text='Lowercased, accent-free name fragment', max_length=150)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='customersearchtoken',
+            constraint=models.UniqueConstraint(fields=('user', 'token'), name='core_search_token_user_token'),
+        ),
+        migrations.RunPython(index_existing_customers, migrations.RunPython.noop),
+    ]
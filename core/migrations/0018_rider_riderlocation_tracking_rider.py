@@ -0,0 +1,64 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:27
+
+import core.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_customersearchtoken_payment_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordertracking',
+            name='location_updated_at',
+            field=models.DateTimeField(blank=True, help_text='Time of the latest rider GPS fix', null=True),
+        ),
+        migrations.CreateModel(
+            name='Rider',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('phone', models.CharField(blank=True, max_length=20)),
+                ('api_token', models.CharField(default=core.models.generate_rider_token, editable=False, max_length=64, unique=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_latitude', models.FloatField(blank=True, null=True)),
+                ('last_longitude', models.FloatField(blank=True, null=True)),
+                ('last_seen_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rider_profile', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='ordertracking',
+            name='rider',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trackings', to='core.rider'),
+        ),
+        migrations.CreateModel(
+            name='RiderLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('recorded_at', models.DateTimeField(help_text='When the rider app took the fix')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rider_locations', to='core.order')),
+                ('rider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='locations', to='core.rider')),
+            ],
+            options={
+                'ordering': ['recorded_at'],
+                'indexes': [models.Index(fields=['order', 'recorded_at'], name='core_rider_loc_order_ts'), models.Index(fields=['rider', 'recorded_at'], name='core_rider_loc_rider_ts')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='riderlocation',
+            constraint=models.UniqueConstraint(fields=('rider', 'order', 'recorded_at'), name='core_rider_loc_unique_fix'),
+        ),
+    ]
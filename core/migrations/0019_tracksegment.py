@@ -0,0 +1,110 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:28
+
+from datetime import datetime, timezone as dt_timezone
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copy of the core.tracks encoding as of this migration, so later
+# changes to that module can't alter what this data migration writes.
+COORD_SCALE = 100_000
+SEGMENT_POINTS = 512
+
+
+def to_fixed(degrees):
+    return round(degrees * COORD_SCALE)
+
+
+def to_seconds(moment):
+    return int(moment.timestamp())
+
+
+def from_seconds(seconds):
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def _write_varint(out, value):
+    value = value * 2 if value >= 0 else -value * 2 - 1
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_points(points, base):
+    out = bytearray()
+    last_lat, last_lng, last_seconds = base
+    for lat, lng, seconds in points:
+        _write_varint(out, lat - last_lat)
+        _write_varint(out, lng - last_lng)
+        _write_varint(out, seconds - last_seconds)
+        last_lat, last_lng, last_seconds = lat, lng, seconds
+    return bytes(out)
+
+
+def pack_rider_locations(apps, schema_editor):
+    """Move per-point location rows into packed track segments."""
+    RiderLocation = apps.get_model('core', 'RiderLocation')
+    TrackSegment = apps.get_model('core', 'TrackSegment')
+    order_ids = (RiderLocation.objects
+                 .filter(order__isnull=False)
+                 .order_by('order_id')
+                 .values_list('order_id', flat=True)
+                 .distinct())
+    for order_id in order_ids:
+        rows = (RiderLocation.objects
+                .filter(order_id=order_id)
+                .order_by('recorded_at')
+                .values_list('rider_id', 'latitude', 'longitude', 'recorded_at'))
+        points = []
+        rider_id = None
+        for rider_id, latitude, longitude, recorded_at in rows:
+            seconds = to_seconds(recorded_at)
+            if not points or seconds > points[-1][2]:
+                points.append((to_fixed(latitude), to_fixed(longitude), seconds))
+        segments = []
+        for seq, start in enumerate(range(0, len(points), SEGMENT_POINTS)):
+            chunk = points[start:start + SEGMENT_POINTS]
+            segments.append(TrackSegment(
+                order_id=order_id, rider_id=rider_id, seq=seq,
+                start_time=from_seconds(chunk[0][2]), end_time=from_seconds(chunk[-1][2]),
+                point_count=len(chunk), last_latitude_e5=chunk[-1][0], last_longitude_e5=chunk[-1][1],
+                data=encode_points(chunk, (0, 0, chunk[0][2])),
+            ))
+        TrackSegment.objects.bulk_create(segments)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_rider_riderlocation_tracking_rider'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField()),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('point_count', models.PositiveIntegerField(default=0)),
+                ('last_latitude_e5', models.IntegerField(default=0)),
+                ('last_longitude_e5', models.IntegerField(default=0)),
+                ('data', models.BinaryField(default=bytes)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_segments', to='core.order')),
+                ('rider', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='track_segments', to='core.rider')),
+            ],
+            options={
+                'ordering': ['order', 'seq'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tracksegment',
+            constraint=models.UniqueConstraint(fields=('order', 'seq'), name='core_track_segment_order_seq'),
+        ),
+        migrations.RunPython(pack_rider_locations, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='RiderLocation',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_tracksegment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rider',
+            name='is_available',
+            field=models.BooleanField(default=False, help_text='On shift and accepting new deliveries'),
+        ),
+        migrations.AddField(
+            model_name='rider',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
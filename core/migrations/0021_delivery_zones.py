@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_rider_availability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('fee', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('max_distance_km', models.FloatField(blank=True, help_text='Ring radius around the store', null=True)),
+                ('boundary', models.JSONField(blank=True, help_text='GeoJSON Polygon/MultiPolygon geometry', null=True)),
+                ('sort_order', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['sort_order', 'max_distance_km', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delivery_fee',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Included in total_amount', max_digits=8),
+        ),
+    ]
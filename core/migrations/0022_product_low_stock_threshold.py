@@ -0,0 +1,22 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_delivery_zones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='low_stock_threshold',
+            field=models.PositiveIntegerField(default=5, help_text='Stock at or below this counts as low stock'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'stock_quantity', 'low_stock_threshold'], name='core_product_stock_idx'),
+        ),
+    ]
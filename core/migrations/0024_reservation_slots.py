@@ -0,0 +1,69 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:52
+
+from collections import defaultdict
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+
+SLOT_MINUTES = 30
+
+
+def count_upcoming_reservations(apps, schema_editor):
+    """Seed the slot counters from the reservations already booked."""
+    Reservation = apps.get_model('core', 'Reservation')
+    SlotOccupancy = apps.get_model('core', 'SlotOccupancy')
+    counts = defaultdict(lambda: [0, 0])
+    rows = (Reservation.objects
+            .filter(scheduled_for__gte=timezone.now())
+            .exclude(status='cancelled')
+            .annotate(item_total=Sum('items__quantity'))
+            .values_list('scheduled_for', 'item_total'))
+    for scheduled_for, item_total in rows:
+        local = timezone.localtime(scheduled_for)
+        slot = counts[local.replace(minute=local.minute - local.minute % SLOT_MINUTES, second=0, microsecond=0)]
+        slot[0] += 1
+        slot[1] += item_total or 0
+    SlotOccupancy.objects.bulk_create([
+        SlotOccupancy(slot_start=slot, reservations=reservations, items=items)
+        for slot, (reservations, items) in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationSlotRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')], help_text='Leave empty to apply to every day', null=True)),
+                ('opens_at', models.TimeField()),
+                ('closes_at', models.TimeField(help_text='The last slot ends at this time')),
+                ('max_reservations', models.PositiveIntegerField(default=5, help_text='Reservations per slot')),
+                ('max_items', models.PositiveIntegerField(blank=True, help_text='Reserved items per slot; leave empty for no limit', null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['weekday', 'opens_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_start', models.DateTimeField(unique=True)),
+                ('reservations', models.IntegerField(default=0)),
+                ('items', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Slot occupancy',
+                'ordering': ['slot_start'],
+            },
+        ),
+        migrations.RunPython(count_upcoming_reservations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_reservation_slots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'scheduled_for'], name='core_reservation_status_time'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:56
+
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def compute_reservation_totals(apps, schema_editor):
+    """Fill total_amount from the items; item writes keep it up to date from now on."""
+    Reservation = apps.get_model('core', 'Reservation')
+    ReservationItem = apps.get_model('core', 'ReservationItem')
+    line_total = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+    item_totals = (ReservationItem.objects
+                   .filter(reservation=OuterRef('pk'))
+                   .order_by()
+                   .values('reservation')
+                   .annotate(total=Sum(line_total))
+                   .values('total'))
+    Reservation.objects.update(total_amount=Coalesce(
+        Subquery(item_totals), Value(Decimal('0')), output_field=DecimalField(max_digits=10, decimal_places=2)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_reservation_status_time_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(compute_reservation_totals, migrations.RunPython.noop),
+    ]
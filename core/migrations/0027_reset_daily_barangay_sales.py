@@ -0,0 +1,22 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:12
+
+from django.db import migrations
+
+
+def reset_daily_sales(apps, schema_editor):
+    """Barangay revenue now excludes delivery fees; the next aggregation run recomputes every fact."""
+    apps.get_model('core', 'DailyProductSales').objects.all().delete()
+    apps.get_model('core', 'DailyBarangaySales').objects.all().delete()
+    apps.get_model('core', 'DailyPaymentMethodSales').objects.all().delete()
+    apps.get_model('core', 'AggregationWatermark').objects.filter(name='daily_sales').update(last_timestamp=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_reservation_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_daily_sales, migrations.RunPython.noop),
+    ]
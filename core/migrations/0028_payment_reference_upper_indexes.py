@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:10
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_reset_daily_barangay_sales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(django.db.models.functions.text.Upper('reference_number'), name='core_payment_reference_upper'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(django.db.models.functions.text.Upper('transaction_id'), name='core_payment_transaction_upper'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_payment_reference_upper_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='kind',
+            field=models.CharField(choices=[('receipt', 'Receipt'), ('sale', 'Sale'), ('adjustment', 'Adjustment'), ('waste', 'Waste'), ('return', 'Return')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_stockmovement_return_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='delivery_fee',
+            field=models.DecimalField(decimal_places=2, default=0, help_text="Order's delivery fee, billed on top of the items", max_digits=8),
+        ),
+    ]
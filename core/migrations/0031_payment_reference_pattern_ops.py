@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+# Payment searches match prefixes of UPPER(reference_number) / UPPER(transaction_id)
+# with LIKE. Outside the C locale PostgreSQL only serves that from an index
+# built with a pattern operator class, which Django can't declare on an
+# expression index that must also work on SQLite; rebuild the two 0028
+# indexes with one there. Other backends keep them as they are.
+INDEXES = [
+    ('core_payment_reference_upper', 'reference_number'),
+    ('core_payment_transaction_upper', 'transaction_id'),
+]
+
+
+def _rebuild(schema_editor, opclass):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    for name, column in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {quote(name)}')
+        schema_editor.execute(
+            f'CREATE INDEX {quote(name)} ON {quote("core_payment")} ((UPPER({quote(column)}){opclass}))'
+        )
+
+
+def use_pattern_ops(apps, schema_editor):
+    _rebuild(schema_editor, ' varchar_pattern_ops')
+
+
+def use_default_ops(apps, schema_editor):
+    _rebuild(schema_editor, '')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_invoice_delivery_fee'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_pattern_ops, use_default_ops),
+    ]
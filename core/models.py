@@ -1,26 +1,66 @@
 from __future__ import annotations
-from django.db import models
+import secrets
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 
 class Product(models.Model):
     """BBQ products model."""
+    DEFAULT_LOW_STOCK_THRESHOLD = 5
+    STOCK_SUMMARY_CACHE_KEY = 'stock_summary:{}'
+
     name = models.CharField(max_length=120)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
     stock_quantity = models.PositiveIntegerField(default=0, help_text="Available stock quantity")
+    low_stock_threshold = models.PositiveIntegerField(
+        default=DEFAULT_LOW_STOCK_THRESHOLD, help_text="Stock at or below this counts as low stock")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Covers the stock dashboard buckets, so the summary reads only the index
+            models.Index(fields=['is_active', 'stock_quantity', 'low_stock_threshold'], name='core_product_stock_idx'),
+        ]
 
     def __str__(self):
         return self.name
-    
+
+    def save(self, *args, **kwargs):
+        """Save, booking any direct change to ``stock_quantity`` in the stock ledger.
+
+        The ledger has to add up to the stored level, so a product created
+        with stock gets an opening adjustment, and a quantity set by hand
+        (admin, shell, scripts) an adjustment for the difference. Regular
+        stock changes go through ``StockMovement.record`` instead.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'stock_quantity' not in update_fields:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            stored = None
+            if not self._state.adding:
+                stored = (Product.objects
+                          .select_for_update()
+                          .filter(pk=self.pk)
+                          .values_list('stock_quantity', flat=True)
+                          .first())
+            super().save(*args, **kwargs)
+            delta = self.stock_quantity - (stored or 0)
+            if delta:
+                StockMovement.objects.create(
+                    product=self, kind='adjustment', quantity=delta,
+                    note='Opening balance' if stored is None else 'Quantity set on the product')
+
     @property
     def is_in_stock(self):
         """Check if product is in stock."""
@@ -31,23 +71,28 @@ class Product(models.Model):
         """Get stock status display."""
         if self.stock_quantity == 0:
             return "Out of Stock"
-        elif self.stock_quantity <= 5:
+        elif self.stock_quantity <= self.low_stock_threshold:
             return "Low Stock"
         else:
             return "In Stock"
     
-    def reduce_stock(self, quantity):
-        """Reduce stock quantity."""
-        if self.stock_quantity >= quantity:
-            self.stock_quantity -= quantity
-            self.save()
-            return True
-        return False
+    def reduce_stock(self, quantity, kind='sale', **details):
+        """Reduce stock quantity, recording the movement in the stock ledger."""
+        if self.stock_quantity < quantity:
+            return False
+        try:
+            StockMovement.record([StockMovement(product=self, kind=kind, quantity=-quantity, **details)])
+        except InsufficientStock:
+            # Sold elsewhere since this instance was loaded
+            self.refresh_from_db(fields=['stock_quantity', 'updated_at'])
+            return False
+        self.refresh_from_db(fields=['stock_quantity', 'updated_at'])
+        return True
     
-    def add_stock(self, quantity):
-        """Add stock quantity."""
-        self.stock_quantity += quantity
-        self.save()
+    def add_stock(self, quantity, kind='receipt', **details):
+        """Add stock quantity, recording the movement in the stock ledger."""
+        StockMovement.record([StockMovement(product=self, kind=kind, quantity=quantity, **details)])
+        self.refresh_from_db(fields=['stock_quantity', 'updated_at'])
 
 
 class Article(models.Model):
@@ -137,6 +182,10 @@ class Reservation(models.Model):
 
     class Meta:
         ordering = ['-scheduled_for']
+        indexes = [
+            # Calendar windows filter by status and a scheduled_for range
+            models.Index(fields=['status', 'scheduled_for'], name='core_reservation_status_time'),
+        ]
 
     def __str__(self):
         return f"Reservation {self.id} - {self.customer.username} - {self.get_reservation_type_display()}"
@@ -149,6 +198,26 @@ class Reservation(models.Model):
         """Return human-readable reservation type."""
         return dict(self.RESERVATION_TYPE_CHOICES)[self.reservation_type]
 
+    def save(self, *args, **kwargs):
+        # total_amount is kept up to date by item writes; a full save of a
+        # stale copy would undo increments made since it was loaded
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name != 'total_amount']
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored booking so slot occupancy can follow reschedules
+        instance._loaded_booking = (instance.__dict__.get('scheduled_for'), instance.__dict__.get('status'))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or {'scheduled_for', 'status'} <= set(fields):
+            self._loaded_booking = (self.scheduled_for, self.status)
+
 
 class ReservationItem(models.Model):
     """Individual items within a reservation."""
@@ -161,12 +230,122 @@ class ReservationItem(models.Model):
     def __str__(self):
         return f"{self.quantity}x {self.product.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored line so writes can adjust totals and slot counts by the difference
+        instance._loaded_line = (instance.__dict__.get('reservation_id'), instance.__dict__.get('quantity'),
+                                 instance.__dict__.get('price'))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or ({'quantity', 'price'} <= set(fields) and {'reservation', 'reservation_id'} & set(fields)):
+            self._loaded_line = (self.reservation_id, self.quantity, self.price)
+
+    def loaded_line(self):
+        """``(reservation_id, quantity, price)`` as last read from or written to the database."""
+        if self._state.adding:
+            return None
+        line = getattr(self, '_loaded_line', None)
+        if line is None:
+            line = (ReservationItem.objects
+                    .filter(pk=self.pk)
+                    .values_list('reservation_id', 'quantity', 'price')
+                    .first())
+        return line
+
+    def save(self, *args, **kwargs):
+        loaded = self.loaded_line()
+        if loaded is not None:
+            self._loaded_line = loaded
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.adjust_reservation_totals(loaded, (self.reservation_id, self.quantity, self.price))
+        self._loaded_line = (self.reservation_id, self.quantity, self.price)
+
+    @staticmethod
+    def adjust_reservation_totals(old_line, new_line):
+        """Move ``Reservation.total_amount`` by the change between two item lines.
+
+        Lines are ``(reservation_id, quantity, price)`` or None; totals change
+        by F() increments, so concurrent item writes don't overwrite each other.
+        """
+        deltas = {}
+        for line, sign in ((old_line, -1), (new_line, 1)):
+            if line is None:
+                continue
+            reservation_id, quantity, price = line
+            deltas[reservation_id] = deltas.get(reservation_id, Decimal('0')) + sign * quantity * Decimal(str(price))
+        for reservation_id, delta in deltas.items():
+            if delta:
+                Reservation.objects.filter(id=reservation_id).update(total_amount=models.F('total_amount') + delta)
+
     @property
     def total_price(self):
         """Calculate total price for this item."""
         return self.quantity * self.price
 
 
+class ReservationSlotRule(models.Model):
+    """Hours in which reservations can be booked, and how many per time slot.
+
+    Slots are ``SLOT_MINUTES`` long. A rule for a specific weekday replaces
+    the every-day rules on that weekday; once any rule exists, times not
+    covered by one cannot be booked.
+    """
+    SLOT_MINUTES = 30
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, null=True, blank=True,
+                                               help_text="Leave empty to apply to every day")
+    opens_at = models.TimeField()
+    closes_at = models.TimeField(help_text="The last slot ends at this time")
+    max_reservations = models.PositiveIntegerField(default=5, help_text="Reservations per slot")
+    max_items = models.PositiveIntegerField(null=True, blank=True,
+                                            help_text="Reserved items per slot; leave empty for no limit")
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['weekday', 'opens_at']
+
+    def __str__(self):
+        day = self.get_weekday_display() if self.weekday is not None else 'Every day'
+        return f"{day} {self.opens_at:%H:%M}-{self.closes_at:%H:%M}"
+
+    def clean(self):
+        if self.opens_at and self.closes_at and self.closes_at <= self.opens_at:
+            raise ValidationError({'closes_at': 'Must be later than the opening time.'})
+
+
+class SlotOccupancy(models.Model):
+    """Running count of reservations and reserved items in one time slot.
+
+    Adjusted by increments whenever a reservation or one of its items is
+    saved or deleted, so availability is read from these counters instead of
+    counting reservations per slot.
+    """
+    slot_start = models.DateTimeField(unique=True)
+    reservations = models.IntegerField(default=0)
+    items = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['slot_start']
+        verbose_name_plural = 'Slot occupancy'
+
+    def __str__(self):
+        return f"{self.slot_start:%Y-%m-%d %H:%M}: {self.reservations} reservations, {self.items} items"
+
+
 class Order(models.Model):
     """Order model for BBQ products."""
     STATUS_CHOICES = [
@@ -187,7 +366,9 @@ class Order(models.Model):
     delivery_latitude = models.FloatField(null=True, blank=True, help_text="Delivery location latitude")
     delivery_longitude = models.FloatField(null=True, blank=True, help_text="Delivery location longitude")
     delivery_barangay = models.CharField(max_length=100, blank=True, help_text="Barangay/District in Naval")
+    delivery_fee = models.DecimalField(max_digits=8, decimal_places=2, default=0, help_text="Included in total_amount")
     
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text="When the order was marked completed")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -197,6 +378,33 @@ class Order(models.Model):
     def __str__(self):
         return f"Order {self.id} - {self.customer.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored pin so save() can tell when an order was moved
+        instance._loaded_location = (instance.__dict__.get('delivery_latitude'),
+                                     instance.__dict__.get('delivery_longitude'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self.status == 'completed' and self.completed_at is None:
+            self.completed_at = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'completed_at'}
+        super().save(*args, **kwargs)
+        ChangeCounter.bump(ChangeCounter.KITCHEN_BOARD)
+        loaded_location = getattr(self, '_loaded_location', None)
+        location = (self.delivery_latitude, self.delivery_longitude)
+        if loaded_location is not None and loaded_location != location:
+            ChangeCounter.bump(ChangeCounter.DELIVERY_HEATMAP)
+        self._loaded_location = location
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        ChangeCounter.bump(ChangeCounter.KITCHEN_BOARD)
+        ChangeCounter.bump(ChangeCounter.DELIVERY_HEATMAP)
+        return result
+
     def get_status_display(self):
         """Return human-readable status."""
         return dict(self.STATUS_CHOICES)[self.status]
@@ -236,11 +444,13 @@ class OrderTracking(models.Model):
 
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='tracking')
     status = models.CharField(max_length=20, choices=TRACKING_STATUS_CHOICES, default='order_placed')
+    rider = models.ForeignKey('Rider', on_delete=models.SET_NULL, null=True, blank=True, related_name='trackings')
     
     # Current delivery location (driver/rider location)
     latitude = models.FloatField(null=True, blank=True, help_text="Current delivery person latitude")
     longitude = models.FloatField(null=True, blank=True, help_text="Current delivery person longitude")
     location_name = models.CharField(max_length=255, blank=True, help_text="Current location name")
+    location_updated_at = models.DateTimeField(null=True, blank=True, help_text="Time of the latest rider GPS fix")
     
     # Customer location reference
     customer_latitude = models.FloatField(null=True, blank=True, help_text="Customer location latitude")
@@ -257,11 +467,121 @@ class OrderTracking(models.Model):
     def __str__(self):
         return f"Tracking for Order {self.order.id}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so save() can detect transitions
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Save tracking and append a status event when the status changed."""
+        status_changed = self.status != getattr(self, '_loaded_status', None)
+        super().save(*args, **kwargs)
+        if status_changed:
+            OrderStatusEvent.record(self.order_id, self.status)
+            self._loaded_status = self.status
+
     def get_status_display(self):
         """Return human-readable status."""
         return dict(self.TRACKING_STATUS_CHOICES)[self.status]
 
 
+class OrderStatusEvent(models.Model):
+    """Append-only log of order tracking status transitions."""
+    # Compact, stable integer codes for OrderTracking statuses. Never renumber.
+    STATUS_CODES = {
+        'order_placed': 1,
+        'confirmed': 2,
+        'preparing': 3,
+        'ready_for_pickup': 4,
+        'out_for_delivery': 5,
+        'delivered': 6,
+        'cancelled': 7,
+    }
+    STATUS_CHOICES = [
+        (1, 'Order Placed'),
+        (2, 'Order Confirmed'),
+        (3, 'Preparing'),
+        (4, 'Ready for Pickup'),
+        (5, 'Out for Delivery'),
+        (6, 'Delivered'),
+        (7, 'Cancelled'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_events')
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES)
+    ts = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['order', 'ts']
+        indexes = [
+            models.Index(fields=['order', 'ts'], name='core_status_event_order_ts'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id} - {self.get_status_display()} at {self.ts:%Y-%m-%d %H:%M:%S}"
+
+    def get_status_display(self):
+        """Return human-readable status."""
+        return dict(self.STATUS_CHOICES)[self.status]
+
+    @classmethod
+    def record(cls, order_id, status, ts=None):
+        """Append a single status transition for an order."""
+        return cls.objects.create(order_id=order_id, status=cls.STATUS_CODES[status], ts=ts or timezone.now())
+
+    @classmethod
+    def record_bulk(cls, order_ids, status, ts=None):
+        """Append the same status transition for many orders in one insert."""
+        ts = ts or timezone.now()
+        code = cls.STATUS_CODES[status]
+        return cls.objects.bulk_create([cls(order_id=order_id, status=code, ts=ts) for order_id in order_ids])
+
+
+class OrderStatusHourlyStat(models.Model):
+    """Time-in-status distribution for statuses entered during one hour."""
+    hour = models.DateTimeField(help_text="Start of the hour the status was entered")
+    status = models.PositiveSmallIntegerField(choices=OrderStatusEvent.STATUS_CHOICES)
+    sample_count = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    max_seconds = models.FloatField(default=0)
+    histogram = models.JSONField(default=list, help_text="Sample counts per duration bucket")
+    p50_seconds = models.FloatField(default=0)
+    p90_seconds = models.FloatField(default=0)
+    p99_seconds = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-hour', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['hour', 'status'], name='core_status_stat_hour_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_status_display()} @ {self.hour:%Y-%m-%d %H:00} (n={self.sample_count})"
+
+    def get_status_display(self):
+        """Return human-readable status."""
+        return dict(OrderStatusEvent.STATUS_CHOICES)[self.status]
+
+    @property
+    def average_seconds(self):
+        """Mean time spent in the status."""
+        return self.total_seconds / self.sample_count if self.sample_count else 0
+
+
+class AggregationWatermark(models.Model):
+    """Progress marker for incremental aggregation jobs."""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0, help_text="Highest source row id already aggregated")
+    last_timestamp = models.DateTimeField(null=True, blank=True, help_text="Latest source timestamp already aggregated")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
 class OrderItem(models.Model):
     """Individual items within an order."""
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -272,6 +592,15 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity}x {self.product.name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        ChangeCounter.bump(ChangeCounter.KITCHEN_BOARD)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        ChangeCounter.bump(ChangeCounter.KITCHEN_BOARD)
+        return result
+
     @property
     def total_price(self):
         """Calculate total price for this item."""
@@ -341,8 +670,8 @@ class Payment(models.Model):
     status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
     
     # Payment details
-    transaction_id = models.CharField(max_length=100, blank=True, help_text="External payment transaction ID")
-    reference_number = models.CharField(max_length=50, blank=True, help_text="Payment reference number")
+    transaction_id = models.CharField(max_length=100, blank=True, db_index=True, help_text="External payment transaction ID")
+    reference_number = models.CharField(max_length=50, blank=True, db_index=True, help_text="Payment reference number")
     payment_date = models.DateTimeField(null=True, blank=True, help_text="When payment was completed")
     
     # Additional info
@@ -355,6 +684,12 @@ class Payment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Case-insensitive prefix search on references (core.filters); on PostgreSQL
+            # migration 0031 builds them with varchar_pattern_ops so LIKE can use them
+            models.Index(Upper('reference_number'), name='core_payment_reference_upper'),
+            models.Index(Upper('transaction_id'), name='core_payment_transaction_upper'),
+        ]
 
     def __str__(self):
         return f"Payment #{self.id} - Order #{self.order.id} - ₱{self.amount} ({self.get_status_display()})"
@@ -368,6 +703,20 @@ class Payment(models.Model):
         return dict(self.PAYMENT_METHOD_CHOICES)[self.payment_method]
 
 
+class CustomerSearchToken(models.Model):
+    """Normalized name tokens of a user, indexed for prefix search."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=150, db_index=True, help_text="Lowercased, accent-free name fragment")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'token'], name='core_search_token_user_token'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.user_id}"
+
+
 class UserHistory(models.Model):
     """Track user activities and history."""
     ACTION_CHOICES = [
@@ -433,6 +782,7 @@ class Invoice(models.Model):
     
     # Amounts
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    delivery_fee = models.DecimalField(max_digits=8, decimal_places=2, default=0, help_text="Order's delivery fee, billed on top of the items")
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Tax or VAT amount")
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Discount amount if any")
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -468,3 +818,311 @@ class Invoice(models.Model):
             from datetime import date
             return date.today() > self.due_date
         return False
+
+
+class ChangeCounter(models.Model):
+    """Monotonic version number bumped whenever a watched data set changes.
+
+    Lets clients ask "anything new since version X?" with a single primary-key
+    lookup instead of re-rendering the underlying data.
+    """
+    KITCHEN_BOARD = 'kitchen_board'
+    # Bumped when existing orders move or disappear; new orders are added incrementally
+    DELIVERY_HEATMAP = 'delivery_heatmap'
+    DELIVERY_ZONES = 'delivery_zones'
+    # Bumped when reservations or their items change (the kitchen prep plan)
+    RESERVATIONS = 'reservations'
+    # Bumped when product stock, thresholds or availability change (the stock dashboard counts)
+    PRODUCT_STOCK = 'product_stock'
+
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.value}"
+
+    @classmethod
+    def bump(cls, name):
+        """Increment the counter atomically, creating it on first use."""
+        updated = cls.objects.filter(name=name).update(value=models.F('value') + 1, updated_at=timezone.now())
+        if not updated:
+            counter, created = cls.objects.get_or_create(name=name, defaults={'value': 1})
+            if not created:
+                cls.objects.filter(name=name).update(value=models.F('value') + 1, updated_at=timezone.now())
+
+    @classmethod
+    def current(cls, name):
+        """Return the current version of a counter (0 if never bumped)."""
+        return cls.objects.filter(name=name).values_list('value', flat=True).first() or 0
+
+
+class DailyProductSales(models.Model):
+    """Materialized sales per product per day (completed orders)."""
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date', 'product']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='core_daily_product_sales_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.product_id}: {self.quantity} sold"
+
+
+class DailyBarangaySales(models.Model):
+    """Materialized sales per delivery barangay per day (completed orders)."""
+    date = models.DateField()
+    barangay = models.CharField(max_length=100)
+    order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date', 'barangay']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'barangay'], name='core_daily_barangay_sales_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.barangay}: {self.order_count} orders"
+
+
+class DailyPaymentMethodSales(models.Model):
+    """Materialized payments per method per day (completed orders)."""
+    date = models.DateField()
+    payment_method = models.CharField(max_length=20, choices=Payment.PAYMENT_METHOD_CHOICES)
+    payment_count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date', 'payment_method']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'payment_method'], name='core_daily_method_sales_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.payment_method}: {self.amount}"
+
+
+def generate_rider_token():
+    return secrets.token_hex(20)
+
+
+class Rider(models.Model):
+    """Delivery rider. The rider app authenticates with ``api_token``."""
+    TOKEN_CACHE_KEY = 'rider_token:{}'
+
+    user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='rider_profile')
+    name = models.CharField(max_length=100)
+    phone = models.CharField(max_length=20, blank=True)
+    api_token = models.CharField(max_length=64, unique=True, default=generate_rider_token, editable=False)
+    is_active = models.BooleanField(default=True)
+    is_available = models.BooleanField(default=False, help_text="On shift and accepting new deliveries")
+
+    # Latest GPS fix reported by the rider app
+    last_latitude = models.FloatField(null=True, blank=True)
+    last_longitude = models.FloatField(null=True, blank=True)
+    last_seen_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Also bumped by location writes so dispatch indexes can pick up changes
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_token = instance.__dict__.get('api_token')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Save the rider and drop cached token lookups that may now be stale."""
+        super().save(*args, **kwargs)
+        cache.delete(self.TOKEN_CACHE_KEY.format(self.api_token))
+        loaded_token = getattr(self, '_loaded_token', None)
+        if loaded_token and loaded_token != self.api_token:
+            cache.delete(self.TOKEN_CACHE_KEY.format(loaded_token))
+        self._loaded_token = self.api_token
+
+    def regenerate_token(self):
+        self.api_token = generate_rider_token()
+        self.save()
+
+
+class TrackSegment(models.Model):
+    """Slice of a delivery's GPS trail, packed as delta-encoded integers.
+
+    See ``core.tracks`` for the encoding. ``last_*`` hold the final point so
+    new fixes can be appended without decoding ``data``.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='track_segments')
+    rider = models.ForeignKey(Rider, on_delete=models.SET_NULL, null=True, blank=True, related_name='track_segments')
+    seq = models.PositiveIntegerField()
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    point_count = models.PositiveIntegerField(default=0)
+    last_latitude_e5 = models.IntegerField(default=0)
+    last_longitude_e5 = models.IntegerField(default=0)
+    data = models.BinaryField(default=bytes)
+
+    class Meta:
+        ordering = ['order', 'seq']
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'seq'], name='core_track_segment_order_seq'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id} track #{self.seq} ({self.point_count} points)"
+
+
+class DeliveryZone(models.Model):
+    """Delivery fee band around the store.
+
+    A zone covers points within ``max_distance_km`` of the store and/or inside
+    ``boundary`` (a GeoJSON Polygon or MultiPolygon geometry, lon/lat order);
+    when both are set a point must satisfy both. Where zones overlap, the one
+    with the lowest ``sort_order`` wins.
+    """
+    name = models.CharField(max_length=100)
+    fee = models.DecimalField(max_digits=8, decimal_places=2)
+    max_distance_km = models.FloatField(null=True, blank=True, help_text="Ring radius around the store")
+    boundary = models.JSONField(null=True, blank=True, help_text="GeoJSON Polygon/MultiPolygon geometry")
+    sort_order = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['sort_order', 'max_distance_km', 'id']
+
+    def __str__(self):
+        return f"{self.name} (₱{self.fee})"
+
+    def clean(self):
+        if self.max_distance_km is None and not self.boundary:
+            raise ValidationError('Set a distance, a boundary, or both.')
+        if self.boundary and (not isinstance(self.boundary, dict)
+                              or self.boundary.get('type') not in ('Polygon', 'MultiPolygon')):
+            raise ValidationError({'boundary': 'Expected a GeoJSON Polygon or MultiPolygon geometry.'})
+
+
+class InsufficientStock(Exception):
+    """Applying stock movements would take products below zero.
+
+    ``shortages`` maps each such product's id to the quantity it has now.
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f'Not enough stock for products {sorted(shortages)}')
+
+
+class StockMovement(models.Model):
+    """Append-only stock ledger entry; ``quantity`` is the signed change."""
+    KIND_CHOICES = [
+        ('receipt', 'Receipt'),
+        ('sale', 'Sale'),
+        ('adjustment', 'Adjustment'),
+        ('waste', 'Waste'),
+        ('return', 'Return'),
+    ]
+    # Direction each kind moves stock in; adjustments may go either way
+    KIND_SIGNS = {'receipt': 1, 'return': 1, 'sale': -1, 'waste': -1}
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField()
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    note = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='core_stockmove_product_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} {self.product_id}"
+
+    @classmethod
+    def direction_error(cls, kind, quantity):
+        """Why a change of ``quantity`` can't be booked as ``kind``, or None."""
+        sign = cls.KIND_SIGNS.get(kind)
+        if sign is None or quantity == 0 or (quantity > 0) == (sign > 0):
+            return None
+        label = dict(cls.KIND_CHOICES)[kind]
+        return f'{label} must {"add to" if sign > 0 else "take away from"} the stock; use Adjustment to correct counts.'
+
+    @classmethod
+    def record(cls, movements):
+        """Append movements and apply them to ``Product.stock_quantity`` in bulk.
+
+        One INSERT for the ledger rows and one UPDATE for all affected
+        products, in a single transaction; quantities are applied as
+        increments so concurrent writers don't overwrite each other. Products
+        drawn down are locked and checked first; raises ``InsufficientStock``
+        (saving nothing) when a change would take one below zero. The ledger
+        can't be edited afterwards, so a quantity whose sign contradicts its
+        kind is refused with ValueError.
+        """
+        movements = [movement for movement in movements if movement.quantity]
+        if not movements:
+            return []
+        for movement in movements:
+            problem = cls.direction_error(movement.kind, movement.quantity)
+            if problem:
+                raise ValueError(problem)
+        totals = {}
+        for movement in movements:
+            totals[movement.product_id] = totals.get(movement.product_id, 0) + movement.quantity
+        with transaction.atomic():
+            drawn = [product_id for product_id, delta in totals.items() if delta < 0]
+            if drawn:
+                available = dict(Product.objects
+                                 .select_for_update()
+                                 .filter(id__in=drawn)
+                                 .values_list('id', 'stock_quantity'))
+                shortages = {product_id: available.get(product_id, 0) for product_id in drawn
+                             if available.get(product_id, 0) + totals[product_id] < 0}
+                if shortages:
+                    raise InsufficientStock(shortages)
+            cls.objects.bulk_create(movements)
+            Product.objects.filter(id__in=totals).update(
+                stock_quantity=models.Case(
+                    *[models.When(id=product_id, then=models.F('stock_quantity') + delta)
+                      for product_id, delta in totals.items()],
+                    default=models.F('stock_quantity'),
+                    output_field=models.IntegerField(),
+                ),
+                updated_at=timezone.now(),
+            )
+            # Bulk updates skip the post_save hook that retires the dashboard counts
+            ChangeCounter.bump(ChangeCounter.PRODUCT_STOCK)
+        return movements
+
+
+class StockSnapshot(models.Model):
+    """Stock of one product at ``taken_at``, per the ledger up to that moment."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        ordering = ['-taken_at']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'taken_at'], name='core_stock_snapshot_product_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.taken_at:%Y-%m-%d %H:%M}: {self.quantity}"
@@ -0,0 +1,184 @@
+from __future__ import annotations
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum, Count, F, DecimalField, ExpressionWrapper
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import (
+    Order, OrderItem, Payment, AggregationWatermark,
+    DailyProductSales, DailyBarangaySales, DailyPaymentMethodSales,
+)
+
+
+SALES_WATERMARK = 'daily_sales'
+
+# Payments in these states never brought money in
+EXCLUDED_PAYMENT_STATUSES = ('failed', 'cancelled', 'refunded')
+
+UNSPECIFIED_BARANGAY = 'Unspecified'
+
+# Runs aggregate only orders completed this long ago, so an order stamped
+# just before a run but committed after it isn't skipped by the watermark
+AGGREGATION_LAG = timedelta(minutes=5)
+
+
+def normalize_barangay(value):
+    """Collapse free-text barangay input into a stable reporting key."""
+    words = (value or '').split()
+    if len(words) > 1 and words[0].lower().rstrip('.') in ('barangay', 'brgy'):
+        words = words[1:]
+    return ' '.join(words).title() or UNSPECIFIED_BARANGAY
+
+
+def _upsert(model, key_fields, rows, sum_fields):
+    """Add ``rows`` ({key: {field: delta}}) onto existing fact rows."""
+    if not rows:
+        return
+    dates = {key[0] for key in rows}
+    existing = {
+        tuple(getattr(fact, field) for field in key_fields): fact
+        for fact in model.objects.filter(date__in=dates)
+    }
+    to_create, to_update = [], []
+    for key, values in rows.items():
+        fact = existing.get(key)
+        if fact is None:
+            to_create.append(model(**dict(zip(key_fields, key)), **values))
+            continue
+        for field, delta in values.items():
+            setattr(fact, field, getattr(fact, field) + delta)
+        to_update.append(fact)
+    model.objects.bulk_create(to_create)
+    model.objects.bulk_update(to_update, sum_fields)
+
+
+def _product_rows(window, tzinfo):
+    line_total = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+    grouped = (OrderItem.objects
+               .filter(order__in=window)
+               .annotate(day=TruncDate('order__completed_at', tzinfo=tzinfo))
+               .values('day', 'product_id')
+               .annotate(total_quantity=Sum('quantity'), total_revenue=Sum(line_total),
+                         orders=Count('order', distinct=True))
+               .order_by())
+    return {
+        (row['day'], row['product_id']): {
+            'quantity': row['total_quantity'],
+            'revenue': row['total_revenue'] or Decimal('0'),
+            'order_count': row['orders'],
+        }
+        for row in grouped
+    }
+
+
+def _barangay_rows(window, tzinfo):
+    grouped = (window
+               .annotate(day=TruncDate('completed_at', tzinfo=tzinfo))
+               .values('day', 'delivery_barangay')
+               # Sales revenue excludes delivery fees, matching the product line totals
+               .annotate(orders=Count('id'), total_revenue=Sum(F('total_amount') - F('delivery_fee')))
+               .order_by())
+    rows = defaultdict(lambda: {'order_count': 0, 'revenue': Decimal('0')})
+    for row in grouped:
+        # Several spellings of the same barangay fold into one fact row
+        values = rows[(row['day'], normalize_barangay(row['delivery_barangay']))]
+        values['order_count'] += row['orders']
+        values['revenue'] += row['total_revenue'] or Decimal('0')
+    return dict(rows)
+
+
+def _payment_method_rows(window, tzinfo):
+    grouped = (Payment.objects
+               .filter(order__in=window)
+               .exclude(status__in=EXCLUDED_PAYMENT_STATUSES)
+               .annotate(day=TruncDate('order__completed_at', tzinfo=tzinfo))
+               .values('day', 'payment_method')
+               .annotate(payments=Count('id'), total_amount=Sum('amount'))
+               .order_by())
+    return {
+        (row['day'], row['payment_method']): {
+            'payment_count': row['payments'],
+            'amount': row['total_amount'] or Decimal('0'),
+        }
+        for row in grouped
+    }
+
+
+def aggregate_daily_sales(until=None, rebuild=False):
+    """Fold orders completed since the watermark into the daily fact tables.
+
+    Each run only groups orders whose ``completed_at`` falls after the previous
+    run, so the cost follows the number of new sales rather than the history.
+    Pass ``rebuild=True`` to drop the facts and recompute from scratch.
+    Revenue everywhere is item sales without delivery fees; payment amounts
+    are what was collected, fees included. Returns the number of orders
+    aggregated.
+    """
+    until = until or timezone.now() - AGGREGATION_LAG
+    tzinfo = timezone.get_current_timezone()
+
+    with transaction.atomic():
+        watermark, _ = (AggregationWatermark.objects
+                        .select_for_update()
+                        .get_or_create(name=SALES_WATERMARK))
+        if rebuild:
+            DailyProductSales.objects.all().delete()
+            DailyBarangaySales.objects.all().delete()
+            DailyPaymentMethodSales.objects.all().delete()
+            watermark.last_timestamp = None
+
+        window = Order.objects.filter(status='completed', completed_at__lte=until)
+        if watermark.last_timestamp:
+            window = window.filter(completed_at__gt=watermark.last_timestamp)
+        window = window.order_by()
+
+        order_count = window.count()
+        if order_count:
+            _upsert(DailyProductSales, ('date', 'product_id'), _product_rows(window, tzinfo),
+                    ['quantity', 'revenue', 'order_count'])
+            _upsert(DailyBarangaySales, ('date', 'barangay'), _barangay_rows(window, tzinfo),
+                    ['order_count', 'revenue'])
+            _upsert(DailyPaymentMethodSales, ('date', 'payment_method'), _payment_method_rows(window, tzinfo),
+                    ['payment_count', 'amount'])
+
+        watermark.last_timestamp = until
+        watermark.save()
+    return order_count
+
+
+def sales_report(start, end):
+    """Read the fact tables for an inclusive date range."""
+    product_facts = DailyProductSales.objects.filter(date__range=(start, end))
+    barangay_facts = DailyBarangaySales.objects.filter(date__range=(start, end))
+    method_facts = DailyPaymentMethodSales.objects.filter(date__range=(start, end))
+
+    daily = list(barangay_facts
+                 .values('date')
+                 .annotate(orders=Sum('order_count'), revenue=Sum('revenue'))
+                 .order_by('date'))
+    products = list(product_facts
+                    .values('product_id', 'product__name')
+                    .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'), orders=Sum('order_count'))
+                    .order_by('-revenue'))
+    barangays = list(barangay_facts
+                     .values('barangay')
+                     .annotate(orders=Sum('order_count'), revenue=Sum('revenue'))
+                     .order_by('-revenue'))
+    method_labels = dict(Payment.PAYMENT_METHOD_CHOICES)
+    methods = [
+        {**row, 'label': method_labels.get(row['payment_method'], row['payment_method'])}
+        for row in (method_facts
+                    .values('payment_method')
+                    .annotate(payments=Sum('payment_count'), amount=Sum('amount'))
+                    .order_by('-amount'))
+    ]
+    return {
+        'daily': daily,
+        'products': products,
+        'barangays': barangays,
+        'methods': methods,
+        'total_orders': sum(row['orders'] for row in daily),
+        'total_revenue': sum((row['revenue'] for row in daily), Decimal('0')),
+    }
@@ -0,0 +1,69 @@
+from __future__ import annotations
+from datetime import datetime, time, timedelta
+from django.db.models import Prefetch
+from django.urls import reverse
+from django.utils import timezone
+from .models import Reservation, ReservationItem
+
+
+CALENDAR_VIEWS = ('week', 'day')
+# Cancelled bookings are hidden unless asked for
+DEFAULT_CALENDAR_STATUSES = tuple(status for status, _label in Reservation.STATUS_CHOICES if status != 'cancelled')
+# Longest window the calendar feed serves in one request (days)
+MAX_WINDOW_DAYS = 42
+
+
+def calendar_window(anchor, view='week'):
+    """First and last day (inclusive) of the day or Monday-first week containing ``anchor``."""
+    if view == 'day':
+        return anchor, anchor
+    start = anchor - timedelta(days=anchor.weekday())
+    return start, start + timedelta(days=6)
+
+
+def reservations_between(first_day, last_day, statuses=DEFAULT_CALENDAR_STATUSES):
+    """Reservations scheduled on local days ``first_day``..``last_day``.
+
+    Filters on status and a ``scheduled_for`` range so the
+    (status, scheduled_for) index bounds the scan to the window; customers
+    are joined and items prefetched with their products.
+    """
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    return (Reservation.objects
+            .filter(status__in=statuses, scheduled_for__gte=start, scheduled_for__lt=end)
+            .select_related('customer')
+            .prefetch_related(Prefetch('items', queryset=ReservationItem.objects.select_related('product')))
+            .order_by('scheduled_for', 'id'))
+
+
+def calendar_events(first_day, last_day, statuses=DEFAULT_CALENDAR_STATUSES):
+    """JSON-ready calendar data for a window of days."""
+    events = []
+    for reservation in reservations_between(first_day, last_day, statuses):
+        customer = reservation.customer
+        events.append({
+            'id': reservation.id,
+            'start': timezone.localtime(reservation.scheduled_for).isoformat(),
+            'status': reservation.status,
+            'status_display': reservation.get_status_display(),
+            'type': reservation.get_reservation_type_display(),
+            'customer': customer.get_full_name() or customer.username,
+            'contact_phone': reservation.contact_phone,
+            'notes': reservation.notes,
+            'total_amount': str(reservation.total_amount),
+            'url': reverse('admin:core_reservation_change', args=[reservation.id]),
+            'items': [
+                {
+                    'name': item.product.name,
+                    'quantity': item.quantity,
+                    'special_instructions': item.special_instructions,
+                }
+                for item in reservation.items.all()
+            ],
+        })
+    return {
+        'start': first_day.isoformat(),
+        'end': last_day.isoformat(),
+        'events': events,
+    }
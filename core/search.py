@@ -0,0 +1,113 @@
+from __future__ import annotations
+import re
+import unicodedata
+from django.contrib.auth.models import User
+from django.db.models import Q
+from .models import CustomerSearchToken
+
+
+# Largest value a BigAutoField primary key can hold
+MAX_ID = 2 ** 63 - 1
+
+INVOICE_PREFIX = 'INV-'
+
+_TOKEN_SPLIT = re.compile(r'[^0-9a-z]+')
+_NAME_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def normalize_tokens(*values):
+    """Lowercase, strip accents and split text into search tokens."""
+    tokens = []
+    for value in values:
+        text = unicodedata.normalize('NFKD', value or '')
+        text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+        tokens.extend(token for token in _TOKEN_SPLIT.split(text) if token)
+    return tokens
+
+
+def prefix_q(field, prefix):
+    """``startswith`` for case-normalized columns.
+
+    A ``LIKE 'prefix%'`` is only index-served on PostgreSQL (outside the C
+    locale) by an index with a pattern operator class: Django adds those for
+    indexed CharFields, and migration 0031 builds the payment indexes so.
+    """
+    return Q(**{f'{field}__startswith': prefix})
+
+
+def invoice_number_q(field, search):
+    """Invoice number prefix match; staff may leave out the ``INV-`` prefix."""
+    number = search.strip().upper()
+    if not number.startswith(INVOICE_PREFIX):
+        number = INVOICE_PREFIX + number
+    return prefix_q(field, number)
+
+
+def parse_number(search):
+    """Return the integer in inputs like ``42`` or ``#000042``, else None."""
+    text = search.strip().lstrip('#')
+    if text.isdigit() and int(text) <= MAX_ID:
+        return int(text)
+    return None
+
+
+def looks_like_invoice_number(search):
+    return search.strip().upper().startswith(INVOICE_PREFIX)
+
+
+def looks_like_reference(search):
+    """Payment references/transaction IDs always contain digits; names don't."""
+    text = search.strip()
+    return ' ' not in text and any(char.isdigit() for char in text)
+
+
+def index_customer(user):
+    """Bring the search tokens of one user in line with their names."""
+    wanted = set(normalize_tokens(user.username, user.first_name, user.last_name))
+    existing = set(CustomerSearchToken.objects.filter(user=user).values_list('token', flat=True))
+    if existing - wanted:
+        CustomerSearchToken.objects.filter(user=user, token__in=existing - wanted).delete()
+    CustomerSearchToken.objects.bulk_create(
+        [CustomerSearchToken(user=user, token=token[:150]) for token in wanted - existing],
+        ignore_conflicts=True,
+    )
+
+
+def rebuild_customer_index(chunk_size=1000):
+    """Recreate every customer's search tokens. Returns the number of users indexed."""
+    CustomerSearchToken.objects.all().delete()
+    indexed = 0
+    batch = []
+    users = User.objects.order_by('id').values_list('id', 'username', 'first_name', 'last_name')
+    for user_id, username, first_name, last_name in users.iterator(chunk_size=chunk_size):
+        batch.extend(
+            CustomerSearchToken(user_id=user_id, token=token[:150])
+            for token in set(normalize_tokens(username, first_name, last_name))
+        )
+        indexed += 1
+        if len(batch) >= chunk_size:
+            CustomerSearchToken.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    CustomerSearchToken.objects.bulk_create(batch, ignore_conflicts=True)
+    return indexed
+
+
+def matching_customers(search):
+    """Users whose name tokens start with every word of ``search``.
+
+    Returns a ``values('id')`` queryset suitable for ``customer_id__in``.
+    """
+    users = User.objects.all()
+    tokens = normalize_tokens(search)
+    if not tokens:
+        return users.none().values('id')
+    for token in tokens:
+        users = users.filter(id__in=CustomerSearchToken.objects
+                             .filter(prefix_q('token', token))
+                             .values('user_id'))
+    return users.values('id')
+
+
+def should_reindex(update_fields):
+    """Whether a User save may have changed the indexed name fields."""
+    return update_fields is None or bool(_NAME_FIELDS & set(update_fields))
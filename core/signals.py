@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from . import capacity
+from .models import ChangeCounter, DeliveryZone, Product, Reservation, ReservationItem
+from .search import index_customer, should_reindex
+from .stock import invalidate_stock_summary
+
+
+@receiver(post_save, sender=User)
+def update_customer_search_tokens(sender, instance, update_fields=None, **kwargs):
+    """Keep staff name search in sync when a user's names change."""
+    if should_reindex(update_fields):
+        index_customer(instance)
+
+
+@receiver(post_save, sender=DeliveryZone)
+@receiver(post_delete, sender=DeliveryZone)
+def invalidate_fee_tables(sender, **kwargs):
+    """Make every process rebuild its fee lookup table (admin bulk deletes included)."""
+    ChangeCounter.bump(ChangeCounter.DELIVERY_ZONES)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_stock_summary(sender, **kwargs):
+    """Stock dashboard counts are cached until a product changes."""
+    invalidate_stock_summary()
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_save, sender=ReservationItem)
+@receiver(post_delete, sender=ReservationItem)
+def invalidate_prep_plan(sender, **kwargs):
+    """The kitchen prep plan is cached per reservations version."""
+    ChangeCounter.bump(ChangeCounter.RESERVATIONS)
+
+
+@receiver(post_save, sender=Reservation)
+def track_reservation_slot(sender, instance, created, **kwargs):
+    """Keep the slot occupancy counters in step with bookings."""
+    capacity.reservation_saved(instance, created)
+
+
+@receiver(pre_delete, sender=Reservation)
+def read_reservation_slot(sender, instance, **kwargs):
+    capacity.reservation_deleting(instance)
+
+
+@receiver(post_delete, sender=Reservation)
+def release_reservation_slot(sender, instance, **kwargs):
+    capacity.reservation_deleted(instance)
+
+
+@receiver(post_save, sender=ReservationItem)
+def track_reserved_items(sender, instance, created, **kwargs):
+    capacity.item_saved(instance, created)
+
+
+@receiver(pre_delete, sender=ReservationItem)
+def read_reserved_items(sender, instance, **kwargs):
+    capacity.item_deleting(instance)
+
+
+@receiver(post_delete, sender=ReservationItem)
+def release_reserved_items(sender, instance, **kwargs):
+    capacity.item_deleted(instance)
+
+
+@receiver(post_delete, sender=ReservationItem)
+def subtract_reservation_item(sender, instance, **kwargs):
+    """Take a deleted item off its reservation's total (queryset deletes included)."""
+    line = getattr(instance, '_deleted_line', None)
+    if line is not None:
+        ReservationItem.adjust_reservation_totals(line, None)
@@ -0,0 +1,249 @@
+from __future__ import annotations
+import csv
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .forms import BulkStockForm
+from .models import ChangeCounter, InsufficientStock, Product, StockMovement, StockSnapshot, UserHistory
+
+
+# Dashboard buckets; low stock is relative to each product's own threshold
+STOCK_FILTERS = {
+    'out_of_stock': Q(stock_quantity=0),
+    'low_stock': Q(stock_quantity__gt=0, stock_quantity__lte=F('low_stock_threshold')),
+    'in_stock': Q(stock_quantity__gt=F('low_stock_threshold')),
+    'inactive': Q(is_active=False),
+}
+# Longest a cached summary is served, for writes that don't bump the counter
+STOCK_SUMMARY_SECONDS = 300
+
+# Columns/keys understood by stock imports; rows name a product by id or name
+IMPORT_FIELDS = ('stock_quantity', 'low_stock_threshold', 'is_active')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off'}
+
+# Snapshots stop this far behind "now", so movements still being committed
+# with a slightly earlier timestamp are not left out of them
+SNAPSHOT_LAG = timedelta(minutes=5)
+# Lower bound used for products that have no snapshot yet
+LEDGER_START = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def filter_stock(products, stock_filter):
+    """Narrow a Product queryset to one dashboard bucket ('all' or unknown: no-op)."""
+    condition = STOCK_FILTERS.get(stock_filter)
+    return products if condition is None else products.filter(condition)
+
+
+def stock_summary():
+    """Product counts per stock bucket, from one conditional-aggregate query.
+
+    Cached under the ``ChangeCounter.PRODUCT_STOCK`` version, which every
+    process and management command bumps when products change; the timeout
+    bounds staleness after writes that skip the hooks (queryset updates).
+    """
+    key = Product.STOCK_SUMMARY_CACHE_KEY.format(ChangeCounter.current(ChangeCounter.PRODUCT_STOCK))
+    summary = cache.get(key)
+    if summary is None:
+        summary = Product.objects.aggregate(
+            total_products=Count('id'),
+            **{f'{name}_count': Count('id', filter=condition) for name, condition in STOCK_FILTERS.items()},
+        )
+        cache.set(key, summary, STOCK_SUMMARY_SECONDS)
+    return summary
+
+
+def invalidate_stock_summary():
+    ChangeCounter.bump(ChangeCounter.PRODUCT_STOCK)
+
+
+def stock_as_of(moment, products=None):
+    """``{product_id: quantity}`` at ``moment`` according to the stock ledger.
+
+    Each product starts from its latest snapshot at or before ``moment`` and
+    adds only the movements after it, all in one query; the
+    (product, created_at) index keeps each range scan short.
+    """
+    products = Product.objects.all() if products is None else products
+    snapshots = (StockSnapshot.objects
+                 .filter(product=OuterRef('pk'), taken_at__lte=moment)
+                 .order_by('-taken_at'))
+    movements = (StockMovement.objects
+                 .filter(product=OuterRef('pk'), created_at__lte=moment,
+                         created_at__gt=Coalesce(OuterRef('snapshot_at'), Value(LEDGER_START)))
+                 .order_by()
+                 .values('product')
+                 .annotate(total=Sum('quantity'))
+                 .values('total'))
+    rows = (products
+            .order_by()
+            .annotate(snapshot_at=Subquery(snapshots.values('taken_at')[:1]))
+            .annotate(quantity_as_of=(
+                Coalesce(Subquery(snapshots.values('quantity')[:1]), 0)
+                + Coalesce(Subquery(movements, output_field=IntegerField()), 0)))
+            .values_list('id', 'quantity_as_of'))
+    return dict(rows)
+
+
+def take_stock_snapshot(moment=None):
+    """Snapshot every product's ledger balance; returns the snapshots created."""
+    moment = moment or timezone.now() - SNAPSHOT_LAG
+    quantities = stock_as_of(moment)
+    existing = set(StockSnapshot.objects.filter(taken_at=moment).values_list('product_id', flat=True))
+    return StockSnapshot.objects.bulk_create([
+        StockSnapshot(product_id=product_id, taken_at=moment, quantity=quantity)
+        for product_id, quantity in quantities.items()
+        if product_id not in existing
+    ])
+
+
+def misdirected_updates(updates, kind):
+    """``{product_id: message}`` for ``(product, delta)`` edits that contradict ``kind``."""
+    errors = {}
+    for product, delta in updates:
+        problem = StockMovement.direction_error(kind, delta)
+        if problem:
+            errors[product.pk] = problem
+    return errors
+
+
+def apply_stock_updates(updates, kind='adjustment', note='', user=None, ip_address=None, user_agent=''):
+    """Save a batch of stock edits in one transaction.
+
+    ``updates`` are ``(product, delta)`` pairs whose products already carry
+    their new threshold and availability. Those are written with a single
+    ``bulk_update``, non-zero deltas become ledger movements applied by
+    ``StockMovement.record``, and when ``user`` is given one activity entry
+    per product is added with a single insert. Returns the products saved.
+
+    Deltas are worked out from the quantity the user saw, so sales made in
+    the meantime can leave too little stock for a reduction; the batch is
+    then rolled back and ``InsufficientStock`` raised.
+    """
+    if not updates:
+        return []
+    now = timezone.now()
+    products = []
+    for product, _delta in updates:
+        product.updated_at = now
+        products.append(product)
+    with transaction.atomic():
+        Product.objects.bulk_update(products, ['low_stock_threshold', 'is_active', 'updated_at'])
+        StockMovement.record([
+            StockMovement(product=product, kind=kind, quantity=delta, note=note, created_by=user, created_at=now)
+            for product, delta in updates
+        ])
+        if user is not None:
+            UserHistory.objects.bulk_create([
+                UserHistory(
+                    user=user,
+                    action='admin_action',
+                    description=f'Updated stock for {product.name}: {delta:+d} units, Active: {product.is_active}',
+                    ip_address=ip_address,
+                    user_agent=user_agent,
+                )
+                for product, delta in updates
+            ])
+        invalidate_stock_summary()
+    return products
+
+
+def shortage_message(available):
+    return f'Only {available} left in stock now (sold since the page was loaded); re-enter the new quantity.'
+
+
+def read_stock_records(handle, fmt):
+    """Rows of a stock import file as dicts; ``fmt`` is 'csv' or 'json'.
+
+    JSON files hold a list of objects. Raises ValueError for unreadable files.
+    """
+    if fmt == 'json':
+        try:
+            records = json.load(handle)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f'Invalid JSON: {exc}') from exc
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise ValueError('Expected a JSON list of objects.')
+        return records
+    reader = csv.DictReader(handle)
+    if not reader.fieldnames:
+        raise ValueError('The CSV file is empty.')
+    return [{key.strip(): value for key, value in row.items() if key} for row in reader]
+
+
+def _import_value(field, value):
+    if isinstance(value, str):
+        value = value.strip()
+    if field != 'is_active' or isinstance(value, bool):
+        return value
+    if str(value).lower() in TRUE_VALUES:
+        return True
+    if str(value).lower() in FALSE_VALUES:
+        return False
+    raise ValueError(f'is_active must be true or false, not {value!r}')
+
+
+def prepare_stock_updates(records):
+    """Validate imported rows against the current products.
+
+    Products are looked up by ``id`` or exact ``name`` in one query and each
+    row is checked with ``BulkStockForm``; columns left out or blank keep the
+    product's current value, and ``stock_quantity`` is the new absolute level.
+    Returns ``(updates, errors)``: ``(product, delta)`` pairs for rows that
+    change something, ready for ``apply_stock_updates``, and one message per
+    invalid row.
+    """
+    ids, names = set(), set()
+    for record in records:
+        key = str(record.get('id') or '').strip()
+        if key.isdigit():
+            ids.add(int(key))
+        elif record.get('name'):
+            names.add(str(record['name']).strip())
+    by_id, by_name = {}, {}
+    for product in Product.objects.filter(Q(id__in=ids) | Q(name__in=names)):
+        by_id[product.id] = product
+        by_name.setdefault(product.name, []).append(product)
+
+    updates, errors, seen = [], [], set()
+    for line, record in enumerate(records, start=1):
+        key = str(record.get('id') or '').strip()
+        name = str(record.get('name') or '').strip()
+        if key.isdigit():
+            product = by_id.get(int(key))
+            label = f'id {key}'
+        else:
+            matches = by_name.get(name, [])
+            product = matches[0] if len(matches) == 1 else None
+            label = f'"{name}"' if name else 'no product'
+            if len(matches) > 1:
+                errors.append(f'Row {line}: {len(matches)} products are named "{name}"; use the id column.')
+                continue
+        if product is None:
+            errors.append(f'Row {line}: unknown product ({label}).')
+            continue
+        if product.id in seen:
+            errors.append(f'Row {line}: {product.name} appears more than once.')
+            continue
+        seen.add(product.id)
+
+        data = {field: getattr(product, field) for field in IMPORT_FIELDS}
+        # Deltas are taken against the level the product has now
+        data['initial-stock_quantity'] = product.stock_quantity
+        try:
+            data.update({field: _import_value(field, record[field]) for field in IMPORT_FIELDS
+                         if record.get(field) not in (None, '')})
+        except ValueError as exc:
+            errors.append(f'Row {line}: {exc}')
+            continue
+        form = BulkStockForm(data, instance=product)
+        if not form.is_valid():
+            problems = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in form.errors.items())
+            errors.append(f'Row {line}: {problems}')
+        elif form.has_changed():
+            updates.append((form.instance, form.stock_delta()))
+    return updates, errors
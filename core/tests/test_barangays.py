@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from core.barangays import Barangay, BarangayResolver, get_barangay_resolver
+from core.checks import barangay_boundaries_check
+
+
+def square(min_x, min_y, size):
+    return [(min_x, min_y), (min_x + size, min_y), (min_x + size, min_y + size), (min_x, min_y + size)]
+
+
+class BarangayResolverTests(SimpleTestCase):
+    def setUp(self):
+        # Two side-by-side barangays; the second has a hole that belongs to neither
+        self.resolver = BarangayResolver([
+            Barangay('Caraycaray', [square(124.38, 11.54, 0.02)]),
+            Barangay('Larrazabal', [square(124.40, 11.54, 0.02), square(124.405, 11.545, 0.005)]),
+        ], cell_size=0.003)
+
+    def test_resolves_points_to_their_barangay(self):
+        self.assertEqual(self.resolver.resolve(11.55, 124.39), 'Caraycaray')
+        self.assertEqual(self.resolver.resolve(11.55, 124.415), 'Larrazabal')
+
+    def test_points_outside_or_in_holes_resolve_to_nothing(self):
+        self.assertIsNone(self.resolver.resolve(11.60, 124.39))
+        self.assertIsNone(self.resolver.resolve(11.5475, 124.4075))
+
+    def test_empty_resolver_is_unavailable(self):
+        resolver = BarangayResolver([])
+        self.assertFalse(resolver.available)
+        self.assertIsNone(resolver.resolve(11.55, 124.39))
+
+
+class BoundariesSettingTests(SimpleTestCase):
+    def setUp(self):
+        get_barangay_resolver.cache_clear()
+        self.addCleanup(get_barangay_resolver.cache_clear)
+
+    def boundaries_file(self, features):
+        handle, path = tempfile.mkstemp(suffix='.geojson')
+        with os.fdopen(handle, 'w') as file:
+            json.dump({'type': 'FeatureCollection', 'features': features}, file)
+        self.addCleanup(os.remove, path)
+        return path
+
+    @override_settings(BARANGAY_BOUNDARIES_FILE=None)
+    def test_switched_off_without_the_setting(self):
+        self.assertFalse(get_barangay_resolver().available)
+        self.assertEqual(barangay_boundaries_check(None), [])
+        with self.assertRaisesMessage(CommandError, 'switched off'):
+            call_command('resolve_barangays')
+
+    def test_warns_when_the_file_has_no_boundaries(self):
+        with override_settings(BARANGAY_BOUNDARIES_FILE=self.boundaries_file([])), \
+                self.assertLogs('core.barangays', 'WARNING'):
+            self.assertEqual([w.id for w in barangay_boundaries_check(None)], ['core.W001'])
+
+    def test_loads_boundaries_from_the_setting(self):
+        feature = {'type': 'Feature', 'properties': {'name': 'Caraycaray'},
+                   'geometry': {'type': 'Polygon', 'coordinates': [[list(p) for p in square(124.38, 11.54, 0.02)]]}}
+        with override_settings(BARANGAY_BOUNDARIES_FILE=self.boundaries_file([feature])):
+            self.assertEqual(barangay_boundaries_check(None), [])
+            self.assertEqual(get_barangay_resolver().resolve(11.55, 124.39), 'Caraycaray')
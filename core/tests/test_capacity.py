@@ -0,0 +1,69 @@
+from datetime import datetime, time, timedelta
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from core.capacity import SlotUnavailable, book_reservation, slot_start
+from core.forms import ReservationForm
+from core.models import Reservation, ReservationItem, ReservationSlotRule, SlotOccupancy, Product
+
+
+class SlotCapacityTests(TestCase):
+    def setUp(self):
+        ReservationSlotRule.objects.create(opens_at=time(8), closes_at=time(20), max_reservations=1)
+        self.customers = [User.objects.create_user(f'customer{i}') for i in range(2)]
+        day = timezone.localdate() + timedelta(days=1)
+        self.moment = timezone.make_aware(datetime.combine(day, time(12)))
+
+    def occupancy(self, moment=None):
+        return (SlotOccupancy.objects
+                .filter(slot_start=slot_start(moment or self.moment))
+                .values_list('reservations', 'items')
+                .first())
+
+    def form(self, moment=None, instance=None):
+        return ReservationForm({
+            'reservation_type': 'pickup',
+            'scheduled_for': timezone.localtime(moment or self.moment).strftime('%Y-%m-%dT%H:%M'),
+        }, instance=instance)
+
+    def test_concurrent_bookings_for_the_last_place(self):
+        forms = [self.form(), self.form()]
+        # Both validate before either is saved, as two simultaneous requests would
+        self.assertTrue(all(form.is_valid() for form in forms))
+        first, second = (form.save(commit=False) for form in forms)
+        first.customer, second.customer = self.customers
+        book_reservation(first)
+        with self.assertRaises(SlotUnavailable):
+            book_reservation(second)
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(self.occupancy(), (1, 0))
+
+    def test_full_slot_fails_validation(self):
+        book_reservation(Reservation(customer=self.customers[0], scheduled_for=self.moment))
+        form = self.form()
+        self.assertFalse(form.is_valid())
+        self.assertIn('scheduled_for', form.errors)
+
+    def test_rescheduling_within_its_slot_passes(self):
+        reservation = book_reservation(Reservation(customer=self.customers[0], scheduled_for=self.moment))
+        form = self.form(self.moment + timedelta(minutes=10), instance=reservation)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self.occupancy(), (1, 0))
+
+    def test_moving_releases_the_old_slot(self):
+        reservation = book_reservation(Reservation(customer=self.customers[0], scheduled_for=self.moment))
+        ReservationItem.objects.create(
+            reservation=reservation, product=Product.objects.create(name='Liempo', price=150),
+            quantity=3, price=150)
+        later = self.moment + timedelta(hours=2)
+        form = self.form(later, instance=reservation)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self.occupancy(), (0, 0))
+        self.assertEqual(self.occupancy(later), (1, 3))
+
+    def test_closed_hours_are_rejected(self):
+        late = timezone.make_aware(datetime.combine(self.moment.date(), time(22)))
+        with self.assertRaises(SlotUnavailable):
+            book_reservation(Reservation(customer=self.customers[0], scheduled_for=late))
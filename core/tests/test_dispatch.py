@@ -0,0 +1,46 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from core.dispatch import RiderIndex, assign_riders
+from core.models import Order, OrderTracking, Rider
+
+
+class AssignRidersTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user('juan')
+        # Near rider sits by the drop-off points, far rider across town
+        self.near = self.rider('Near', 11.5610, 124.3960)
+        self.far = self.rider('Far', 11.5800, 124.4100)
+        self.index = RiderIndex()
+
+    def rider(self, name, latitude, longitude):
+        return Rider.objects.create(name=name, is_available=True, last_latitude=latitude,
+                                    last_longitude=longitude, last_seen_at=timezone.now())
+
+    def order(self):
+        return Order.objects.create(customer=self.customer, total_amount=100,
+                                    delivery_latitude=11.5600, delivery_longitude=124.3950)
+
+    def rider_of(self, order):
+        return OrderTracking.objects.get(order=order).rider_id
+
+    def test_each_rider_takes_one_order_per_run(self):
+        self.far.is_available = False
+        self.far.save()
+        first, second = self.order(), self.order()
+        self.assertEqual(assign_riders(index=self.index), {first.id: self.near.id})
+        self.assertEqual(self.rider_of(first), self.near.id)
+        self.assertFalse(OrderTracking.objects.filter(order=second).exists())
+
+    def test_busy_riders_are_skipped(self):
+        OrderTracking.objects.create(order=self.order(), rider=self.near, status='out_for_delivery')
+        order = self.order()
+        self.assertEqual(assign_riders(index=self.index), {order.id: self.far.id})
+
+    def test_rider_claimed_elsewhere_is_swapped_for_the_next_nearest(self):
+        order = self.order()
+        # Free when matched, then found busy once locked, as if another checkout took them in between
+        with mock.patch('core.dispatch.busy_rider_ids', side_effect=[set(), {self.near.id}, set()]):
+            self.assertEqual(assign_riders(index=self.index), {order.id: self.far.id})
+        self.assertEqual(self.rider_of(order), self.far.id)
@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from core.filters import filter_invoices, filter_orders, filter_payments
+from core.models import Invoice, Order, Payment
+
+
+class StaffSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.juan = User.objects.create_user('juan23', first_name='Juan', last_name='Dela Cruz')
+        cls.maria = User.objects.create_user('maria', first_name='María', last_name='Santos')
+        cls.order = Order.objects.create(customer=cls.juan, total_amount=100)
+        cls.other = Order.objects.create(customer=cls.maria, total_amount=50)
+        cls.invoice = Invoice.objects.create(
+            order=cls.order, customer=cls.juan, invoice_number='INV-20261019-0001',
+            subtotal=100, total_amount=100, customer_name='Juan Dela Cruz', customer_email='juan@example.com',
+        )
+        cls.payment = Payment.objects.create(
+            order=cls.other, customer=cls.maria, amount=50, payment_method='gcash',
+            reference_number='abc123xyz', transaction_id='TX-9001',
+        )
+
+    def search(self, filter_func, queryset, text):
+        return list(filter_func(queryset, {'search': text}))
+
+    def test_invoice_number_with_or_without_prefix(self):
+        for text in ('INV-20261019-0001', 'inv-20261019', '20261019-0001'):
+            with self.subTest(text=text):
+                self.assertEqual(self.search(filter_invoices, Invoice.objects.all(), text), [self.invoice])
+                self.assertEqual(self.search(filter_orders, Order.objects.all(), text), [self.order])
+
+    def test_digits_match_order_number_or_invoice_number(self):
+        self.assertEqual(self.search(filter_invoices, Invoice.objects.all(), str(self.order.id)), [self.invoice])
+        self.assertEqual(self.search(filter_invoices, Invoice.objects.all(), '20261019'), [self.invoice])
+
+    def test_payment_reference_prefix_is_case_insensitive(self):
+        for text in ('ABC1', 'abc123', 'tx-90'):
+            with self.subTest(text=text):
+                self.assertEqual(self.search(filter_payments, Payment.objects.all(), text), [self.payment])
+
+    def test_reference_like_usernames_still_match_customers(self):
+        self.assertEqual(self.search(filter_orders, Order.objects.all(), 'juan23'), [self.order])
+
+    def test_accented_names_match_plain_words(self):
+        self.assertEqual(self.search(filter_payments, Payment.objects.all(), 'maria san'), [self.payment])
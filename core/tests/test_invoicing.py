@@ -0,0 +1,89 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+from core.invoice_pdf import invoice_pdf_key, invoice_snapshot, render_invoice_pdf
+from core.invoicing import allocate_invoice_numbers, invoice_for_order, uninvoiced_orders
+from core.models import Invoice, Order, OrderItem, Product
+
+
+class InvoiceDeliveryFeeTests(TestCase):
+    def setUp(self):
+        customer = User.objects.create_user('juan', first_name='Juan', last_name='Cruz')
+        product = Product.objects.create(name='Pork BBQ', price=Decimal('25.00'))
+        self.order = Order.objects.create(
+            customer=customer, status='completed', completed_at=timezone.now(),
+            delivery_fee=Decimal('40.00'), total_amount=Decimal('140.00'),
+        )
+        OrderItem.objects.create(order=self.order, product=product, quantity=4, price=Decimal('25.00'))
+
+    def test_invoice_bills_the_delivery_fee(self):
+        order = uninvoiced_orders().get()
+        invoice = invoice_for_order(order, 'INV-1', order.items_subtotal)
+        self.assertEqual(invoice.subtotal, Decimal('100.00'))
+        self.assertEqual(invoice.delivery_fee, Decimal('40.00'))
+        self.assertEqual(invoice.total_amount, self.order.total_amount)
+
+    def test_generate_invoices_matches_order_totals(self):
+        call_command('generate_invoices', stdout=StringIO())
+        invoice = Invoice.objects.get(order=self.order)
+        self.assertEqual(invoice.total_amount, Decimal('140.00'))
+
+    def test_fee_is_part_of_the_pdf_key(self):
+        order = uninvoiced_orders().get()
+        invoice = invoice_for_order(order, 'INV-1', order.items_subtotal)
+        invoice.save()
+        snapshot = invoice_snapshot(invoice)
+        self.assertEqual(snapshot['delivery_fee'], '40.00')
+        self.assertIn(b'Delivery Fee', render_invoice_pdf(snapshot))
+        invoice.delivery_fee = Decimal('0.00')
+        self.assertNotEqual(invoice_pdf_key(invoice_snapshot(invoice)), invoice_pdf_key(snapshot))
+
+
+class InvoiceNumberTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user('juan')
+
+    def completed_order(self):
+        return Order.objects.create(customer=self.customer, status='completed',
+                                    completed_at=timezone.now(), total_amount=Decimal('100.00'))
+
+    def issue(self, number):
+        order = self.completed_order()
+        return Invoice.objects.create(order=order, customer=self.customer, invoice_number=number,
+                                      subtotal=order.total_amount, total_amount=order.total_amount)
+
+    def test_block_is_consecutive_and_follows_the_sequence(self):
+        day = date(2024, 6, 1)
+        self.assertEqual(allocate_invoice_numbers(3, day),
+                         ['INV-20240601-0001', 'INV-20240601-0002', 'INV-20240601-0003'])
+        self.issue('INV-20240531-0001')
+        self.assertEqual(allocate_invoice_numbers(1, day), ['INV-20240601-0002'])
+
+    def test_block_skips_numbers_already_issued_that_day(self):
+        day = date(2024, 6, 1)
+        self.issue('INV-20240601-0007')
+        self.assertEqual(allocate_invoice_numbers(2, day), ['INV-20240601-0008', 'INV-20240601-0009'])
+
+    def test_generate_invoices_numbers_each_order_once(self):
+        orders = [self.completed_order() for _ in range(3)]
+        call_command('generate_invoices', stdout=StringIO())
+        numbers = list(Invoice.objects.order_by('order_id').values_list('invoice_number', flat=True))
+        self.assertEqual(numbers, [f'INV-{timezone.localdate():%Y%m%d}-{n:04d}' for n in range(1, 4)])
+        self.assertEqual(set(Invoice.objects.values_list('order_id', flat=True)), {o.id for o in orders})
+        output = StringIO()
+        call_command('generate_invoices', stdout=output)
+        self.assertIn('No completed orders', output.getvalue())
+
+    def test_colliding_numbers_save_nothing(self):
+        taken = self.issue('INV-20240601-0001').invoice_number
+        self.completed_order()
+        with mock.patch('core.management.commands.generate_invoices.allocate_invoice_numbers',
+                        return_value=[taken]):
+            with self.assertRaisesMessage(CommandError, 'created concurrently'):
+                call_command('generate_invoices', stdout=StringIO())
+        self.assertEqual(Invoice.objects.count(), 1)
@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from core.kitchen import board_version
+from core.models import Order
+
+
+class KitchenBoardFeedTests(TestCase):
+    def setUp(self):
+        staff = User.objects.create_user('cook', is_staff=True)
+        self.client.force_login(staff)
+        self.url = reverse('kitchen_board_feed')
+
+    def test_unchanged_board_answers_at_once(self):
+        version = board_version()
+        response = self.client.get(self.url, {'since': version, 'wait': 25})
+        self.assertEqual(response.json(), {'changed': False, 'version': version})
+
+    def test_changed_board_is_sent_in_full(self):
+        version = board_version()
+        Order.objects.create(customer=User.objects.create_user('juan'), total_amount=100)
+        data = self.client.get(self.url, {'since': version}).json()
+        self.assertTrue(data['changed'])
+        self.assertEqual(len(data['orders']), 1)
@@ -0,0 +1,85 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+from core.forms import ProductStockForm
+from core.models import InsufficientStock, Product, StockMovement, StockSnapshot
+from core.stock import stock_as_of, take_stock_snapshot
+
+
+class MovementDirectionTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Pork BBQ', price=25, stock_quantity=10)
+
+    def stock_form(self, quantity, kind):
+        return ProductStockForm({
+            'stock_quantity': quantity, 'low_stock_threshold': 5, 'is_active': 'on', 'movement_kind': kind,
+        }, instance=self.product)
+
+    def test_form_checks_the_sign_against_the_kind(self):
+        for quantity, kind, valid in [
+            (15, 'receipt', True), (5, 'receipt', False),
+            (5, 'waste', True), (15, 'waste', False),
+            (15, 'return', True), (5, 'return', False),
+            (5, 'adjustment', True), (15, 'adjustment', True),
+        ]:
+            with self.subTest(quantity=quantity, kind=kind):
+                self.assertEqual(self.stock_form(quantity, kind).is_valid(), valid)
+
+    def test_record_refuses_misdirected_movements(self):
+        with self.assertRaises(ValueError):
+            StockMovement.record([StockMovement(product=self.product, kind='receipt', quantity=-3)])
+        self.assertFalse(StockMovement.objects.filter(kind='receipt').exists())
+
+    def test_record_refuses_going_below_zero(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            StockMovement.record([StockMovement(product=self.product, kind='waste', quantity=-11)])
+        self.assertEqual(raised.exception.shortages, {self.product.pk: 10})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 10)
+
+    def import_file(self, text):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as file:
+            file.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_rejects_changes_against_the_kind(self):
+        path = self.import_file(f'id,stock_quantity\n{self.product.pk},4\n')
+        with self.assertRaises(CommandError):
+            call_command('import_stock', path, kind='receipt', stdout=StringIO(), stderr=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 10)
+        call_command('import_stock', path, kind='waste', stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 4)
+
+
+class LedgerBalanceTests(TestCase):
+    def test_products_created_with_stock_get_an_opening_balance(self):
+        product = Product.objects.create(name='Chicken Inasal', price=120, stock_quantity=10)
+        self.assertTrue(product.reduce_stock(3))
+        now = timezone.now()
+        self.assertEqual(stock_as_of(now), {product.pk: 7})
+        take_stock_snapshot(now)
+        self.assertEqual(StockSnapshot.objects.get(product=product).quantity, 7)
+
+    def test_quantity_set_directly_is_booked_as_an_adjustment(self):
+        product = Product.objects.create(name='Liempo', price=150)
+        product.stock_quantity = 12
+        product.save()
+        product.stock_quantity = 8
+        product.save()
+        self.assertEqual(list(product.stock_movements.order_by('id').values_list('kind', 'quantity')),
+                         [('adjustment', 12), ('adjustment', -4)])
+        self.assertEqual(stock_as_of(timezone.now() + timedelta(seconds=1)), {product.pk: 8})
+
+    def test_saves_without_the_quantity_leave_the_ledger_alone(self):
+        product = Product.objects.create(name='Isaw', price=10, stock_quantity=5)
+        product.is_active = False
+        product.save(update_fields=['is_active'])
+        self.assertEqual(product.stock_movements.count(), 1)
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.geo import NAVAL_BBOX
+from core.tiles import TileCache, TileNotFound, get_tile_cache, tile_xy
+
+TILE_BYTES = 100
+
+
+class StubTileHandler(BaseHTTPRequestHandler):
+    """Answers every tile with ``TILE_BYTES`` of filler, except paths ending in /404.png."""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path.endswith('/404.png'):
+            self.send_error(404)
+            return
+        body = self.path.encode().ljust(TILE_BYTES, b'.')
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubTileServerMixin:
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubTileHandler)
+        self.server.requests = []
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.upstream = 'http://127.0.0.1:%d/{z}/{x}/{y}.png' % self.server.server_port
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+
+class TileCacheTests(StubTileServerMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.x, self.y = tile_xy(124.40, 11.56, 15)
+
+    def test_second_request_is_served_from_the_cache(self):
+        cache = TileCache(self.cache_dir, upstream=self.upstream)
+        first = cache.get_tile(15, self.x, self.y)
+        second = cache.get_tile(15, self.x, self.y)
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.requests, [f'/15/{self.x}/{self.y}.png'])
+
+    def test_least_recently_used_tiles_are_evicted(self):
+        cache = TileCache(self.cache_dir, upstream=self.upstream, max_bytes=TILE_BYTES * 2.5)
+        first, second, third = [(15, self.x, self.y + i) for i in range(3)]
+        cache.get_tile(*first)
+        cache.get_tile(*second)
+        now = time.time()
+        os.utime(cache.tile_path(*first), (now - 7200, now - 7200))
+        os.utime(cache.tile_path(*second), (now - 5400, now - 5400))
+        cache.get_tile(*first)
+        cache.get_tile(*third)
+        self.assertTrue(cache.contains(*first))
+        self.assertFalse(cache.contains(*second))
+        self.assertTrue(cache.contains(*third))
+        self.assertLessEqual(cache.size(), cache.max_bytes)
+
+    def test_tiles_outside_the_area_or_zoom_never_reach_upstream(self):
+        cache = TileCache(self.cache_dir, upstream=self.upstream)
+        outside_x, outside_y = tile_xy(NAVAL_BBOX[2] + 1, NAVAL_BBOX[3] + 1, 15)
+        for z, x, y in [(15, outside_x, outside_y), (9, *tile_xy(124.40, 11.56, 9)),
+                        (20, *tile_xy(124.40, 11.56, 20)), (15, 2 ** 15, self.y)]:
+            with self.subTest(z=z, x=x, y=y), self.assertRaises(TileNotFound):
+                cache.get_tile(z, x, y)
+        self.assertEqual(self.server.requests, [])
+
+    def test_upstream_404_is_not_cached(self):
+        cache = TileCache(self.cache_dir, upstream=self.upstream.replace('{y}', '404'), bbox=None)
+        with self.assertRaises(TileNotFound):
+            cache.get_tile(15, self.x, self.y)
+        self.assertFalse(os.listdir(self.cache_dir))
+
+
+class MapTileViewTests(StubTileServerMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        get_tile_cache.cache_clear()
+        self.addCleanup(get_tile_cache.cache_clear)
+
+    def test_view_proxies_through_the_configured_upstream(self):
+        x, y = tile_xy(124.40, 11.56, 15)
+        outside_x, outside_y = tile_xy(NAVAL_BBOX[2] + 1, NAVAL_BBOX[3] + 1, 15)
+        with override_settings(MAP_TILE_UPSTREAM=self.upstream, MAP_TILE_CACHE_DIR=self.cache_dir):
+            url = reverse('map_tile', args=[15, x, y])
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(cached.status_code, 304)
+            outside = self.client.get(reverse('map_tile', args=[15, outside_x, outside_y]))
+            self.assertEqual(outside.status_code, 404)
+        self.assertEqual(len(self.server.requests), 1)
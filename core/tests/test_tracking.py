@@ -0,0 +1,65 @@
+import atexit
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from core.models import Order, Rider, TrackSegment
+from core.tracking import LocationBuffer
+from core.tracks import SEGMENT_POINTS, append_points, iter_track
+
+
+class AppendPointsTests(TestCase):
+    def setUp(self):
+        customer = User.objects.create_user('juan')
+        self.order = Order.objects.create(customer=customer, total_amount=100)
+        self.rider = Rider.objects.create(name='Pedro')
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+
+    def points(self, first, count):
+        return [(self.rider.id, 11.56 + i * 1e-4, 124.39 + i * 1e-4, self.start + timedelta(seconds=i))
+                for i in range(first, first + count)]
+
+    def test_rolls_over_into_new_segments(self):
+        self.assertEqual(append_points({self.order.id: self.points(0, 10)}), 10)
+        self.assertEqual(append_points({self.order.id: self.points(10, SEGMENT_POINTS)}), SEGMENT_POINTS)
+        segments = list(TrackSegment.objects.filter(order=self.order).order_by('seq'))
+        self.assertEqual([s.point_count for s in segments], [SEGMENT_POINTS, 10])
+        track = list(iter_track(self.order.id))
+        self.assertEqual(len(track), SEGMENT_POINTS + 10)
+        self.assertAlmostEqual(track[-1][0], 11.56 + (SEGMENT_POINTS + 9) * 1e-4, places=5)
+
+    def test_drops_points_not_newer_than_the_track(self):
+        append_points({self.order.id: self.points(0, 5)})
+        self.assertEqual(append_points({self.order.id: self.points(3, 4)}), 2)
+        self.assertEqual(len(list(iter_track(self.order.id))), 7)
+
+    def test_locks_the_orders_before_reading_segments(self):
+        with mock.patch('core.tracks.Order.objects.select_for_update',
+                        wraps=Order.objects.select_for_update) as lock:
+            append_points({self.order.id: self.points(0, 1)})
+        lock.assert_called_once_with()
+
+
+class LocationBufferTests(TestCase):
+    def make_buffer(self, **kwargs):
+        buffer = LocationBuffer(**kwargs)
+        self.addCleanup(atexit.unregister, buffer.flush)
+        return buffer
+
+    def test_failed_write_keeps_points_for_the_next_flush(self):
+        writer = mock.Mock(side_effect=[RuntimeError('database is locked'), None])
+        buffer = self.make_buffer(writer=writer, flush_size=100)
+        buffer._points = [1, 2]
+        with self.assertRaises(RuntimeError):
+            buffer.flush()
+        buffer._points.append(3)
+        self.assertEqual(buffer.flush(), 3)
+        writer.assert_called_with([1, 2, 3])
+
+    def test_retry_buffer_is_bounded(self):
+        buffer = self.make_buffer(writer=mock.Mock(side_effect=RuntimeError), max_points=3)
+        buffer._points = [1, 2, 3, 4, 5]
+        with self.assertLogs('core.tracking', 'WARNING'), self.assertRaises(RuntimeError):
+            buffer.flush()
+        self.assertEqual(buffer._points, [3, 4, 5])
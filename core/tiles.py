@@ -0,0 +1,238 @@
+from __future__ import annotations
+import hashlib
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from functools import lru_cache
+from pathlib import Path
+from django.conf import settings
+from .geo import NAVAL_BBOX
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPSTREAM = 'https://tile.openstreetmap.org/{z}/{x}/{y}.png'
+# Tile servers ask clients to identify themselves (override with MAP_TILE_USER_AGENT)
+USER_AGENT = 'bbq-grill-tile-cache/1.0 (delivery maps for BBQ Grill, Naval, Biliran)'
+FETCH_TIMEOUT = 10
+MAX_ZOOM = 19
+
+# Only tiles over the delivery area, at the zoom levels the maps allow, are
+# proxied; anything else is a 404 rather than an upstream fetch
+SERVICE_BBOX = NAVAL_BBOX
+SERVED_MIN_ZOOM = 10
+SERVED_MAX_ZOOM = MAX_ZOOM
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Eviction trims the cache to this share of its limit so it doesn't run on every write
+EVICT_TO = 0.9
+# Cache hits refresh a file's LRU timestamp at most this often (seconds)
+TOUCH_INTERVAL = 3600
+# Re-measure the cache directory this often, picking up other processes' writes (seconds)
+RESCAN_INTERVAL = 300
+# Browser cache lifetime for proxied tiles and icons (seconds)
+BROWSER_MAX_AGE = 30 * 24 * 3600
+
+# Marker images used by the Leaflet maps, served through the cache by name
+MARKER_ICONS = {
+    'gold': 'https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-2x-gold.png',
+    'red': 'https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-2x-red.png',
+    'shadow': 'https://cdnjs.cloudflare.com/ajax/libs/leaflet/0.7.7/images/marker-shadow.png',
+}
+
+
+class TileNotFound(Exception):
+    """Invalid tile coordinates or an image the upstream server doesn't have."""
+
+
+class UpstreamError(Exception):
+    """The upstream server could not be reached or returned an error."""
+
+
+def tile_xy(longitude, latitude, zoom):
+    """Slippy-map tile column and row containing a point."""
+    n = 2 ** zoom
+    lat = math.radians(max(min(latitude, 85.0511), -85.0511))
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def bbox_tiles(bbox, min_zoom, max_zoom):
+    """Yield every ``(z, x, y)`` covering ``bbox`` for the zoom levels given."""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    for zoom in range(min_zoom, max_zoom + 1):
+        first_x, first_y = tile_xy(min_lng, max_lat, zoom)
+        last_x, last_y = tile_xy(max_lng, min_lat, zoom)
+        for x in range(first_x, last_x + 1):
+            for y in range(first_y, last_y + 1):
+                yield zoom, x, y
+
+
+def make_etag(data):
+    return '"%s"' % hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+class TileCache:
+    """On-disk cache in front of a tile server, evicting least recently used files.
+
+    Files live under ``root`` as ``z/x/y.png`` (icons under ``markers/``) and
+    are written atomically, so several worker processes can share one
+    directory. File mtimes serve as the LRU clock: a hit bumps the mtime at
+    most once per ``TOUCH_INTERVAL``, and when the directory grows past
+    ``max_bytes`` the oldest files are removed down to ``EVICT_TO`` of it.
+    """
+
+    def __init__(self, root, upstream=DEFAULT_UPSTREAM, max_bytes=DEFAULT_MAX_BYTES,
+                 markers=None, timeout=FETCH_TIMEOUT, bbox=SERVICE_BBOX,
+                 min_zoom=SERVED_MIN_ZOOM, max_zoom=SERVED_MAX_ZOOM, user_agent=USER_AGENT):
+        self.root = Path(root)
+        self.upstream = upstream
+        self.max_bytes = max_bytes
+        self.markers = MARKER_ICONS if markers is None else markers
+        self.timeout = timeout
+        self.bbox = bbox
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.user_agent = user_agent
+        self._lock = threading.Lock()
+        self._size = None
+        self._measured_at = 0.0
+
+    def tile_path(self, z, x, y):
+        return self.root / str(z) / str(x) / f'{y}.png'
+
+    def _check_tile(self, z, x, y):
+        if not self.min_zoom <= z <= self.max_zoom or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+            raise TileNotFound(f'No tile {z}/{x}/{y}')
+        if self.bbox is not None:
+            min_lng, min_lat, max_lng, max_lat = self.bbox
+            first_x, first_y = tile_xy(min_lng, max_lat, z)
+            last_x, last_y = tile_xy(max_lng, min_lat, z)
+            if not first_x <= x <= last_x or not first_y <= y <= last_y:
+                raise TileNotFound(f'Tile {z}/{x}/{y} is outside the served area')
+
+    def contains(self, z, x, y):
+        return self.tile_path(z, x, y).is_file()
+
+    def get_tile(self, z, x, y, refresh=False):
+        """Return ``(png_bytes, etag)``, fetching from upstream on a miss."""
+        self._check_tile(z, x, y)
+        return self._get(self.tile_path(z, x, y), self.upstream.format(z=z, x=x, y=y), refresh)
+
+    def get_marker(self, name, refresh=False):
+        if name not in self.markers:
+            raise TileNotFound(f'No marker icon {name!r}')
+        return self._get(self.root / 'markers' / f'{name}.png', self.markers[name], refresh)
+
+    def _get(self, path, url, refresh):
+        if not refresh:
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                pass
+            else:
+                self._touch(path)
+                return data, make_etag(data)
+        data = self._fetch(url)
+        self._store(path, data)
+        return data, make_etag(data)
+
+    def _touch(self, path):
+        try:
+            if time.time() - path.stat().st_mtime > TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+
+    def _fetch(self, url):
+        request = urllib.request.Request(url, headers={'User-Agent': self.user_agent})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as exc:
+            if exc.code == 404:
+                raise TileNotFound(url) from exc
+            raise UpstreamError(f'{url}: HTTP {exc.code}') from exc
+        except (urllib.error.URLError, OSError) as exc:
+            raise UpstreamError(f'{url}: {exc}') from exc
+
+    def _store(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(temp_name, path)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data) - replaced
+        if self.size() > self.max_bytes:
+            self.evict()
+
+    def _scan(self):
+        files = []
+        for directory, _dirs, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith('.png'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def size(self):
+        """Bytes used by cached files (re-measured every ``RESCAN_INTERVAL``)."""
+        with self._lock:
+            if self._size is None or time.monotonic() - self._measured_at > RESCAN_INTERVAL:
+                self._size = sum(size for _mtime, size, _path in self._scan())
+                self._measured_at = time.monotonic()
+            return self._size
+
+    def evict(self):
+        """Delete least recently used files until the cache is under its target size."""
+        with self._lock:
+            files = sorted(self._scan())
+            total = sum(size for _mtime, size, _path in files)
+            target = self.max_bytes * EVICT_TO
+            removed = 0
+            for _mtime, size, path in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._size = total
+            self._measured_at = time.monotonic()
+        if removed:
+            logger.info('Evicted %d map tiles from %s', removed, self.root)
+        return removed
+
+
+@lru_cache(maxsize=1)
+def get_tile_cache():
+    """Process-wide cache configured from the MAP_TILE_* settings."""
+    return TileCache(
+        settings.MAP_TILE_CACHE_DIR,
+        upstream=settings.MAP_TILE_UPSTREAM,
+        max_bytes=settings.MAP_TILE_CACHE_MAX_BYTES,
+        user_agent=settings.MAP_TILE_USER_AGENT,
+    )
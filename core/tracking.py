@@ -0,0 +1,211 @@
+from __future__ import annotations
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Rider, OrderTracking
+from .tracks import append_points
+
+
+logger = logging.getLogger(__name__)
+
+# Deliveries whose tracking receives rider GPS points
+ACTIVE_TRACKING_STATUS = 'out_for_delivery'
+
+# Points per request the rider app may send
+MAX_POINTS_PER_REQUEST = 500
+# Flush the buffer once this many points are waiting...
+FLUSH_SIZE = 500
+# ...or at least this often (seconds)
+FLUSH_INTERVAL = 1.0
+# Points kept for retry while writes fail; the oldest are dropped beyond this
+MAX_BUFFERED_POINTS = 50_000
+# Fixes stamped further than this in the future are rejected (device clock drift)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# How long a token -> rider lookup is cached (seconds)
+TOKEN_CACHE_SECONDS = 60
+
+
+def authenticate_rider(request):
+    """Return the rider id for an ``Authorization: Token <api_token>`` header, else None."""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    token = token.strip()
+    if scheme.lower() not in ('token', 'bearer') or not token:
+        return None
+
+    cache_key = Rider.TOKEN_CACHE_KEY.format(token)
+    rider_id = cache.get(cache_key)
+    if rider_id is None:
+        rider_id = (Rider.objects
+                    .filter(api_token=token, is_active=True)
+                    .values_list('id', flat=True)
+                    .first()) or 0
+        cache.set(cache_key, rider_id, TOKEN_CACHE_SECONDS)
+    return rider_id or None
+
+
+def _parse_timestamp(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Rider apps commonly send epoch milliseconds
+        seconds = value / 1000 if value > 1e11 else value
+        return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is not None and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+    return None
+
+
+def parse_points(rider_id, payload):
+    """Validate a ``{"points": [{"lat", "lng", "ts"}, ...]}`` payload.
+
+    Returns ``(points, rejected)`` where points are ``(rider_id, lat, lng, ts)``
+    tuples and ``rejected`` counts points dropped for bad values. Raises
+    ValueError when the payload itself is malformed.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('points'), list):
+        raise ValueError('Expected a JSON object with a "points" list.')
+    if len(payload['points']) > MAX_POINTS_PER_REQUEST:
+        raise ValueError(f'At most {MAX_POINTS_PER_REQUEST} points per request.')
+
+    latest_allowed = timezone.now() + MAX_CLOCK_SKEW
+    points = []
+    rejected = 0
+    for point in payload['points']:
+        try:
+            latitude = float(point['lat'])
+            longitude = float(point['lng'])
+            recorded_at = _parse_timestamp(point['ts'])
+        except (KeyError, TypeError, ValueError, OverflowError, OSError):
+            rejected += 1
+            continue
+        if (recorded_at is None or recorded_at > latest_allowed
+                or not -90 <= latitude <= 90 or not -180 <= longitude <= 180):
+            rejected += 1
+            continue
+        points.append((rider_id, latitude, longitude, recorded_at))
+    return points, rejected
+
+
+def write_locations(points):
+    """Persist buffered points.
+
+    Points are appended to the track of every delivery the rider is carrying;
+    fixes taken while no delivery is assigned only move the rider's own last
+    position. The newest point per rider is copied onto ``Rider`` and the
+    rider's active ``OrderTracking`` rows, and only if it is newer than what
+    they already show.
+    """
+    if not points:
+        return
+    rider_ids = {rider_id for rider_id, _lat, _lng, _ts in points}
+    active_orders = defaultdict(list)
+    for rider_id, order_id in (OrderTracking.objects
+                               .filter(rider_id__in=rider_ids, status=ACTIVE_TRACKING_STATUS)
+                               .values_list('rider_id', 'order_id')):
+        active_orders[rider_id].append(order_id)
+
+    order_points = defaultdict(list)
+    latest = {}
+    for point in points:
+        rider_id, latitude, longitude, recorded_at = point
+        for order_id in active_orders.get(rider_id, ()):
+            order_points[order_id].append(point)
+        if rider_id not in latest or recorded_at > latest[rider_id][2]:
+            latest[rider_id] = (latitude, longitude, recorded_at)
+
+    now = timezone.now()
+    with transaction.atomic():
+        append_points(order_points)
+        for rider_id, (latitude, longitude, recorded_at) in latest.items():
+            (Rider.objects
+             .filter(id=rider_id)
+             .filter(Q(last_seen_at__isnull=True) | Q(last_seen_at__lt=recorded_at))
+             .update(last_latitude=latitude, last_longitude=longitude, last_seen_at=recorded_at,
+                     updated_at=now))
+            if rider_id in active_orders:
+                (OrderTracking.objects
+                 .filter(rider_id=rider_id, status=ACTIVE_TRACKING_STATUS)
+                 .filter(Q(location_updated_at__isnull=True) | Q(location_updated_at__lt=recorded_at))
+                 .update(latitude=latitude, longitude=longitude,
+                         location_updated_at=recorded_at, updated_at=now))
+
+
+class LocationBuffer:
+    """Collects rider GPS points in memory and writes them in batches.
+
+    Requests only append to a list; a background thread hands the points to
+    ``write_locations`` when ``flush_size`` points are waiting or every
+    ``flush_interval`` seconds, so hundreds of pings per second cost a few
+    bulk inserts instead of one transaction each. A failed write puts its
+    points back for the next flush, keeping at most ``max_points``. Points
+    still buffered when the process is killed hard are lost, which is
+    acceptable for GPS trails.
+    """
+
+    def __init__(self, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL, writer=write_locations,
+                 max_points=MAX_BUFFERED_POINTS):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_points = max_points
+        self.writer = writer
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._points = []
+        self._thread = None
+
+    def add(self, points):
+        if os.getpid() != self._pid:
+            # Forked worker: don't inherit the parent's points, lock or thread
+            self._reset()
+        with self._lock:
+            self._points.extend(points)
+            full = len(self._points) >= self.flush_size
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='rider-location-flush', daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of points written."""
+        with self._lock:
+            points, self._points = self._points, []
+        try:
+            self.writer(points)
+        except Exception:
+            with self._lock:
+                self._points[:0] = points
+                dropped = len(self._points) - self.max_points
+                if dropped > 0:
+                    del self._points[:dropped]
+            if dropped > 0:
+                logger.warning('Dropped %d buffered rider locations after failed writes', dropped)
+            raise
+        return len(points)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to write buffered rider locations')
+
+
+location_buffer = LocationBuffer()
@@ -0,0 +1,161 @@
+from __future__ import annotations
+from datetime import datetime, timezone as dt_timezone
+from django.db.models import OuterRef, Subquery
+from .models import Order, TrackSegment
+
+
+# Delivery GPS trails are stored as TrackSegment blobs instead of one row per
+# point. Coordinates become fixed-point integers (1e-5 degrees, about 1.1 m)
+# and times whole epoch seconds; each point is written as the zigzag varint
+# deltas (dlat, dlng, dt) from the previous point. A rider moving along a
+# street changes each value by a few units per fix, so most points take
+# 3-4 bytes. The first point of a segment is relative to (0, 0, start_time),
+# which makes every segment decodable on its own.
+
+COORD_SCALE = 100_000
+# Points per segment; a full segment is never rewritten again
+SEGMENT_POINTS = 512
+
+
+def to_fixed(degrees):
+    return round(degrees * COORD_SCALE)
+
+
+def to_seconds(moment):
+    return int(moment.timestamp())
+
+
+def from_seconds(seconds):
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def _write_varint(out, value):
+    # Zigzag folds negative deltas into small positive numbers
+    value = value * 2 if value >= 0 else -value * 2 - 1
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varints(data):
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        yield (value >> 1) ^ -(value & 1)
+        value = shift = 0
+
+
+def encode_points(points, base):
+    """Encode ``(lat_e5, lng_e5, seconds)`` points as deltas from ``base``."""
+    out = bytearray()
+    last_lat, last_lng, last_seconds = base
+    for lat, lng, seconds in points:
+        _write_varint(out, lat - last_lat)
+        _write_varint(out, lng - last_lng)
+        _write_varint(out, seconds - last_seconds)
+        last_lat, last_lng, last_seconds = lat, lng, seconds
+    return bytes(out)
+
+
+def decode_points(data, start_seconds):
+    """Lazily yield ``(lat_e5, lng_e5, seconds)`` from one segment's blob."""
+    lat, lng, seconds = 0, 0, start_seconds
+    values = _read_varints(bytes(data))
+    for dlat in values:
+        lat += dlat
+        lng += next(values)
+        seconds += next(values)
+        yield lat, lng, seconds
+
+
+def _extend(segment, pending):
+    """Encode ``pending`` fixed-point points onto the end of ``segment``."""
+    if segment.point_count:
+        base = (segment.last_latitude_e5, segment.last_longitude_e5, to_seconds(segment.end_time))
+    else:
+        base = (0, 0, to_seconds(segment.start_time))
+    segment.data = bytes(segment.data or b'') + encode_points(pending, base)
+    segment.point_count += len(pending)
+    segment.last_latitude_e5, segment.last_longitude_e5, last_seconds = pending[-1]
+    segment.end_time = from_seconds(last_seconds)
+
+
+def append_points(order_points):
+    """Append GPS fixes to each order's track.
+
+    ``order_points`` maps order id -> list of ``(rider_id, lat, lng, recorded_at)``.
+    Points not newer than the track's last fix (late or re-sent) are dropped,
+    keeping every segment in time order. Call inside a transaction.
+    Returns the number of points stored.
+    """
+    if not order_points:
+        return 0
+    # Serialize writers per order: without this, two processes flushing the
+    # same order would both start segment 0 (or seq + 1) and collide on the
+    # (order, seq) constraint. Locked in id order so they can't deadlock.
+    list(Order.objects.select_for_update().filter(id__in=order_points).order_by('id').values_list('id', flat=True))
+    latest_seq = (TrackSegment.objects
+                  .filter(order_id=OuterRef('order_id'))
+                  .order_by('-seq')
+                  .values('seq')[:1])
+    latest = {
+        segment.order_id: segment
+        for segment in (TrackSegment.objects
+                        .select_for_update()
+                        .filter(order_id__in=order_points, seq=Subquery(latest_seq)))
+    }
+
+    to_create, to_update = [], []
+    stored = 0
+    for order_id, points in order_points.items():
+        segment = latest.get(order_id)
+        last_seconds = to_seconds(segment.end_time) if segment is not None else None
+        pending = []
+        for rider_id, latitude, longitude, recorded_at in sorted(points, key=lambda point: point[3]):
+            seconds = to_seconds(recorded_at)
+            if last_seconds is not None and seconds <= last_seconds:
+                continue
+            if segment is None or segment.point_count + len(pending) >= SEGMENT_POINTS:
+                if pending:
+                    _extend(segment, pending)
+                    pending = []
+                segment = TrackSegment(
+                    order_id=order_id, rider_id=rider_id,
+                    seq=segment.seq + 1 if segment is not None else 0,
+                    start_time=from_seconds(seconds), end_time=from_seconds(seconds),
+                    point_count=0, last_latitude_e5=0, last_longitude_e5=0, data=b'',
+                )
+                to_create.append(segment)
+            elif segment.pk is not None and not pending:
+                to_update.append(segment)
+            pending.append((to_fixed(latitude), to_fixed(longitude), seconds))
+            last_seconds = seconds
+            stored += 1
+        if pending:
+            _extend(segment, pending)
+
+    TrackSegment.objects.bulk_update(
+        to_update, ['data', 'point_count', 'end_time', 'last_latitude_e5', 'last_longitude_e5'])
+    TrackSegment.objects.bulk_create(to_create)
+    return stored
+
+
+def iter_track(order_id, since=None):
+    """Yield ``(lat, lng, recorded_at)`` for an order's trail, oldest first.
+
+    Segments are fetched and decoded one at a time; with ``since`` only
+    segments ending after that moment are read at all.
+    """
+    segments = TrackSegment.objects.filter(order_id=order_id).order_by('seq')
+    if since is not None:
+        segments = segments.filter(end_time__gt=since)
+    for segment in segments.only('data', 'start_time').iterator():
+        for lat, lng, seconds in decode_points(segment.data, to_seconds(segment.start_time)):
+            recorded_at = from_seconds(seconds)
+            if since is not None and recorded_at <= since:
+                continue
+            yield lat / COORD_SCALE, lng / COORD_SCALE, recorded_at
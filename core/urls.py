@@ -22,6 +22,7 @@ urlpatterns = [
     path("reservations/create/", views.reservation_create, name="reservation_create"),
     path("reservations/<int:pk>/edit/", views.reservation_update, name="reservation_update"),
     path("reservations/<int:pk>/delete/", views.reservation_delete, name="reservation_delete"),
+    path("api/reservation-slots/", views.reservation_slots, name="reservation_slots"),
 
     # Journal CRUD
     path("journal/", views.journal_list, name="journal_list"),
@@ -43,6 +44,18 @@ urlpatterns = [
     path("management/orders/<int:pk>/edit/", views.admin_order_update, name="admin_order_update"),
     path("management/orders/<int:pk>/tracking/", views.admin_order_tracking_update, name="admin_order_tracking_update"),
     
+    # Management - Kitchen Board
+    path("management/kitchen/", views.kitchen_board, name="kitchen_board"),
+    path("api/kitchen-board/", views.kitchen_board_feed, name="kitchen_board_feed"),
+    path("management/kitchen/prep/", views.kitchen_prep_plan, name="kitchen_prep_plan"),
+    path("api/prep-plan/", views.kitchen_prep_plan_feed, name="kitchen_prep_plan_feed"),
+    
+    # Management - Dispatch Planner
+    path("management/dispatch/", views.admin_dispatch_plan, name="admin_dispatch_plan"),
+    
+    # Rider App API
+    path("api/rider/locations/", views.rider_location_ingest, name="rider_location_ingest"),
+    
     # Management - Payment Management
     path("management/payments/", views.admin_payment_list, name="admin_payment_list"),
     path("management/payments/create/<int:order_id>/", views.admin_payment_create, name="admin_payment_create"),
@@ -50,10 +63,19 @@ urlpatterns = [
     
     # Management - All Reservations
     path("management/reservations/", views.admin_reservation_list, name="admin_reservation_list"),
+    path("management/reservations/calendar/", views.admin_reservation_calendar, name="admin_reservation_calendar"),
+    path("api/reservations/calendar/", views.admin_reservation_calendar_feed, name="admin_reservation_calendar_feed"),
     
     # Management - Stock Management
     path("management/stock/", views.admin_stock_management, name="admin_stock_management"),
     path("management/stock/<int:product_id>/update/", views.admin_update_stock, name="admin_update_stock"),
+    path("management/stock/bulk/", views.admin_bulk_stock, name="admin_bulk_stock"),
+    
+    # Management - Reports
+    path("management/reports/sales/", views.admin_sales_report, name="admin_sales_report"),
+    
+    # Management - Exports
+    path("management/export/<str:kind>/", views.admin_export, name="admin_export"),
     
     # Orders
     path("orders/", views.order_list, name="order_list"),
@@ -62,6 +84,9 @@ urlpatterns = [
     path("orders/<int:pk>/add-item/", views.add_order_item, name="add_order_item"),
     path("orders/<int:pk>/remove-item/<int:item_id>/", views.remove_order_item, name="remove_order_item"),
     path("orders/<int:pk>/tracking/", views.order_tracking, name="order_tracking"),
+    path("api/orders/<int:pk>/track/", views.order_track, name="order_track"),
+    path("api/orders/<int:pk>/tracking/", views.order_tracking_feed, name="order_tracking_feed"),
+    path("api/orders/<int:pk>/tracking/stream/", views.order_tracking_stream, name="order_tracking_stream"),
     
     # Tracking Guide
     path("tracking-guide/", views.tracking_guide, name="tracking_guide"),
@@ -77,9 +102,14 @@ urlpatterns = [
     path("cart/update/<int:item_id>/", views.update_cart_item, name="update_cart_item"),
     path("cart/remove/<int:item_id>/", views.remove_from_cart, name="remove_from_cart"),
     path("checkout/", views.checkout, name="checkout"),
+    path("api/delivery-fee/", views.delivery_fee_quote, name="delivery_fee_quote"),
     
     # Map
     path("map/", views.map_view, name="map"),
+    path("map/preview/", views.map_preview, name="map_preview"),
+    path("api/delivery-heatmap/", views.delivery_heatmap_data, name="delivery_heatmap_data"),
+    path("tiles/<int:z>/<int:x>/<int:y>.png", views.map_tile, name="map_tile"),
+    path("tiles/markers/<slug:name>.png", views.map_marker, name="map_marker"),
     
     # Tutorial
     path("tutorial/", views.tutorial_view, name="tutorial"),
@@ -87,5 +117,6 @@ urlpatterns = [
     # Admin Invoices
     path("management/invoices/", views.admin_invoice_list, name="admin_invoice_list"),
     path("management/invoices/<int:pk>/", views.admin_invoice_detail, name="admin_invoice_detail"),
+    path("management/invoices/<int:pk>/pdf/", views.admin_invoice_pdf, name="admin_invoice_pdf"),
     path("management/orders/<int:order_id>/generate-invoice/", views.admin_generate_invoice, name="admin_generate_invoice"),
 ]
\ No newline at end of file
@@ -1,15 +1,48 @@
 from __future__ import annotations
+import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse, FileResponse, Http404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from django.views.decorators.clickjacking import xframe_options_sameorigin
+from django.utils.cache import get_conditional_response
 from django.db.models import QuerySet, Q
-from .models import Product, Reservation, ReservationItem, JournalEntry, Article, Feedback, Order, OrderItem, Cart, CartItem, OrderTracking, UserHistory, Payment, Invoice
-from .forms import RegisterForm, ReservationForm, ReservationItemForm, JournalEntryForm, ArticleForm, FeedbackForm, OrderForm, AddOrderItemForm, PaymentForm, CheckoutForm, ProductSearchForm, ProductStockForm
+from .models import Product, Reservation, ReservationItem, JournalEntry, Article, Feedback, Order, OrderItem, Cart, CartItem, OrderTracking, UserHistory, Payment, Invoice, AggregationWatermark, Rider, InsufficientStock
+from .forms import RegisterForm, ReservationForm, ReservationItemForm, JournalEntryForm, ArticleForm, FeedbackForm, OrderForm, AddOrderItemForm, PaymentForm, CheckoutForm, ProductSearchForm, ProductStockForm, BulkStockFormSet, StockBatchForm
 from .forms_invoice import InvoiceForm
+from .filters import filter_orders, filter_payments, filter_invoices
+from .exports import EXPORTS, EXPORT_FORMATS, export_response
+from .reports import aggregate_daily_sales, sales_report, SALES_WATERMARK
+from .kitchen import get_kitchen_board, board_version, get_prep_plan, CLIENT_POLL_SECONDS, PREP_PLAN_HOURS, MAX_PREP_PLAN_HOURS
+from .tracking import authenticate_rider, parse_points, location_buffer
+from .tracks import iter_track
+from .dispatch import plan_dispatch, assign_riders, DEFAULT_CAPACITY, MAX_CAPACITY
+from .geo import STORE_LATITUDE, STORE_LONGITUDE
+from .stock import filter_stock, stock_summary, stock_as_of, apply_stock_updates, misdirected_updates, shortage_message
+from .heatmap import delivery_heatmap, RESOLUTIONS as HEATMAP_RESOLUTIONS, DEFAULT_RESOLUTION as HEATMAP_DEFAULT_RESOLUTION, DEFAULT_DAYS as HEATMAP_DEFAULT_DAYS
+from .fees import quote_delivery_fee, get_fee_table
+from .forecast import demand_forecast
+from .schedule import calendar_window, calendar_events, CALENDAR_VIEWS, DEFAULT_CALENDAR_STATUSES, MAX_WINDOW_DAYS as MAX_CALENDAR_WINDOW_DAYS
+from .capacity import book_reservation, slot_availability, SlotUnavailable, AVAILABILITY_DAYS as RESERVATION_AVAILABILITY_DAYS, MAX_AVAILABILITY_DAYS as MAX_RESERVATION_AVAILABILITY_DAYS
+from .invoicing import allocate_invoice_numbers
+from .invoice_pdf import invoice_snapshot, invoice_pdf_key, get_invoice_pdf_cache
+from .tiles import get_tile_cache, TileNotFound, UpstreamError, BROWSER_MAX_AGE
+from .live import tracking_state, tracking_events, sse_event, CLIENT_POLL_SECONDS as TRACKING_POLL_SECONDS
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, timedelta
+
+
+def request_client(request):
+    """The client IP address and user agent recorded in activity entries."""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    ip_address = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
+    return ip_address, request.META.get('HTTP_USER_AGENT', '')[:500]
 
 
 def log_user_activity(user, action, description='', request=None):
@@ -21,9 +54,7 @@ def log_user_activity(user, action, description='', request=None):
     user_agent = ''
     
     if request:
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        ip_address = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-        user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]
+        ip_address, user_agent = request_client(request)
     
     UserHistory.objects.create(
         user=user,
@@ -224,10 +255,16 @@ def reservation_create(request: HttpRequest) -> HttpResponse:
     """Create new reservation."""
     if request.method == 'POST':
         form = ReservationForm(request.POST)
+        saved = False
         if form.is_valid():
             reservation = form.save(commit=False)
             reservation.customer = request.user
-            reservation.save()
+            try:
+                book_reservation(reservation)
+                saved = True
+            except SlotUnavailable as exc:
+                form.add_error('scheduled_for', str(exc))
+        if saved:
             log_user_activity(request.user, 'create_reservation', f'Created reservation #{reservation.id}', request)
             messages.success(request, 'Reservation created successfully!')
             return redirect('reservation_list')
@@ -242,8 +279,14 @@ def reservation_update(request: HttpRequest, pk: int) -> HttpResponse:
     reservation = get_object_or_404(Reservation, pk=pk, customer=request.user)
     if request.method == 'POST':
         form = ReservationForm(request.POST, instance=reservation)
+        saved = False
         if form.is_valid():
-            form.save()
+            try:
+                form.save()
+                saved = True
+            except SlotUnavailable as exc:
+                form.add_error('scheduled_for', str(exc))
+        if saved:
             log_user_activity(request.user, 'update_reservation', f'Updated reservation #{reservation.id}', request)
             messages.success(request, 'Reservation updated successfully!')
             return redirect('reservation_list')
@@ -264,6 +307,19 @@ def reservation_delete(request: HttpRequest, pk: int) -> HttpResponse:
     return render(request, 'core/reservation_confirm_delete.html', {'reservation': reservation})
 
 
+@require_GET
+def reservation_slots(request: HttpRequest) -> JsonResponse:
+    """Free reservation slots for the coming days, read from the occupancy counters."""
+    try:
+        start = parse_date(request.GET.get('start', '')) or timezone.localdate()
+        days = int(request.GET.get('days', RESERVATION_AVAILABILITY_DAYS))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start or days.'}, status=400)
+    start = max(start, timezone.localdate())
+    days = min(max(days, 1), MAX_RESERVATION_AVAILABILITY_DAYS)
+    return JsonResponse(slot_availability(start, days))
+
+
 @login_required
 def journal_list(request: HttpRequest) -> HttpResponse:
     """List user's journal entries."""
@@ -405,6 +461,47 @@ def admin_reservation_list(request: HttpRequest) -> HttpResponse:
     return render(request, 'core/reservation_list.html', {'reservations': reservations})
 
 
+def _calendar_window(request):
+    """The (first_day, last_day, view) a calendar request asks for."""
+    view = request.GET.get('view', 'week')
+    if view not in CALENDAR_VIEWS:
+        view = 'week'
+    try:
+        anchor = parse_date(request.GET.get('date', '')) or timezone.localdate()
+    except ValueError:
+        anchor = timezone.localdate()
+    first_day, last_day = calendar_window(anchor, view)
+    return first_day, last_day, view
+
+
+@user_passes_test(lambda u: u.is_staff)
+def admin_reservation_calendar(request: HttpRequest) -> HttpResponse:
+    """Week/day calendar of reservations; navigation loads windows from the JSON feed."""
+    first_day, last_day, view = _calendar_window(request)
+    context = {
+        'calendar': {'view': view, **calendar_events(first_day, last_day)},
+    }
+    return render(request, 'core/admin_reservation_calendar.html', context)
+
+
+@user_passes_test(lambda u: u.is_staff)
+@require_GET
+def admin_reservation_calendar_feed(request: HttpRequest) -> JsonResponse:
+    """Reservations for one calendar window, either ``date``/``view`` or ``start``/``end``."""
+    first_day, last_day, view = _calendar_window(request)
+    try:
+        start = parse_date(request.GET.get('start', ''))
+        end = parse_date(request.GET.get('end', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start or end date.'}, status=400)
+    if start and end:
+        if end < start or (end - start).days >= MAX_CALENDAR_WINDOW_DAYS:
+            return JsonResponse({'error': f'The window must span 1 to {MAX_CALENDAR_WINDOW_DAYS} days.'}, status=400)
+        first_day, last_day = start, end
+    statuses = [status for status in request.GET.getlist('status') if status in dict(Reservation.STATUS_CHOICES)]
+    return JsonResponse({'view': view, **calendar_events(first_day, last_day, statuses or DEFAULT_CALENDAR_STATUSES)})
+
+
 # Cart Views
 def get_or_create_cart(user):
     """Get or create cart for user."""
@@ -489,9 +586,11 @@ def checkout(request: HttpRequest) -> HttpResponse:
         form = CheckoutForm(request.POST)
         if form.is_valid():
             # Create order with selected payment method and delivery info
+            delivery_fee = form.cleaned_data['delivery_fee']
             order = Order.objects.create(
                 customer=request.user,
-                total_amount=cart.total_price,
+                total_amount=cart.total_price + delivery_fee,
+                delivery_fee=delivery_fee,
                 notes=form.cleaned_data.get('order_notes', f'Order created from cart with {cart.total_items} items'),
                 delivery_address=form.cleaned_data['delivery_address'],
                 delivery_barangay=form.cleaned_data['delivery_barangay'],
@@ -517,6 +616,10 @@ def checkout(request: HttpRequest) -> HttpResponse:
                 status='pending'
             )
             
+            # Hand pinned deliveries straight to the nearest free rider, if any
+            if order.delivery_latitude is not None and order.delivery_longitude is not None:
+                assign_riders([order])
+            
             # Log activities
             log_user_activity(request.user, 'create_order', f'Created Order #{order.id} with {cart.total_items} items - Total: ₱{order.total_amount}', request)
             log_user_activity(request.user, 'payment_initiated', f'Payment #{payment.id} initiated for Order #{order.id} - ₱{payment.amount} via {payment.get_payment_method_display()}', request)
@@ -535,6 +638,7 @@ def checkout(request: HttpRequest) -> HttpResponse:
         'cart_items': cart_items,
         'total_amount': cart.total_price,
         'total_items': cart.total_items,
+        'fee_zones_enabled': get_fee_table().available,
     }
     return render(request, 'core/checkout.html', context)
 
@@ -583,21 +687,9 @@ def order_update(request: HttpRequest, pk: int) -> HttpResponse:
 def admin_order_list(request: HttpRequest) -> HttpResponse:
     """Admin view to list all orders with management capabilities."""
     orders = Order.objects.all().select_related('customer').prefetch_related('items__product')
-    
-    # Filter by status if provided
+    orders = filter_orders(orders, request.GET)
     status_filter = request.GET.get('status')
-    if status_filter:
-        orders = orders.filter(status=status_filter)
-    
-    # Search by customer name or order ID
     search = request.GET.get('search')
-    if search:
-        orders = orders.filter(
-            Q(customer__username__icontains=search) |
-            Q(customer__first_name__icontains=search) |
-            Q(customer__last_name__icontains=search) |
-            Q(id__icontains=search)
-        )
     
     context = {
         'orders': orders,
@@ -657,6 +749,10 @@ def admin_order_tracking_update(request: HttpRequest, pk: int) -> HttpResponse:
         if new_status and new_status in dict(OrderTracking.TRACKING_STATUS_CHOICES):
             tracking.status = new_status
         
+        # Assign the rider whose app reports this delivery's location
+        rider_id = request.POST.get('rider')
+        tracking.rider = Rider.objects.filter(pk=rider_id, is_active=True).first() if rider_id else None
+        
         # Update location if provided
         latitude = request.POST.get('latitude')
         longitude = request.POST.get('longitude')
@@ -683,6 +779,7 @@ def admin_order_tracking_update(request: HttpRequest, pk: int) -> HttpResponse:
         'order': order,
         'tracking': tracking,
         'tracking_status_choices': OrderTracking.TRACKING_STATUS_CHOICES,
+        'riders': Rider.objects.filter(is_active=True),
         'title': f'Update Tracking - Order #{order.id}'
     }
     return render(request, 'core/admin_order_tracking.html', context)
@@ -727,7 +824,7 @@ def add_order_item(request: HttpRequest, pk: int) -> HttpResponse:
             order_item.save()
             
             # Update order total
-            order.total_amount = sum(item.total_price for item in order.items.all())
+            order.total_amount = sum(item.total_price for item in order.items.all()) + order.delivery_fee
             order.save()
             
             messages.success(request, f'{order_item.product.name} added to order #{order.id}!')
@@ -756,7 +853,7 @@ def remove_order_item(request: HttpRequest, pk: int, item_id: int) -> HttpRespon
     order_item.delete()
     
     # Update order total
-    order.total_amount = sum(item.total_price for item in order.items.all())
+    order.total_amount = sum(item.total_price for item in order.items.all()) + order.delivery_fee
     order.save()
     
     messages.success(request, f'{product_name} removed from order #{order.id}!')
@@ -766,25 +863,107 @@ def remove_order_item(request: HttpRequest, pk: int, item_id: int) -> HttpRespon
 @login_required
 def order_tracking(request: HttpRequest, pk: int) -> HttpResponse:
     """View order tracking details."""
+    orders = Order.objects.select_related('customer', 'tracking').prefetch_related('payments', 'items__product')
     if request.user.is_staff:
-        order = get_object_or_404(Order, pk=pk)
+        order = get_object_or_404(orders, pk=pk)
     else:
-        order = get_object_or_404(Order, pk=pk, customer=request.user)
+        order = get_object_or_404(orders, pk=pk, customer=request.user)
     
     # Get or create tracking record
-    tracking, created = OrderTracking.objects.get_or_create(order=order)
-    
-    # Prefetch payment information
-    order = Order.objects.select_related('customer').prefetch_related('payments', 'items__product').get(pk=pk)
+    try:
+        tracking = order.tracking
+    except OrderTracking.DoesNotExist:
+        tracking, created = OrderTracking.objects.get_or_create(order=order)
     
     context = {
         'order': order,
         'tracking': tracking,
         'has_location': tracking.latitude and tracking.longitude,
+        # Streaming needs an async server; under WSGI the page polls instead
+        'live_transport': 'sse' if isinstance(request, ASGIRequest) else 'poll',
+        'poll_interval': TRACKING_POLL_SECONDS,
     }
     return render(request, 'core/order_tracking.html', context)
 
 
+@login_required
+def order_track(request: HttpRequest, pk: int) -> JsonResponse:
+    """GPS trail of a delivery for the tracking map.
+
+    Pass ``since`` (ISO timestamp from a previous response's ``until``) to
+    receive only newer points.
+    """
+    orders = Order.objects.all() if request.user.is_staff else Order.objects.filter(customer=request.user)
+    order = get_object_or_404(orders.only('id'), pk=pk)
+    since = parse_datetime(request.GET.get('since') or '')
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+
+    points = []
+    until = since
+    for latitude, longitude, recorded_at in iter_track(order.id, since=since):
+        points.append([round(latitude, 5), round(longitude, 5)])
+        until = recorded_at
+    return JsonResponse({'points': points, 'until': until.isoformat() if until else None})
+
+
+@login_required
+def order_tracking_feed(request: HttpRequest, pk: int) -> JsonResponse:
+    """Polling counterpart of the live tracking stream.
+
+    Pass ``version`` to receive ``{"changed": false}`` while the tracking row
+    is unchanged, and ``since`` (the previous ``until``) to get only new trail points.
+    """
+    orders = Order.objects.all() if request.user.is_staff else Order.objects.filter(customer=request.user)
+    order = get_object_or_404(orders.only('id'), pk=pk)
+    since = parse_datetime(request.GET.get('since') or '')
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+
+    version = request.GET.get('version')
+    if version:
+        current = OrderTracking.objects.filter(order_id=order.id).values_list('updated_at', flat=True).first()
+        if current is not None and current.isoformat() == version:
+            return JsonResponse({'changed': False, 'version': version})
+
+    state = tracking_state(order.id, since=since)
+    if state is None:
+        return JsonResponse({'changed': False, 'version': None})
+    return JsonResponse({'changed': True, **state})
+
+
+async def order_tracking_stream(request: HttpRequest, pk: int) -> HttpResponse:
+    """Server-Sent Events stream of status/location changes for one order.
+
+    Served as an async view so idle watchers hold no worker thread under
+    ASGI. Under WSGI it sends the current state once and asks the browser
+    to reconnect later, which degrades to polling instead of pinning a worker.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required.'}, status=403)
+    orders = Order.objects.filter(pk=pk)
+    if not user.is_staff:
+        orders = orders.filter(customer=user)
+    if not await orders.aexists():
+        return JsonResponse({'error': 'Order not found.'}, status=404)
+
+    since = parse_datetime(request.headers.get('Last-Event-ID') or request.GET.get('since') or '')
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+
+    if isinstance(request, ASGIRequest):
+        stream = tracking_events(pk, since)
+    else:
+        state = await sync_to_async(tracking_state)(pk, since)
+        stream = [f"retry: {TRACKING_POLL_SECONDS * 1000}\n\n", sse_event(state)] if state else []
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 def tracking_guide(request: HttpRequest) -> HttpResponse:
     """View tracking guide for staff."""
     return render(request, 'core/tracking_guide.html')
@@ -835,7 +1014,84 @@ def clear_user_history(request: HttpRequest) -> HttpResponse:
 
 def map_view(request: HttpRequest) -> HttpResponse:
     """Display map of Naval, Biliran, Philippines."""
-    return render(request, 'core/map.html')
+    context = {}
+    if request.user.is_staff:
+        today = timezone.localdate()
+        context.update({
+            'heatmap_start': today - timedelta(days=HEATMAP_DEFAULT_DAYS - 1),
+            'heatmap_end': today,
+            'heatmap_resolutions': HEATMAP_RESOLUTIONS,
+            'heatmap_default_resolution': HEATMAP_DEFAULT_RESOLUTION,
+        })
+    return render(request, 'core/map.html', context)
+
+
+@user_passes_test(lambda u: u.is_staff)
+def delivery_heatmap_data(request: HttpRequest) -> JsonResponse:
+    """Order counts per map grid cell for a date range, for the map's heat layer."""
+    today = timezone.localdate()
+    try:
+        start = parse_date(request.GET.get('start', '')) or today - timedelta(days=HEATMAP_DEFAULT_DAYS - 1)
+        end = parse_date(request.GET.get('end', '')) or today
+        resolution = float(request.GET.get('resolution', HEATMAP_DEFAULT_RESOLUTION))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date or resolution.'}, status=400)
+    if resolution not in HEATMAP_RESOLUTIONS:
+        return JsonResponse({'error': f'resolution must be one of {list(HEATMAP_RESOLUTIONS)}'}, status=400)
+    if start > end:
+        return JsonResponse({'error': 'start must not be after end'}, status=400)
+    return JsonResponse(delivery_heatmap(start, end, resolution))
+
+
+def _cached_image_response(request, fetch):
+    try:
+        data, etag = fetch()
+    except TileNotFound:
+        raise Http404('Map image not found')
+    except UpstreamError:
+        return HttpResponse('Map server unavailable', status=502, content_type='text/plain')
+    response = HttpResponse(data, content_type='image/png')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={BROWSER_MAX_AGE}'
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+@require_GET
+def delivery_fee_quote(request: HttpRequest) -> JsonResponse:
+    """Delivery fee for a map pin, shown live while customers move the pin."""
+    try:
+        latitude = float(request.GET['lat'])
+        longitude = float(request.GET['lng'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'lat and lng are required.'}, status=400)
+    quote = quote_delivery_fee(latitude, longitude)
+    if quote['fee'] is not None:
+        quote['fee'] = str(quote['fee'])
+    return JsonResponse(quote)
+
+
+@require_GET
+def map_tile(request: HttpRequest, z: int, x: int, y: int) -> HttpResponse:
+    """Map tile served from the local tile cache."""
+    return _cached_image_response(request, lambda: get_tile_cache().get_tile(z, x, y))
+
+
+@require_GET
+def map_marker(request: HttpRequest, name: str) -> HttpResponse:
+    """Map marker icon served from the local tile cache."""
+    return _cached_image_response(request, lambda: get_tile_cache().get_marker(name))
+
+
+@user_passes_test(lambda u: u.is_staff)
+@xframe_options_sameorigin
+def map_preview(request: HttpRequest) -> HttpResponse:
+    """Small embeddable map with one marker, used by the admin tracking form."""
+    try:
+        latitude = float(request.GET['lat'])
+        longitude = float(request.GET['lng'])
+    except (KeyError, ValueError):
+        raise Http404('Coordinates required')
+    return render(request, 'core/map_preview.html', {'latitude': latitude, 'longitude': longitude})
 
 
 def tutorial_view(request: HttpRequest) -> HttpResponse:
@@ -848,28 +1104,10 @@ def tutorial_view(request: HttpRequest) -> HttpResponse:
 def admin_payment_list(request: HttpRequest) -> HttpResponse:
     """Admin view to list all payment transactions."""
     payments = Payment.objects.all().select_related('order', 'customer', 'processed_by')
-    
-    # Filter by status if provided
+    payments = filter_payments(payments, request.GET)
     status_filter = request.GET.get('status')
-    if status_filter:
-        payments = payments.filter(status=status_filter)
-    
-    # Filter by payment method
     method_filter = request.GET.get('method')
-    if method_filter:
-        payments = payments.filter(payment_method=method_filter)
-    
-    # Search by customer name, order ID, or transaction ID
     search = request.GET.get('search')
-    if search:
-        payments = payments.filter(
-            Q(customer__username__icontains=search) |
-            Q(customer__first_name__icontains=search) |
-            Q(customer__last_name__icontains=search) |
-            Q(order__id__icontains=search) |
-            Q(transaction_id__icontains=search) |
-            Q(reference_number__icontains=search)
-        )
     
     context = {
         'payments': payments,
@@ -1005,21 +1243,9 @@ def create_additional_account(request: HttpRequest) -> HttpResponse:
 def admin_invoice_list(request: HttpRequest) -> HttpResponse:
     """Admin view to list all invoices."""
     invoices = Invoice.objects.all().select_related('customer', 'order')
-    
-    # Filter by status if provided
+    invoices = filter_invoices(invoices, request.GET)
     status_filter = request.GET.get('status')
-    if status_filter:
-        invoices = invoices.filter(status=status_filter)
-    
-    # Search by invoice number or customer
     search = request.GET.get('search')
-    if search:
-        invoices = invoices.filter(
-            Q(invoice_number__icontains=search) |
-            Q(customer__username__icontains=search) |
-            Q(customer__first_name__icontains=search) |
-            Q(customer__last_name__icontains=search)
-        )
     
     context = {
         'invoices': invoices,
@@ -1040,18 +1266,17 @@ def admin_generate_invoice(request: HttpRequest, order_id: int) -> HttpResponse:
         messages.info(request, 'Invoice already exists for this order.')
         return redirect('admin_invoice_detail', pk=order.invoice.pk)
     
+    subtotal = sum(item.total_price for item in order.items.all())
     if request.method == 'POST':
         form = InvoiceForm(request.POST)
         if form.is_valid():
             # Generate unique invoice number
-            invoice_count = Invoice.objects.count() + 1
-            invoice_number = f"INV-{timezone.now().strftime('%Y%m%d')}-{invoice_count:04d}"
+            invoice_number = allocate_invoice_numbers(1)[0]
             
             # Calculate amounts
-            subtotal = sum(item.total_price for item in order.items.all())
             tax_amount = form.cleaned_data.get('tax_amount', 0)
             discount_amount = form.cleaned_data.get('discount_amount', 0)
-            total_amount = subtotal + tax_amount - discount_amount
+            total_amount = subtotal + order.delivery_fee + tax_amount - discount_amount
             
             # Create invoice
             invoice = form.save(commit=False)
@@ -1059,6 +1284,7 @@ def admin_generate_invoice(request: HttpRequest, order_id: int) -> HttpResponse:
             invoice.customer = order.customer
             invoice.invoice_number = invoice_number
             invoice.subtotal = subtotal
+            invoice.delivery_fee = order.delivery_fee
             invoice.total_amount = total_amount
             invoice.customer_name = f"{order.customer.first_name} {order.customer.last_name}".strip() or order.customer.username
             invoice.customer_email = order.customer.email
@@ -1075,6 +1301,8 @@ def admin_generate_invoice(request: HttpRequest, order_id: int) -> HttpResponse:
     context = {
         'form': form,
         'order': order,
+        'subtotal': subtotal,
+        'amount_due': subtotal + order.delivery_fee,
         'title': f'Generate Invoice for Order #{order.id}'
     }
     return render(request, 'core/admin_generate_invoice.html', context)
@@ -1104,6 +1332,24 @@ def admin_invoice_detail(request: HttpRequest, pk: int) -> HttpResponse:
     return render(request, 'core/admin_invoice_detail.html', context)
 
 
+@user_passes_test(lambda u: u.is_staff)
+@require_GET
+def admin_invoice_pdf(request: HttpRequest, pk: int) -> HttpResponse:
+    """Invoice as a PDF, rendered once per version of its content and then served from disk."""
+    invoice = get_object_or_404(Invoice, pk=pk)
+    snapshot = invoice_snapshot(invoice)
+    etag = f'"{invoice_pdf_key(snapshot)[:32]}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    # Answer 304/412 before opening the file, so those responses don't leave it open
+    unchanged = HttpResponse(headers=headers)
+    conditional = get_conditional_response(request, etag=etag, response=unchanged)
+    if conditional is not unchanged:
+        return conditional
+    pdf, _key = get_invoice_pdf_cache().open(snapshot)
+    return FileResponse(pdf, content_type='application/pdf', headers=headers,
+                        as_attachment='download' in request.GET, filename=f'{invoice.invoice_number}.pdf')
+
+
 @user_passes_test(lambda u: u.is_staff)
 def admin_stock_management(request: HttpRequest) -> HttpResponse:
     """Admin view for managing product stock and availability."""
@@ -1111,22 +1357,35 @@ def admin_stock_management(request: HttpRequest) -> HttpResponse:
     
     # Filter by stock status if requested
     stock_filter = request.GET.get('stock_filter', 'all')
-    if stock_filter == 'out_of_stock':
-        products = products.filter(stock_quantity=0)
-    elif stock_filter == 'low_stock':
-        products = products.filter(stock_quantity__lte=5, stock_quantity__gt=0)
-    elif stock_filter == 'in_stock':
-        products = products.filter(stock_quantity__gt=5)
-    elif stock_filter == 'inactive':
-        products = products.filter(is_active=False)
+    products = filter_stock(products, stock_filter)
+    
+    # Optionally show each product's stock at the end of a past day
+    try:
+        as_of = parse_date(request.GET.get('as_of', ''))
+    except ValueError:
+        as_of = None
+    quantities = None
+    if as_of:
+        end_of_day = timezone.make_aware(datetime.combine(as_of + timedelta(days=1), datetime.min.time()))
+        quantities = stock_as_of(end_of_day, products)
+    
+    # Recommended prep quantities from the demand forecast
+    forecast = demand_forecast()
+    products = list(products)
+    for product in products:
+        if quantities is not None:
+            product.stock_as_of = quantities.get(product.id, 0)
+        product_forecast = forecast['products'].get(product.id)
+        product.forecast_today = product_forecast['forecast'][0] if product_forecast else 0
+        product.prep_today = product_forecast['prepare'][0] if product_forecast else 0
+        product.forecast_week = round(sum(product_forecast['forecast']), 1) if product_forecast else 0
     
     context = {
         'products': products,
         'stock_filter': stock_filter,
-        'total_products': Product.objects.count(),
-        'out_of_stock_count': Product.objects.filter(stock_quantity=0).count(),
-        'low_stock_count': Product.objects.filter(stock_quantity__lte=5, stock_quantity__gt=0).count(),
-        'inactive_count': Product.objects.filter(is_active=False).count(),
+        'as_of': as_of,
+        'forecast_days': len(forecast['days']),
+        **stock_summary(),
     }
     return render(request, 'core/admin_stock_management.html', context)
 
@@ -1138,8 +1397,14 @@ def admin_update_stock(request: HttpRequest, product_id: int) -> HttpResponse:
     
     if request.method == 'POST':
         form = ProductStockForm(request.POST, instance=product)
+        saved = False
         if form.is_valid():
-            form.save()
+            try:
+                product = form.save(user=request.user)
+                saved = True
+            except InsufficientStock as exc:
+                form.add_error('stock_quantity', shortage_message(exc.shortages[product.pk]))
+        if saved:
             messages.success(request, f'Stock updated for {product.name}')
             
             # Log the stock update
@@ -1161,3 +1426,220 @@ def admin_update_stock(request: HttpRequest, product_id: int) -> HttpResponse:
         'title': f'Update Stock - {product.name}'
     }
     return render(request, 'core/admin_update_stock.html', context)
+
+
+@user_passes_test(lambda u: u.is_staff)
+def admin_bulk_stock(request: HttpRequest) -> HttpResponse:
+    """Admin view for updating the stock of every product from one page."""
+    products = Product.objects.order_by('name')
+    
+    if request.method == 'POST':
+        formset = BulkStockFormSet(request.POST, queryset=products)
+        batch_form = StockBatchForm(request.POST)
+        if formset.is_valid() and batch_form.is_valid():
+            updates = [(form.instance, form.stock_delta()) for form in formset if form.has_changed()]
+            misdirected = misdirected_updates(updates, batch_form.cleaned_data['movement_kind'])
+            for form in formset:
+                if form.instance.pk in misdirected:
+                    form.add_error('stock_quantity', misdirected[form.instance.pk])
+            if misdirected:
+                messages.error(request, 'Nothing was saved: some changes go the wrong way for the reason chosen.')
+            else:
+                ip_address, user_agent = request_client(request)
+                try:
+                    saved = apply_stock_updates(
+                        updates,
+                        kind=batch_form.cleaned_data['movement_kind'],
+                        note=batch_form.cleaned_data['movement_note'],
+                        user=request.user,
+                        ip_address=ip_address,
+                        user_agent=user_agent,
+                    )
+                except InsufficientStock as exc:
+                    for form in formset:
+                        if form.instance.pk in exc.shortages:
+                            form.add_error('stock_quantity', shortage_message(exc.shortages[form.instance.pk]))
+                    messages.error(request, 'Nothing was saved: some products no longer have enough stock.')
+                else:
+                    if saved:
+                        messages.success(request, f'Stock updated for {len(saved)} product{"s" if len(saved) != 1 else ""}')
+                    else:
+                        messages.info(request, 'No stock changes to save')
+                    return redirect('admin_stock_management')
+    else:
+        formset = BulkStockFormSet(queryset=products)
+        batch_form = StockBatchForm()
+    
+    context = {
+        'formset': formset,
+        'batch_form': batch_form,
+        'title': 'Bulk Stock Update'
+    }
+    return render(request, 'core/admin_bulk_stock.html', context)
+
+
+# Kitchen Board Views
+@user_passes_test(lambda u: u.is_staff)
+def kitchen_board(request: HttpRequest) -> HttpResponse:
+    """Kitchen queue board showing only active orders."""
+    context = {
+        'board': get_kitchen_board(),
+        'poll_interval': CLIENT_POLL_SECONDS,
+    }
+    return render(request, 'core/kitchen_board.html', context)
+
+
+@user_passes_test(lambda u: u.is_staff)
+def kitchen_board_feed(request: HttpRequest) -> JsonResponse:
+    """JSON feed answering "anything new since version X?".
+
+    Pass ``since`` to receive ``{"changed": false}`` while nothing changed; the
+    check is a single primary-key lookup on the change counter.
+    """
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        since = None
+
+    if since is not None:
+        version = board_version()
+        if version == since:
+            return JsonResponse({'changed': False, 'version': version})
+
+    board = get_kitchen_board()
+    return JsonResponse({'changed': True, **board})
+
+
+def _prep_plan_hours(request):
+    try:
+        hours = int(request.GET.get('hours', PREP_PLAN_HOURS))
+    except ValueError:
+        hours = PREP_PLAN_HOURS
+    return min(max(hours, 1), MAX_PREP_PLAN_HOURS)
+
+
+@user_passes_test(lambda u: u.is_staff)
+def kitchen_prep_plan(request: HttpRequest) -> HttpResponse:
+    """What the kitchen has to prepare per product in each of the coming hours."""
+    hours = _prep_plan_hours(request)
+    context = {
+        'plan': get_prep_plan(hours),
+        'poll_interval': CLIENT_POLL_SECONDS,
+    }
+    return render(request, 'core/kitchen_prep_plan.html', context)
+
+
+@user_passes_test(lambda u: u.is_staff)
+def kitchen_prep_plan_feed(request: HttpRequest) -> JsonResponse:
+    """JSON prep plan; pass ``since`` to get ``{"changed": false}`` while nothing changed."""
+    hours = _prep_plan_hours(request)
+    plan = get_prep_plan(hours)
+    if request.GET.get('since') == f"{plan['version']}:{plan['start']}":
+        return JsonResponse({'changed': False, 'version': plan['version']})
+    return JsonResponse({'changed': True, **plan})
+
+
+# Dispatch Planner
+@user_passes_test(lambda u: u.is_staff)
+def admin_dispatch_plan(request: HttpRequest) -> HttpResponse:
+    """Suggested rider batches and stop order for orders waiting to go out."""
+    try:
+        capacity = min(max(int(request.GET.get('capacity', DEFAULT_CAPACITY)), 1), MAX_CAPACITY)
+    except ValueError:
+        capacity = DEFAULT_CAPACITY
+
+    plan = plan_dispatch(capacity=capacity)
+    map_data = {
+        'store': [STORE_LATITUDE, STORE_LONGITUDE],
+        'routes': [
+            {
+                'label': f'Trip {number}',
+                'stops': [
+                    {'order': stop['order'].id, 'position': [stop['latitude'], stop['longitude']]}
+                    for stop in route['stops']
+                ],
+            }
+            for number, route in enumerate(plan['routes'], start=1)
+        ],
+    }
+    context = {
+        'plan': plan,
+        'capacity': capacity,
+        'max_capacity': MAX_CAPACITY,
+        'map_data': map_data,
+    }
+    return render(request, 'core/admin_dispatch_plan.html', context)
+
+
+# Export Views
+@user_passes_test(lambda u: u.is_staff)
+def admin_export(request: HttpRequest, kind: str) -> HttpResponse:
+    """Stream a CSV/XLSX export of orders, payments or invoices.
+
+    Accepts the same filters as the matching staff list page.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if kind not in EXPORTS or export_format not in EXPORT_FORMATS:
+        messages.error(request, 'Unknown export requested.')
+        return redirect('dashboard')
+
+    log_user_activity(request.user, 'view_page', f'Exported {kind} as {export_format.upper()}', request)
+    return export_response(kind, export_format, request.GET)
+
+
+# Reports
+@user_passes_test(lambda u: u.is_staff)
+def admin_sales_report(request: HttpRequest) -> HttpResponse:
+    """Sales report read from the materialized daily fact tables."""
+    if request.method == 'POST':
+        aggregated = aggregate_daily_sales()
+        messages.success(request, f'Sales figures refreshed ({aggregated} new completed orders).')
+        return redirect(request.get_full_path())
+
+    today = timezone.localdate()
+    try:
+        start = parse_date(request.GET.get('start') or '') or today - timedelta(days=29)
+        end = parse_date(request.GET.get('end') or '') or today
+    except ValueError:
+        start, end = today - timedelta(days=29), today
+    if start > end:
+        start, end = end, start
+
+    report = sales_report(start, end)
+    watermark = AggregationWatermark.objects.filter(name=SALES_WATERMARK).first()
+    chart_data = {
+        'labels': [row['date'].isoformat() for row in report['daily']],
+        'revenue': [float(row['revenue']) for row in report['daily']],
+        'orders': [row['orders'] for row in report['daily']],
+    }
+    context = {
+        'report': report,
+        'chart_data': chart_data,
+        'start': start,
+        'end': end,
+        'last_aggregated': watermark.last_timestamp if watermark else None,
+    }
+    return render(request, 'core/admin_sales_report.html', context)
+
+
+# Rider App API
+@csrf_exempt
+@require_POST
+def rider_location_ingest(request: HttpRequest) -> JsonResponse:
+    """Accept a batch of timestamped GPS points from a rider app.
+
+    Authenticated with ``Authorization: Token <api_token>``. Points are
+    buffered and written in bulk, so a 202 means "queued", not "stored".
+    """
+    rider_id = authenticate_rider(request)
+    if rider_id is None:
+        return JsonResponse({'error': 'Invalid or missing rider token.'}, status=401)
+
+    try:
+        payload = json.loads(request.body)
+        points, rejected = parse_points(rider_id, payload)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    location_buffer.add(points)
+    return JsonResponse({'accepted': len(points), 'rejected': rejected}, status=202)